@@ -1,34 +1,68 @@
 from django.contrib import admin
+from django.db.models import Count
+
 from .models import ProductCollection, ProductOrder, Product, ProductReview, Order, Collection
+from .pagination import EstimatedCountPaginator
 
 
+# Товары выбираются через автодополнение, а не через <select> со всеми товарами
 class ProductCollectionInline(admin.TabularInline):
     model = ProductCollection
+    autocomplete_fields = ['product']
+    extra = 1
 
 
 class ProductOrderInline(admin.TabularInline):
     model = ProductOrder
+    autocomplete_fields = ['product']
+    extra = 1
 
 
 # Товар
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    pass
+    list_display = ['id', 'name', 'price', 'created_at']
+    # Поиск по названию использует триграммный индекс (миграция 0005_admin_search_indexes)
+    search_fields = ['name']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 # Отзыв к товару
 @admin.register(ProductReview)
 class ProductReviewAdmin(admin.ModelAdmin):
-    pass
+    list_display = ['id', 'user', 'product', 'rating', 'updated_at']
+    list_select_related = ['user', 'product']
+    raw_id_fields = ['user']
+    autocomplete_fields = ['product']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 # Заказы
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     inlines = [ProductOrderInline]
+    list_display = ['id', 'user', 'status', 'positions_count', 'order_sum', 'created_at']
+    list_select_related = ['user']
+    list_filter = ['status']
+    search_fields = ['=id', '=user__username']
+    raw_id_fields = ['user']
+    ordering = ['-created_at', '-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(positions_count=Count('positions'))
+
+    @admin.display(description='Количество товаров', ordering='positions_count')
+    def positions_count(self, obj):
+        return obj.positions_count
 
 
 # Подборки
 @admin.register(Collection)
 class CollectionAdmin(admin.ModelAdmin):
     inlines = [ProductCollectionInline]
+    list_display = ['id', 'title', 'created_at']
+    search_fields = ['title']
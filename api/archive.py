@@ -0,0 +1,122 @@
+import heapq
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import transaction, connections, router
+from django.db.models import Max
+
+from .changes import record_changes
+from .models import Order, ProductOrder, OrderStatusHistory, OrderStatusChoices, ArchivedOrder, \
+    ArchivedProductOrder, ChangeActionChoices
+from .summaries import invalidate_order_summary
+
+ARCHIVE_BOUNDARY_KEY = 'order-archive-boundary'
+
+
+def archive_orders(before, batch_size=1000):
+    """
+    Переносит завершённые заказы, созданные раньше before, в архивные таблицы пачками по batch_size.
+    Каждая пачка переносится в своей транзакции. Возвращает число перенесённых заказов
+    """
+    moved = 0
+    while True:
+        with transaction.atomic():
+            orders = list(Order.objects.filter(status=OrderStatusChoices.DONE, created_at__lt=before)
+                          .order_by('id')[:batch_size])
+            if not orders:
+                break
+            ids = [order.id for order in orders]
+            history = {}
+            for record in OrderStatusHistory.objects.filter(order_id__in=ids).order_by('changed_at', 'id'):
+                history.setdefault(record.order_id, []).append({
+                    'from_status': record.from_status, 'to_status': record.to_status,
+                    'changed_by': record.changed_by_id, 'changed_at': record.changed_at,
+                })
+
+            ArchivedOrder.objects.bulk_create(
+                ArchivedOrder(id=order.id, user_id=order.user_id, status=order.status, order_sum=order.order_sum,
+                              version=order.version, created_at=order.created_at, updated_at=order.updated_at,
+                              placed_at=order.placed_at, status_history=history.get(order.id, []))
+                for order in orders
+            )
+            ArchivedProductOrder.objects.bulk_create(
+                ArchivedProductOrder(id=position.id, product_id=position.product_id, order_id=position.order_id,
+                                     amount=position.amount)
+                for position in ProductOrder.objects.filter(order_id__in=ids)
+            )
+            # Заказы не удаляются, а переносятся: в журнал пишется ARCHIVE, а не DELETE по каждому заказу и позиции
+            record_changes(orders, ChangeActionChoices.ARCHIVE)
+            # Удаление одной командой DELETE на таблицу, без сборщика ORM и сигналов post_delete
+            # (они записали бы DELETE в журнал). Каскады пропускать безопасно: на заказ ссылаются только
+            # позиции и история статусов, они удаляются здесь же раньше заказа, на позиции не ссылается ничего
+            _delete_rows(ProductOrder, 'order_id', ids)
+            _delete_rows(OrderStatusHistory, 'order_id', ids)
+            _delete_rows(Order, 'id', ids)
+            invalidate_order_summary(*(order.user_id for order in orders))
+        moved += len(orders)
+    cache.delete(ARCHIVE_BOUNDARY_KEY)
+    return moved
+
+
+def _delete_rows(model, column, ids):
+    connection = connections[router.db_for_write(model)]
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} '
+                       f'WHERE {connection.ops.quote_name(column)} IN ({placeholders})', ids)
+
+
+def get_archive_boundary():
+    """
+    Дата создания самого нового архивного заказа или None, если архив пуст
+    """
+    boundary = cache.get(ARCHIVE_BOUNDARY_KEY)
+    if boundary is None:
+        # '' - архив пуст, чтобы не повторять запрос
+        boundary = ArchivedOrder.objects.aggregate(boundary=Max('created_at'))['boundary'] or ''
+        cache.set(ARCHIVE_BOUNDARY_KEY, boundary)
+    return boundary or None
+
+
+def reaches_archive(created_after, created_before):
+    """
+    Нужно ли читать архив для диапазона дат создания заказа.
+    Без диапазона и для диапазона только по свежим заказам читается лишь основная таблица
+    """
+    if created_after is None and created_before is None:
+        return False
+    boundary = get_archive_boundary()
+    return boundary is not None and (created_after is None or created_after <= boundary)
+
+
+class MergedOrders:
+    """
+    Заказы основной таблицы и архива одним списком по убыванию (updated_at, created_at, id).
+    Срез читает из каждой таблицы только первые stop строк и сливает их, не сортируя всё целиком
+    """
+    ordering = ('-updated_at', '-created_at', '-id')
+
+    def __init__(self, *querysets):
+        self.querysets = [queryset.order_by(*self.ordering) for queryset in querysets]
+
+    @staticmethod
+    def _key(order):
+        return order.updated_at, order.created_at, order.id
+
+    def _merge(self, stop=None):
+        return heapq.merge(*(queryset[:stop] if stop is not None else queryset for queryset in self.querysets),
+                           key=self._key, reverse=True)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self._merge())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(islice(self._merge(index.stop), index.start, index.stop))
+        return next(islice(self._merge(index + 1), index, None))
@@ -0,0 +1,101 @@
+import csv
+import io
+from datetime import datetime, time
+
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Product, ProductPrice
+
+
+class BulkWriter:
+    """
+    Пакетная запись объектов в базу без сигналов и без save() для каждого объекта.
+    Значения pk, auto_now и auto_now_add берутся из объектов как есть (как в loaddata).
+    На Postgres пачки записываются через COPY, на остальных базах - через многострочный INSERT.
+    Без сигналов не появляются записи журнала изменений, история цен и готовые представления подборок:
+    историю цен восстанавливает backfill_price_history, представления собираются при первом чтении
+    """
+
+    def __init__(self, batch_size=5000, use_copy=True):
+        self.batch_size = batch_size
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        self.written = {}
+        self._pending = {}
+
+    def add(self, obj):
+        model = type(obj)
+        pending = self._pending.setdefault(model, [])
+        pending.append(obj)
+        if len(pending) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None):
+        models = [model] if model else list(self._pending)
+        for model in models:
+            objs = self._pending.pop(model, [])
+            if objs:
+                self._write(model, objs)
+                self.written[model] = self.written.get(model, 0) + len(objs)
+
+    def close(self):
+        """
+        Дописывает оставшиеся объекты и сдвигает последовательности pk за вставленные значения
+        """
+        self.flush()
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(self.written)):
+                cursor.execute(sql)
+
+    def _write(self, model, objs):
+        fields = model._meta.concrete_fields
+        if all(obj.pk is None for obj in objs):
+            # pk выдаёт база (например, строки связей многие-ко-многим из фикстуры)
+            fields = [field for field in fields if not field.primary_key]
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        rows = [[field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields] for obj in objs]
+        if self.use_copy:
+            self._copy(table, columns, rows)
+            return
+        # Многострочный INSERT: bulk_create не подходит, он перезаписывает поля auto_now и auto_now_add
+        batch_size = max(connection.ops.bulk_batch_size(fields, objs), 1)
+        placeholders = '({})'.format(', '.join(['%s'] * len(fields)))
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                cursor.execute(f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholders] * len(batch))}',
+                               [value for row in batch for value in row])
+
+    @staticmethod
+    def _copy(table, columns, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([r'\N' if value is None else value for value in row] for row in rows)
+        buffer.seek(0)
+
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer,
+            )
+
+
+def backfill_price_history(batch_size=5000):
+    """
+    Добавляет в историю цен текущую цену товаров, у которых истории нет (записанных без сигналов).
+    Цена действует с начала дня создания товара. Возвращает число добавленных записей
+    """
+    products = Product.objects.filter(~Exists(ProductPrice.objects.filter(product=OuterRef('pk')))) \
+        .order_by('id').values_list('id', 'price', 'created_at')
+    written = 0
+    batch = []
+    for product_id, price, created_at in products.iterator(chunk_size=batch_size):
+        valid_from = timezone.make_aware(datetime.combine(created_at, time.min))
+        batch.append(ProductPrice(product_id=product_id, price=price, valid_from=valid_from))
+        if len(batch) >= batch_size:
+            written += len(ProductPrice.objects.bulk_create(batch))
+            batch = []
+    return written + len(ProductPrice.objects.bulk_create(batch))
@@ -0,0 +1,192 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import Cart
+
+
+class CartBusy(APIException):
+    """
+    Корзину дольше CART_LOCK_WAIT_SECONDS изменяет другой запрос
+    """
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Корзина изменяется другим запросом, повторите попытку'
+    default_code = 'cart_busy'
+
+
+def _cart_key(user_id):
+    return f'cart:{user_id}'
+
+
+# Блокировки корзин, занятые текущим потоком: повторный вход не ждёт сам себя
+_held = threading.local()
+
+
+@contextmanager
+def _locked(user_id):
+    """
+    Изменения корзины выполняются по одному: блокировка - ключ в общем кеше, занимается атомарным cache.add.
+    Ключ живёт CART_LOCK_SECONDS, поэтому упавший процесс не оставляет корзину заблокированной навсегда.
+    Блокировка повторно входима в пределах потока
+    """
+    held = _held.__dict__.setdefault('user_ids', set())
+    if user_id in held:
+        yield
+        return
+    key = f'cart-lock:{user_id}'
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.CART_LOCK_WAIT_SECONDS
+    while not cache.add(key, token, settings.CART_LOCK_SECONDS):
+        if time.monotonic() > deadline:
+            raise CartBusy()
+        time.sleep(0.01)
+    held.add(user_id)
+    try:
+        yield
+    finally:
+        held.discard(user_id)
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def _load(user_id):
+    """
+    Состояние корзины из кеша, при промахе - из копии в базе
+    """
+    state = cache.get(_cart_key(user_id))
+    if state is not None:
+        return state
+    cart = Cart.objects.filter(user_id=user_id).first()
+    # persisted_at = 0: первое изменение после загрузки сразу сохраняется в базу
+    state = {'items': cart.items if cart else {}, 'persisted_at': 0}
+    cache.set(_cart_key(user_id), state, settings.CART_CACHE_SECONDS)
+    return state
+
+
+def _total(state):
+    """
+    Сумма корзины считается заново по позициям в Decimal: без накопления ошибок округления float
+    """
+    total = sum((Decimal(str(item['price'])) * item['amount'] for item in state['items'].values()), Decimal(0))
+    return float(total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
+
+def _save(user_id, state):
+    """
+    Изменения пишутся в кеш, в базу - не чаще раза в CART_PERSIST_SECONDS.
+    При потере кеша теряются изменения не больше чем за этот интервал
+    """
+    now = time.time()
+    if now - state['persisted_at'] >= settings.CART_PERSIST_SECONDS:
+        Cart.objects.update_or_create(user_id=user_id, defaults={'items': state['items'], 'total': _total(state)})
+        state['persisted_at'] = now
+    cache.set(_cart_key(user_id), state, settings.CART_CACHE_SECONDS)
+
+
+def _set_amount(state, product, amount):
+    if amount:
+        # Цена хранится строкой десятичного числа, сумма считается по ней в Decimal
+        state['items'][str(product.id)] = {'name': product.name, 'price': str(product.price), 'amount': amount}
+    else:
+        state['items'].pop(str(product.id), None)
+
+
+def _represent(state):
+    items = [{'product_id': int(product_id), **item, 'price': float(item['price'])}
+             for product_id, item in state['items'].items()]
+    return {'items': items, 'total': _total(state)}
+
+
+def get_cart(user_id):
+    """
+    Корзина пользователя: позиции с ценой на момент добавления и сумма
+    """
+    return _represent(_load(user_id))
+
+
+def add_item(user_id, product, amount):
+    """
+    Добавляет amount единиц товара к корзине
+    """
+    with _locked(user_id):
+        state = _load(user_id)
+        item = state['items'].get(str(product.id))
+        _set_amount(state, product, amount + (item['amount'] if item else 0))
+        _save(user_id, state)
+    return _represent(state)
+
+
+def set_item(user_id, product, amount):
+    """
+    Устанавливает количество товара в корзине, 0 - удаляет позицию
+    """
+    with _locked(user_id):
+        state = _load(user_id)
+        _set_amount(state, product, amount)
+        _save(user_id, state)
+    return _represent(state)
+
+
+def remove_item(user_id, product_id):
+    """
+    Удаляет позицию из корзины, возвращает False, если её не было
+    """
+    with _locked(user_id):
+        state = _load(user_id)
+        if state['items'].pop(str(product_id), None) is None:
+            return False
+        _save(user_id, state)
+    return True
+
+
+def clear_cart(user_id):
+    """
+    Очищает корзину в кеше и в базе
+    """
+    with _locked(user_id):
+        cache.delete(_cart_key(user_id))
+        Cart.objects.filter(user_id=user_id).delete()
+
+
+def _remove_ordered(user_id, ordered):
+    """
+    Вычитает из корзины оформленные количества: позиции, добавленные после чтения, остаются
+    """
+    with _locked(user_id):
+        state = _load(user_id)
+        for product_id, amount in ordered.items():
+            item = state['items'].get(product_id)
+            if item is None:
+                continue
+            if item['amount'] > amount:
+                item['amount'] -= amount
+            else:
+                del state['items'][product_id]
+        if not state['items']:
+            cache.delete(_cart_key(user_id))
+            Cart.objects.filter(user_id=user_id).delete()
+            return
+        # Копия в базе не должна сохранить оформленные позиции до следующего изменения
+        state['persisted_at'] = 0
+        _save(user_id, state)
+
+
+@contextmanager
+def checkout_cart(user_id):
+    """
+    Позиции корзины для оформления заказа. Корзина заблокирована, пока заказ создаётся в транзакции;
+    прочитанные позиции удаляются только после её коммита, при откате корзина остаётся прежней
+    """
+    with _locked(user_id), transaction.atomic():
+        state = _load(user_id)
+        ordered = {product_id: item['amount'] for product_id, item in state['items'].items()}
+        yield _represent(state)['items']
+        transaction.on_commit(lambda: _remove_ordered(user_id, ordered))
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import ChangeLogEntry
+
+
+def _entry(instance, action):
+    data = {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+    return ChangeLogEntry(model=instance._meta.label_lower, object_id=instance.pk, action=action, data=data)
+
+
+def record_change(instance, action):
+    """
+    Добавляет запись в журнал изменений в текущей транзакции
+    """
+    _entry(instance, action).save()
+
+
+def record_changes(instances, action):
+    """
+    Пакетная запись изменений для путей, которые обходят save() (bulk_create, UPDATE)
+    """
+    ChangeLogEntry.objects.bulk_create(_entry(instance, action) for instance in instances)
+
+
+def get_changes(since, limit):
+    """
+    Записи журнала с номером больше since.
+    На Postgres номер выдаётся при вставке, а транзакции фиксируются в другом порядке,
+    поэтому самые свежие записи (моложе CHANGE_FEED_SAFETY_LAG) не отдаются, пока не зафиксируются все более ранние.
+    Гарантия держится, только пока пишущие транзакции короче CHANGE_FEED_SAFETY_LAG: запись транзакции,
+    зафиксированной позже, появится с номером меньше курсора потребителя и будет им пропущена (доставка не более
+    одного раза). Задержка должна быть больше наибольшей длительности транзакции (statement_timeout,
+    idle_in_transaction_session_timeout); потребитель, которому важна полнота, периодически перечитывает журнал с нуля
+    """
+    entries = ChangeLogEntry.objects.filter(seq__gt=since)
+    if connection.vendor == 'postgresql':
+        entries = entries.filter(created_at__lte=timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SAFETY_LAG))
+    return list(entries.order_by('seq')[:limit])
+
+
+def compact_changes(before, batch_size=10000):
+    """
+    Удаляет записи старше before, кроме последней записи для каждого объекта.
+    Потребитель, начавший синхронизацию с нуля, всё равно получает актуальное состояние каждого объекта
+    """
+    deleted = 0
+    last_seq = 0
+    while True:
+        batch = list(ChangeLogEntry.objects.filter(created_at__lt=before, seq__gt=last_seq).order_by('seq')
+                     .values_list('seq', 'model', 'object_id')[:batch_size])
+        if not batch:
+            return deleted
+        last_seq = batch[-1][0]
+        # Последние записи только объектов пачки: группировка по индексу (model, object_id), а не по всему журналу
+        object_ids = {}
+        for _, model, object_id in batch:
+            object_ids.setdefault(model, set()).add(object_id)
+        objects = Q()
+        for model, ids in object_ids.items():
+            objects |= Q(model=model, object_id__in=ids)
+        latest = set(ChangeLogEntry.objects.filter(objects).order_by().values('model', 'object_id')
+                     .annotate(last_seq=Max('seq')).values_list('last_seq', flat=True))
+        stale = [seq for seq, _, _ in batch if seq not in latest]
+        if stale:
+            deleted += ChangeLogEntry.objects.filter(seq__in=stale).delete()[0]
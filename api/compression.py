@@ -0,0 +1,50 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Доступные кодировки сжатия в порядке предпочтения сервера; brotli и zstd - если установлены пакеты
+ENCODERS = {}
+if brotli is not None:
+    ENCODERS['br'] = lambda data: brotli.compress(data, quality=5)
+if zstandard is not None:
+    ENCODERS['zstd'] = lambda data: zstandard.ZstdCompressor(level=3).compress(data)
+ENCODERS['gzip'] = lambda data: gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def parse_accept_encoding(header):
+    """
+    Словарь кодировка -> вес из заголовка Accept-Encoding ('gzip;q=0.8, br')
+    """
+    weights = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    return weights
+
+
+def choose_encoding(header):
+    """
+    Кодировка с наибольшим весом у клиента, при равном весе - предпочтительная для сервера.
+    None, если клиент не принимает ни одну из доступных
+    """
+    weights = parse_accept_encoding(header or '')
+    candidates = [(weights.get(name, weights.get('*', 0.0)), -index, name) for index, name in enumerate(ENCODERS)]
+    candidates = [candidate for candidate in candidates if candidate[0] > 0]
+    return max(candidates)[2] if candidates else None
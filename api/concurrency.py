@@ -0,0 +1,51 @@
+from django.db.models import F
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    """
+    Объект изменён с момента чтения клиентом (версия не совпала с If-Match)
+    """
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'Объект был изменён другим запросом, получите актуальную версию и повторите изменение'
+    default_code = 'precondition_failed'
+
+
+def make_etag(version):
+    return f'"{version}"'
+
+
+def parse_if_match(request):
+    """
+    Версии из заголовка If-Match: один ETag ("3" или W/"3") или список через запятую ("3", "4").
+    None - заголовка нет или указан *. Значение, не похожее на версию, не совпадёт ни с одной версией
+    """
+    value = request.headers.get('If-Match')
+    if value is None or value.strip() == '*':
+        return None
+    versions = []
+    for etag in value.split(','):
+        etag = etag.strip()
+        if etag.startswith('W/'):
+            etag = etag[2:]
+        etag = etag.strip('"')
+        versions.append(int(etag) if etag.isdigit() else -1)
+    return versions
+
+
+def claim_version(instance, expected=None):
+    """
+    Условный UPDATE ... SET version = version + 1 WHERE id = ... AND version = expected.
+    expected - список допустимых версий из If-Match; без него сверяется версия, прочитанная вместе с объектом.
+    Вызывается в транзакции до остальных изменений: строка остаётся заблокированной до коммита,
+    а параллельный запрос с той же версией получает 412 вместо тихой перезаписи
+    """
+    if expected is None:
+        expected = [instance.version]
+    # Версий в If-Match обычно одна: по UPDATE на версию, чтобы знать, какая из них совпала
+    for version in expected:
+        if type(instance).objects.filter(pk=instance.pk, version=version).update(version=F('version') + 1):
+            instance.version = version + 1
+            return
+    raise PreconditionFailed()
@@ -0,0 +1,56 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Флаг текущего запроса: можно ли читать с реплики
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def _pin_key(user_id):
+    return f'primary-pin:{user_id}'
+
+
+def enable_replica_reads():
+    """
+    Разрешает чтение с реплики до вызова reset_replica_reads
+    """
+    return _replica_reads.set(True)
+
+
+def reset_replica_reads(token):
+    _replica_reads.reset(token)
+
+
+def pin_to_primary(user):
+    """
+    Закрепляет пользователя за основной базой на REPLICA_PIN_SECONDS после записи,
+    чтобы он сразу видел свои изменения (read-your-writes)
+    """
+    if user.is_authenticated:
+        cache.set(_pin_key(user.id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    return user.is_authenticated and cache.get(_pin_key(user.id), False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Роутер баз данных: запись всегда в 'default',
+    чтение с реплики - только если это разрешено для текущего запроса
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if replicas and _replica_reads.get():
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат копию тех же данных, что и основная база
+        return True
@@ -0,0 +1,213 @@
+import csv
+import importlib.util
+import io
+from contextlib import contextmanager
+from itertools import chain, islice
+
+from django.db import connection, transaction
+
+from .archive import get_archive_boundary
+from .models import ProductOrder, ArchivedProductOrder
+from .prices import annotate_position_prices
+
+# Одна строка выгрузки - позиция заказа вместе с полями заказа
+COLUMNS = [
+    ('order_id', 'order_id'),
+    ('user_id', 'order__user_id'),
+    ('status', 'order__status'),
+    ('created_at', 'order__created_at'),
+    ('placed_at', 'order__placed_at'),
+    ('order_sum', 'order__order_sum'),
+    ('product_id', 'product_id'),
+    ('amount', 'amount'),
+    ('unit_price', 'unit_price'),
+]
+
+
+class _Buffer(io.RawIOBase):
+    """
+    Файл в памяти, из которого записанное забирается по частям: держит только данные одной пачки
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+# Запись пачек строк в CSV: заголовок и строки без лишних кавычек
+class CsvWriter:
+    media_type = 'text/csv'
+    extension = 'csv'
+
+    def __init__(self, sink):
+        self._text = io.TextIOWrapper(sink, encoding='utf-8', newline='', write_through=True)
+        self._writer = csv.writer(self._text, lineterminator='\n')
+        self._writer.writerow([name for name, _ in COLUMNS])
+
+    def write(self, rows):
+        # Пустые значения - пустые поля, даты в ISO 8601
+        self._writer.writerows(
+            ['' if value is None else value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+            for row in rows
+        )
+
+    def close(self):
+        self._text.flush()
+        self._text.detach()
+
+
+# Общая схема для форматов pyarrow. pyarrow импортируется только при выгрузке в этих форматах:
+# его импорт занимает заметное время, а модуль импортируется вместе с сериализаторами
+class _ArrowWriter:
+    def _schema(self):
+        import pyarrow
+
+        return pyarrow.schema([
+            ('order_id', pyarrow.int64()),
+            ('user_id', pyarrow.int64()),
+            ('status', pyarrow.string()),
+            ('created_at', pyarrow.date32()),
+            ('placed_at', pyarrow.timestamp('us', tz='UTC')),
+            ('order_sum', pyarrow.float64()),
+            ('product_id', pyarrow.int64()),
+            ('amount', pyarrow.int64()),
+            ('unit_price', pyarrow.float64()),
+        ])
+
+    def _table(self, rows):
+        import pyarrow
+
+        columns = list(zip(*rows))
+        return pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema,
+        )
+
+
+# Запись пачек строк в Parquet со сжатием zstd
+class ParquetWriter(_ArrowWriter):
+    media_type = 'application/vnd.apache.parquet'
+    extension = 'parquet'
+
+    def __init__(self, sink):
+        import pyarrow.parquet
+
+        self.schema = self._schema()
+        self._writer = pyarrow.parquet.ParquetWriter(sink, self.schema, compression='zstd')
+
+    def write(self, rows):
+        # Каждая пачка - отдельная группа строк
+        self._writer.write_table(self._table(rows))
+
+    def close(self):
+        self._writer.close()
+
+
+# Запись пачек строк в файл Arrow IPC
+class ArrowWriter(_ArrowWriter):
+    media_type = 'application/vnd.apache.arrow.file'
+    extension = 'arrow'
+
+    def __init__(self, sink):
+        import pyarrow.ipc
+
+        self.schema = self._schema()
+        # Файловый формат IPC читается через pyarrow.memory_map без копирования
+        self._writer = pyarrow.ipc.new_file(sink, self.schema)
+
+    def write(self, rows):
+        self._writer.write_table(self._table(rows))
+
+    def close(self):
+        self._writer.close()
+
+
+# Форматы выгрузки в порядке предпочтения; Parquet и Arrow - если установлен pyarrow
+WRITERS = {}
+if importlib.util.find_spec('pyarrow'):
+    WRITERS['parquet'] = ParquetWriter
+    WRITERS['arrow'] = ArrowWriter
+WRITERS['csv'] = CsvWriter
+
+
+def _positions(start, end):
+    """
+    Строки позиций заказов, созданных в диапазоне дат; архив читается, только если диапазон его захватывает
+    """
+    querysets = [ProductOrder.objects]
+    boundary = get_archive_boundary()
+    if boundary is not None and (start is None or start <= boundary):
+        querysets.append(ArchivedProductOrder.objects)
+    for queryset in querysets:
+        if start is not None:
+            queryset = queryset.filter(order__created_at__gte=start)
+        if end is not None:
+            queryset = queryset.filter(order__created_at__lte=end)
+        yield annotate_position_prices(queryset).order_by('order_id', 'id') \
+            .values_list(*(field for _, field in COLUMNS))
+
+
+@contextmanager
+def _snapshot():
+    """
+    Транзакция, в которой все запросы видят один снимок базы. Иначе заказ, перенесённый archive_orders
+    между чтением основной таблицы и архива, попал бы в выгрузку дважды (или ни разу).
+    На Postgres - REPEATABLE READ (если выгрузка не вложена в уже начатую транзакцию), SQLite и так читает
+    из одного снимка внутри транзакции
+    """
+    nested = connection.in_atomic_block
+    with transaction.atomic():
+        if connection.vendor == 'postgresql' and not nested:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+def iter_export(start=None, end=None, export_format='csv', chunk_size=10000):
+    """
+    Выгрузка позиций заказов за диапазон дат создания в заданном формате по частям (байты).
+    Строки читаются через .iterator() пачками по chunk_size, каждая пачка сразу записывается и отдаётся,
+    поэтому память не зависит от размера выгрузки. Основная таблица и архив читаются в одной транзакции,
+    она остаётся открытой, пока выгрузка не дочитана
+    """
+    sink = _Buffer()
+    writer = WRITERS[export_format](sink)
+    with _snapshot():
+        rows = chain.from_iterable(queryset.iterator(chunk_size=chunk_size) for queryset in _positions(start, end))
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            writer.write(chunk)
+            yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def export_orders(output, start=None, end=None, export_format='csv', chunk_size=10000):
+    """
+    Записывает выгрузку в бинарный файл output, возвращает число записанных байт
+    """
+    written = 0
+    for data in iter_export(start, end, export_format, chunk_size):
+        output.write(data)
+        written += len(data)
+    return written
@@ -0,0 +1,66 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, OuterRef, Subquery
+
+from .models import ProductReview, ProductCollection
+
+# Границы диапазонов средней оценки товара
+RATING_BOUNDS = [1, 2, 3, 4, 5]
+
+
+def _bands(bounds):
+    """
+    Диапазоны [min, max) по списку границ, последний диапазон без верхней границы
+    """
+    return list(zip(bounds, bounds[1:] + [None]))
+
+
+def _band_filter(field, low, high):
+    condition = Q(**{f'{field}__gte': low})
+    if high is not None:
+        condition &= Q(**{f'{field}__lt': high})
+    return condition
+
+
+def get_product_facets(products, query_params):
+    """
+    Количество товаров по диапазонам цены, средней оценки и по подборкам для отфильтрованного набора товаров.
+    Диапазоны цены и оценки считаются одним запросом с условной агрегацией, подборки - одним GROUP BY.
+    Результат кешируется по набору параметров фильтрации, порядок параметров в запросе не важен
+    """
+    signature = hashlib.md5(urlencode(sorted(query_params.lists()), doseq=True).encode()).hexdigest()
+    key = f'product-facets:{signature}'
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    price_bands = _bands(settings.PRODUCT_PRICE_FACETS)
+    rating_bands = _bands(RATING_BOUNDS[:-1])
+    avg_rating = ProductReview.objects.filter(product=OuterRef('pk')).values('product').annotate(
+        avg=Avg('rating')).values('avg')
+    aggregates = products.annotate(avg_rating=Subquery(avg_rating)).aggregate(
+        total=Count('id'),
+        no_rating=Count('id', filter=Q(avg_rating__isnull=True)),
+        **{f'price_{index}': Count('id', filter=_band_filter('price', low, high))
+           for index, (low, high) in enumerate(price_bands)},
+        **{f'rating_{index}': Count('id', filter=_band_filter('avg_rating', low, high))
+           for index, (low, high) in enumerate(rating_bands)},
+    )
+    collections = ProductCollection.objects.filter(product__in=products.values('id')).values(
+        'collection_id', 'collection__title').annotate(count=Count('product_id', distinct=True)).order_by('-count')
+
+    facets = {
+        'count': aggregates['total'],
+        'price': [{'min': low, 'max': high, 'count': aggregates[f'price_{index}']}
+                  for index, (low, high) in enumerate(price_bands)],
+        'rating': [{'min': low, 'max': high, 'count': aggregates[f'rating_{index}']}
+                   for index, (low, high) in enumerate(rating_bands)]
+        + [{'min': None, 'max': None, 'count': aggregates['no_rating']}],
+        'collections': [{'id': row['collection_id'], 'title': row['collection__title'], 'count': row['count']}
+                        for row in collections],
+    }
+    cache.set(key, facets, settings.PRODUCT_FACETS_CACHE_SECONDS)
+    return facets
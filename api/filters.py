@@ -1,16 +1,18 @@
 from django_filters import rest_framework as filters
 
-from .models import Product, ProductReview, Order, Collection
+from .models import Product, ProductReview, Order, Collection, ArchivedOrder
 
 
 class ProductFilter(filters.FilterSet):
     name = filters.CharFilter(field_name='name', lookup_expr='contains')
     description = filters.CharFilter(field_name='description', lookup_expr='contains')
     price = filters.RangeFilter(field_name='price')
+    # Фильтр по связи id: соединение только с api_product_collections, без таблицы подборок
+    collection = filters.NumberFilter(field_name='collection')
 
     class Meta:
         model = Product
-        fields = ('name', 'description', 'price',)
+        fields = ('name', 'description', 'price', 'collection')
 
 
 class ProductReviewFilter(filters.FilterSet):
@@ -34,7 +36,19 @@ class OrderFilter(filters.FilterSet):
         fields = ('status', 'order_sum', 'updated_at', 'created_at')
 
 
+class ArchivedOrderFilter(OrderFilter):
+    """
+    Те же фильтры для архива заказов
+    """
+
+    class Meta(OrderFilter.Meta):
+        model = ArchivedOrder
+
+
 class CollectionFilter(filters.FilterSet):
+    # Подборки, в которые входит товар: соединение только с api_product_collections
+    product = filters.NumberFilter(field_name='products')
+
     class Meta:
         model = Collection
-        fields = []
+        fields = ('product',)
@@ -0,0 +1,17 @@
+import logging
+
+from .models import Order
+from .queue import task
+
+logger = logging.getLogger(__name__)
+
+
+# Фоновые задачи, которые ставятся в очередь из запросов (см. api.queue.enqueue)
+@task
+def notify_order_created(order_id):
+    """
+    Уведомление о новом заказе: аналитика, письма и т.п. выполняются вне транзакции запроса
+    """
+    order = Order.objects.filter(id=order_id).values('id', 'user_id', 'order_sum').first()
+    if order:
+        logger.info('Новый заказ %(id)s пользователя %(user_id)s на сумму %(order_sum)s', order)
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Переносит завершённые заказы старше заданного числа дней в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ORDER_ARCHIVE_DAYS,
+                            help='Заказы, созданные позже, остаются в основной таблице')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        before = timezone.localdate() - timedelta(days=options['days'])
+        moved = archive_orders(before, batch_size=options['batch_size'])
+        self.stdout.write(f'Перенесено заказов: {moved}')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Order
+from api.prices import audit_order_sums
+
+
+class Command(BaseCommand):
+    help = 'Сверяет суммы заказов с ценами товаров на момент оформления по истории цен'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Исправить суммы с расхождениями')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        mismatches = audit_order_sums(Order.objects.all(), batch_size=options['batch_size'], fix=options['fix'])
+        for order_id, stored, expected in mismatches:
+            self.stdout.write(f'Заказ {order_id}: {stored} -> {expected}')
+        action = 'Исправлено' if options['fix'] else 'Найдено расхождений'
+        self.stdout.write(f'{action}: {len(mismatches)}')
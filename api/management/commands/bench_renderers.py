@@ -0,0 +1,71 @@
+import json
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.compression import ENCODERS
+from api.models import Product
+from api.renderers import ColumnarJSONRenderer, MessagePackRenderer, msgpack
+from api.serializers import ProductSerializer
+
+
+def best_time(func, repeat):
+    """
+    Лучшее время из repeat запусков, мс, и результат последнего запуска
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return round(min(timings) * 1000, 2), result
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает размер и время кодирования списка товаров в разных форматах и кодировках сжатия'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5, help='Число повторов, берётся лучшее время')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для JSON-отчёта')
+
+    def handle(self, *args, **options):
+        data = ProductSerializer(self._products(options['rows'], random.Random(options['seed'])), many=True).data
+        formats = {
+            'json': (JSONRenderer(), json.loads),
+            'columns': (ColumnarJSONRenderer(), json.loads),
+        }
+        if msgpack is not None:
+            formats['msgpack'] = (MessagePackRenderer(), msgpack.unpackb)
+
+        repeat = options['repeat']
+        report = {'rows': options['rows'], 'formats': {}}
+        for name, (renderer, decode) in formats.items():
+            encode_ms, content = best_time(lambda: renderer.render(data), repeat)
+            decode_ms, _ = best_time(lambda: decode(content), repeat)
+            result = {'bytes': len(content), 'encode_ms': encode_ms, 'decode_ms': decode_ms, 'compressed': {}}
+            for encoding, compress in ENCODERS.items():
+                compress_ms, compressed = best_time(lambda: compress(content), repeat)
+                result['compressed'][encoding] = {'bytes': len(compressed), 'compress_ms': compress_ms}
+            report['formats'][name] = result
+
+        report_json = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report_json)
+        self.stdout.write(report_json)
+
+    @staticmethod
+    def _products(count, rng):
+        # Несохранённые товары: бенчмарк не зависит от содержимого базы
+        today = timezone.localdate()
+        words = ['Python', 'Django', 'SQL', 'Linux', 'справочник', 'курс', 'учебник', 'сборник']
+        return [Product(id=number, name=' '.join(rng.choices(words, k=3)),
+                        description=' '.join(rng.choices(words, k=rng.randint(20, 60))),
+                        price=Decimal(rng.randint(10000, 1000000)) / 100, created_at=today, updated_at=today)
+                for number in range(1, count + 1)]
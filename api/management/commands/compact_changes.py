@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Сжимает журнал изменений: из старых записей остаётся только последняя для каждого объекта'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CHANGE_FEED_RETENTION_DAYS,
+                            help='Записи моложе стольких дней не сжимаются')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        deleted = compact_changes(before, batch_size=options['batch_size'])
+        self.stdout.write(f'Удалено записей: {deleted}')
@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import WRITERS, export_orders
+
+
+class Command(BaseCommand):
+    help = 'Выгружает позиции заказов за диапазон дат создания в Parquet / Arrow (если установлен pyarrow) или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл выгрузки')
+        parser.add_argument('--start', type=date.fromisoformat, help='Первая дата создания заказа, ГГГГ-ММ-ДД')
+        parser.add_argument('--end', type=date.fromisoformat, help='Последняя дата создания заказа, ГГГГ-ММ-ДД')
+        parser.add_argument('--format', choices=list(WRITERS), default=next(iter(WRITERS)))
+        parser.add_argument('--chunk-size', type=int, default=settings.ORDER_EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['start'] and options['end'] and options['start'] > options['end']:
+            raise CommandError('Конец диапазона раньше начала')
+        with open(options['output'], 'wb') as output:
+            written = export_orders(output, options['start'], options['end'], options['format'],
+                                    options['chunk_size'])
+        self.stdout.write(f'Записано {written} байт в {options["output"]}')
@@ -0,0 +1,34 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.prices import import_prices
+
+
+class Command(BaseCommand):
+    help = 'Загружает прайс-лист в историю цен товаров пакетной вставкой (CSV: product_id,price[,valid_from])'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV-файл с заголовком product_id,price и необязательным valid_from')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        with open(options['path'], encoding='utf-8', newline='') as stream:
+            written = import_prices(self._rows(csv.DictReader(stream), now), batch_size=options['batch_size'])
+        self.stdout.write(f'Загружено цен: {written}')
+
+    @staticmethod
+    def _rows(reader, now):
+        for line, row in enumerate(reader, start=2):
+            try:
+                valid_from = parse_datetime(row['valid_from']) if row.get('valid_from') else now
+                if valid_from is None:
+                    raise ValueError(row['valid_from'])
+                if timezone.is_naive(valid_from):
+                    valid_from = timezone.make_aware(valid_from)
+                yield int(row['product_id']), float(row['price']), valid_from
+            except (KeyError, ValueError) as error:
+                raise CommandError(f'Строка {line}: неверные данные ({error})')
@@ -0,0 +1,267 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.models import Product
+
+ORDERS_URL = '/api/v1/orders/'
+
+
+class InProcessClient:
+    """
+    Запросы к приложению в том же процессе, без HTTP-сервера
+    """
+
+    def __init__(self, token):
+        self.client = APIClient(HTTP_HOST=self._allowed_host(), raise_request_exception=False)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    @staticmethod
+    def _allowed_host():
+        # С DEBUG и пустым ALLOWED_HOSTS Django разрешает localhost
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        return host.lstrip('.').replace('*', 'localhost')
+
+    def request(self, method, path, data=None):
+        response = getattr(self.client, method.lower())(path, data=data, format='json')
+        body = response.json() if response.status_code < 300 and response.content else None
+        # Для ошибок 500 берём текст исключения: по нему отличаются блокировки и дедлоки
+        exc_info = getattr(response, 'exc_info', None)
+        if response.status_code >= 500 and exc_info:
+            content = str(exc_info[1])
+        else:
+            content = response.content.decode(errors='replace')
+        return response.status_code, body, content
+
+
+class HttpClient:
+    """
+    Запросы к запущенному серверу (например, manage.py runserver или gunicorn)
+    """
+
+    def __init__(self, base_url, token, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'Authorization': f'Token {token}', 'Content-Type': 'application/json'}
+        self.timeout = timeout
+
+    def request(self, method, path, data=None):
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, headers=self.headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                content = response.read().decode()
+                return response.status, json.loads(content) if content else None, content
+        except urllib.error.HTTPError as error:
+            return error.code, None, error.read().decode(errors='replace')
+        except (urllib.error.URLError, OSError) as error:
+            # Сервер не ответил (отказ в соединении, обрыв, таймаут): запрос учитывается как неудачный со статусом 0
+            return 0, None, str(getattr(error, 'reason', error))
+
+
+class LockSampler(threading.Thread):
+    """
+    Периодически считает ожидающие блокировки в Postgres (pg_locks.granted = false)
+    """
+
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self._stop_event.wait(self.interval):
+                    cursor.execute('SELECT count(*) FROM pg_locks WHERE NOT granted')
+                    self.samples.append(cursor.fetchone()[0])
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест заказов: создание, изменение и просмотр заказов множеством пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Адрес запущенного сервера; без него запросы выполняются в процессе')
+        parser.add_argument('--users', type=int, default=50, help='Число синтетических пользователей')
+        parser.add_argument('--concurrency', type=int, default=8, help='Число параллельных потоков (1-512)')
+        parser.add_argument('--requests', type=int, default=1000, help='Общее число запросов')
+        parser.add_argument('--mix', default='create=50,patch=25,list=25', help='Доли операций')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для JSON-отчёта')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['concurrency'] <= 512:
+            raise CommandError('--concurrency должен быть от 1 до 512')
+        operations, weights = self._parse_mix(options['mix'])
+        product_ids = list(Product.objects.values_list('id', flat=True)[:1000])
+        if not product_ids:
+            raise CommandError('Нет товаров: сначала выполните seed_data')
+        tokens = self._prepare_users(options['users'])
+
+        rng = random.Random(options['seed'])
+        plan = [(rng.choice(tokens), rng.choices(operations, weights)[0], rng.random(),
+                 rng.sample(product_ids, min(3, len(product_ids))))
+                for _ in range(options['requests'])]
+        self.thread_connections = []
+        self.user_orders = {token: [] for token in tokens}
+        self.results = {operation: [] for operation in operations}
+        self.errors = {'status_4xx': 0, 'status_5xx': 0, 'throttled': 0, 'connection_errors': 0, 'deadlocks': 0,
+                       'lock_errors': 0}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.base_url = options['url']
+
+        deadlocks_before = self._deadlocks()
+        sampler = LockSampler() if connection.vendor == 'postgresql' else None
+        if sampler:
+            sampler.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            list(executor.map(self._run_one, plan))
+        duration = time.perf_counter() - started
+        for thread_connection in self.thread_connections:
+            thread_connection.close()
+            thread_connection.dec_thread_sharing()
+        if sampler:
+            sampler.stop()
+        deadlocks_after = self._deadlocks()
+
+        report = {
+            'target': self.base_url or 'in-process',
+            'concurrency': options['concurrency'],
+            'users': len(tokens),
+            'requests': len(plan),
+            'duration_s': round(duration, 3),
+            'throughput_rps': round(len(plan) / duration, 2),
+            'operations': {operation: self._latency_stats(latencies)
+                           for operation, latencies in self.results.items()},
+            'errors': self.errors,
+            'database': {
+                'vendor': connection.vendor,
+                'deadlocks': deadlocks_after - deadlocks_before if deadlocks_before is not None else None,
+                'lock_waits_max': max(sampler.samples, default=0) if sampler else None,
+                'lock_waits_mean': round(sum(sampler.samples) / len(sampler.samples), 2)
+                if sampler and sampler.samples else None,
+            },
+        }
+        report_json = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report_json)
+        self.stdout.write(report_json)
+
+    @staticmethod
+    def _parse_mix(mix):
+        operations, weights = [], []
+        for part in mix.split(','):
+            operation, _, weight = part.partition('=')
+            if operation not in ('create', 'patch', 'list'):
+                raise CommandError(f'Неизвестная операция: {operation}')
+            operations.append(operation)
+            weights.append(float(weight or 1))
+        return operations, weights
+
+    @staticmethod
+    def _prepare_users(count):
+        usernames = [f'load_user_{number}' for number in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        User.objects.bulk_create(User(username=username) for username in usernames if username not in existing)
+        user_ids = set(User.objects.filter(username__in=usernames).values_list('id', flat=True))
+        user_ids -= set(Token.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        Token.objects.bulk_create(Token(key=Token.generate_key(), user_id=user_id) for user_id in user_ids)
+        return list(Token.objects.filter(user__username__in=usernames).values_list('key', flat=True))
+
+    def _client(self, token):
+        clients = getattr(self.local, 'clients', None)
+        if clients is None:
+            clients = self.local.clients = {}
+            if not self.base_url:
+                # Соединение потока закрывается из основного потока после теста
+                thread_connection = connections['default']
+                thread_connection.inc_thread_sharing()
+                with self.lock:
+                    self.thread_connections.append(thread_connection)
+        if token not in clients:
+            clients[token] = HttpClient(self.base_url, token) if self.base_url else InProcessClient(token)
+        return clients[token]
+
+    def _run_one(self, step):
+        token, operation, choice, product_ids = step
+        client = self._client(token)
+        with self.lock:
+            orders = self.user_orders[token]
+            order_id = orders[int(choice * len(orders))] if orders else None
+        if operation == 'patch' and order_id is None:
+            operation = 'create'
+
+        positions = [{'product_id': product_id, 'amount': 1 + int(choice * 5)} for product_id in product_ids]
+        started = time.perf_counter()
+        if operation == 'create':
+            status, body, content = client.request('POST', ORDERS_URL, {'positions': positions})
+        elif operation == 'patch':
+            status, body, content = client.request('PATCH', f'{ORDERS_URL}{order_id}/', {'positions': positions[:1]})
+        else:
+            status, body, content = client.request('GET', ORDERS_URL)
+        latency = time.perf_counter() - started
+
+        with self.lock:
+            self.results[operation].append((latency, status))
+            if operation == 'create' and status == 201:
+                self.user_orders[token].append(body['id'])
+            if status == 0:
+                self.errors['connection_errors'] += 1
+            elif status >= 500:
+                self.errors['status_5xx'] += 1
+            elif status >= 400:
+                self.errors['status_4xx'] += 1
+            if status == 429:
+                self.errors['throttled'] += 1
+            if 'deadlock' in content.lower():
+                self.errors['deadlocks'] += 1
+            elif 'locked' in content.lower() or 'lock timeout' in content.lower():
+                self.errors['lock_errors'] += 1
+
+    @staticmethod
+    def _latency_stats(results):
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        return {
+            'count': len(results),
+            'errors': sum(1 for _, status in results if not 200 <= status < 400),
+            'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+            'p90_ms': round(percentile(latencies, 90), 2) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99), 2) if latencies else None,
+            'max_ms': round(latencies[-1], 2) if latencies else None,
+        }
+
+    @staticmethod
+    def _deadlocks():
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()')
+            return cursor.fetchone()[0]
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.prices import promote_due_prices
+
+
+class Command(BaseCommand):
+    help = 'Делает текущими наступившие цены из истории (загруженные заранее с будущей датой начала действия)'
+
+    def handle(self, *args, **options):
+        product_ids = promote_due_prices()
+        self.stdout.write(f'Обновлено цен товаров: {len(product_ids)}')
@@ -0,0 +1,44 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.queue import Worker
+
+
+def _run_worker(batch_size, sleep):
+    Worker(batch_size=batch_size, sleep=sleep).run_forever()
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Число процессов-воркеров')
+        parser.add_argument('--batch-size', type=int, default=10, help='Сколько задач забирать за раз')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Пауза при пустой очереди, с')
+        parser.add_argument('--once', action='store_true', help='Выполнить доступные задачи и завершиться')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = Worker(batch_size=options['batch_size']).run_once()
+            self.stdout.write(f'Обработано задач: {processed}')
+            return
+
+        if options['processes'] == 1:
+            _run_worker(options['batch_size'], options['sleep'])
+            return
+
+        # Дочерние процессы не должны использовать соединения с базой родителя
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_run_worker, args=(options['batch_size'], options['sleep']))
+                   for _ in range(options['processes'])]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
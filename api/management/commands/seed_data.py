@@ -0,0 +1,162 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core import serializers
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api.bulk import BulkWriter, backfill_price_history
+from api.models import Product, ProductReview, Order, ProductOrder, Collection, ProductCollection, Favorites, \
+    OrderStatusChoices, ProductPrice
+
+# Служебные записи, которые создаёт migrate, и ссылающиеся на них записи
+SKIPPED_FIXTURE_MODELS = {'contenttypes.contenttype', 'auth.permission', 'admin.logentry', 'sessions.session'}
+
+FIRST_NAMES = ['Иван', 'Анна', 'Пётр', 'Мария', 'Алексей', 'Ольга', 'Дмитрий', 'Елена', 'Сергей', 'Наталья']
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов']
+ADJECTIVES = ['Новый', 'Лучший', 'Полный', 'Краткий', 'Практический', 'Современный', 'Простой', 'Большой']
+NOUNS = ['справочник', 'курс', 'учебник', 'самоучитель', 'сборник', 'атлас', 'словарь', 'задачник']
+TOPICS = ['Python', 'Django', 'SQL', 'алгоритмов', 'Linux', 'сетей', 'математики', 'архитектуры']
+REVIEW_TEXTS = ['Хорошая книга', 'Рекомендую', 'Ожидал большего', 'Отличное качество', 'Быстрая доставка']
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетические данные магазина или загружает фикстуру пакетной вставкой'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--reviews', type=int, default=1000)
+        parser.add_argument('--collections', type=int, default=10)
+        parser.add_argument('--favorites', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора для воспроизводимых данных')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--no-copy', action='store_true', help='Не использовать COPY на Postgres')
+        parser.add_argument('--fixture', help='Загрузить фикстуру (например fixtures.json) вместо генерации')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        writer = BulkWriter(batch_size=options['batch_size'], use_copy=not options['no_copy'])
+        if options['fixture']:
+            self.load_fixture(writer, options['fixture'])
+        else:
+            self.generate(writer, random.Random(options['seed']), options)
+        writer.close()
+        prices = backfill_price_history(options['batch_size'])
+        if prices:
+            writer.written[ProductPrice] = prices
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        total = sum(writer.written.values())
+        for model, count in writer.written.items():
+            self.stdout.write(f'{model._meta.label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано строк: {total} за {elapsed:.1f} с ({total / elapsed * 60:.0f} строк/мин)'
+        ))
+
+    @staticmethod
+    def load_fixture(writer, path):
+        with open(path, encoding='utf-8') as stream:
+            for deserialized in serializers.deserialize('json', stream, ignorenonexistent=True):
+                obj = deserialized.object
+                if obj._meta.label_lower in SKIPPED_FIXTURE_MODELS:
+                    continue
+                writer.add(obj)
+                # Связи многие-ко-многим без своей модели хранятся в фикстуре списком pk у объекта
+                for field_name, related_ids in (deserialized.m2m_data or {}).items():
+                    field = obj._meta.get_field(field_name)
+                    if field.related_model._meta.label_lower in SKIPPED_FIXTURE_MODELS:
+                        continue
+                    through = field.remote_field.through
+                    for related_id in related_ids:
+                        writer.add(through(**{f'{field.m2m_field_name()}_id': obj.pk,
+                                              f'{field.m2m_reverse_field_name()}_id': related_id}))
+
+    def generate(self, writer, rng, options):
+        now = timezone.now()
+
+        def moment():
+            return now - timedelta(seconds=rng.randrange(365 * 24 * 60 * 60))
+
+        user_ids = list(User.objects.values_list('id', flat=True))
+        password = make_password('password')
+        for user_id in self._new_ids(User, options['users']):
+            writer.add(User(id=user_id, username=f'user{user_id}', password=password,
+                            first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                            email=f'user{user_id}@example.com', date_joined=moment()))
+            user_ids.append(user_id)
+
+        prices = dict(Product.objects.values_list('id', 'price'))
+        for product_id in self._new_ids(Product, options['products']):
+            created_at = moment().date()
+            name = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(TOPICS)}'
+            price = round(rng.uniform(100, 10000), 2)
+            writer.add(Product(id=product_id, name=name, description=f'{name}. Издание {product_id}',
+                               price=price, created_at=created_at, updated_at=created_at))
+            prices[product_id] = price
+        product_ids = list(prices)
+
+        if not user_ids or not product_ids:
+            return
+
+        position_id = self._next_id(ProductOrder)
+        for order_id in self._new_ids(Order, options['orders']):
+            created_at = moment().date()
+            positions = [(product_id, rng.randint(1, 5))
+                         for product_id in rng.sample(product_ids, min(rng.randint(1, 5), len(product_ids)))]
+            for product_id, amount in positions:
+                writer.add(ProductOrder(id=position_id, product_id=product_id, order_id=order_id, amount=amount))
+                position_id += 1
+            writer.add(Order(id=order_id, user_id=rng.choice(user_ids), status=rng.choice(OrderStatusChoices.values),
+                             order_sum=round(sum(prices[product_id] * amount for product_id, amount in positions), 2),
+                             created_at=created_at, updated_at=created_at))
+
+        # Отзыв и избранное уникальны для пары пользователь-товар
+        for review_id, (user_id, product_id) in zip(self._new_ids(ProductReview, options['reviews']),
+                                                    self._unique_pairs(rng, user_ids, product_ids,
+                                                                       options['reviews'], ProductReview)):
+            created_at = moment()
+            writer.add(ProductReview(id=review_id, user_id=user_id, product_id=product_id,
+                                     text=rng.choice(REVIEW_TEXTS), rating=rng.randint(1, 5),
+                                     created_at=created_at, updated_at=created_at))
+
+        for favorite_id, (user_id, product_id) in zip(self._new_ids(Favorites, options['favorites']),
+                                                      self._unique_pairs(rng, user_ids, product_ids,
+                                                                         options['favorites'], Favorites)):
+            writer.add(Favorites(id=favorite_id, user_id=user_id, product_id=product_id))
+
+        member_id = self._next_id(ProductCollection)
+        for collection_id in self._new_ids(Collection, options['collections']):
+            created_at = moment().date()
+            topic = rng.choice(TOPICS)
+            writer.add(Collection(id=collection_id, title=f'Подборка: {topic}', text=f'Всё про {topic}',
+                                  created_at=created_at, updated_at=created_at))
+            for product_id in rng.sample(product_ids, min(rng.randint(5, 20), len(product_ids))):
+                writer.add(ProductCollection(id=member_id, product_id=product_id, collection_id=collection_id))
+                member_id += 1
+
+    @staticmethod
+    def _next_id(model):
+        return (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+    def _new_ids(self, model, count):
+        start = self._next_id(model)
+        return range(start, start + count)
+
+    @staticmethod
+    def _unique_pairs(rng, user_ids, product_ids, count, model):
+        seen = set(model.objects.values_list('user_id', 'product_id'))
+        count = min(count, len(user_ids) * len(product_ids) - len(seen))
+        while count > 0:
+            pair = (rng.choice(user_ids), rng.choice(product_ids))
+            if pair not in seen:
+                seen.add(pair)
+                count -= 1
+                yield pair
@@ -0,0 +1,16 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = 'Прогревает маршруты, сериализаторы, фильтры и соединения с базами и выводит время каждого шага'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-connect', action='store_true', help='Не открывать соединения с базами')
+
+    def handle(self, *args, **options):
+        timings = warm_up(connect=not options['no_connect'])
+        self.stdout.write(json.dumps(timings, indent=2))
@@ -0,0 +1,139 @@
+import cProfile
+import hmac
+import itertools
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+
+from .compression import ENCODERS, choose_encoding
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование запроса целиком (view, фильтры, сериализаторы, запросы к БД) через cProfile.
+    Профилируется запрос с заголовком X-Profile-Token (или параметром ?_profile=<токен>),
+    запрос админа с заголовком X-Profile, а также каждый N-й запрос к действию viewset'а.
+    Результат сохраняется в PROFILING_DIR в формате pstats.
+    Если PROFILING_ENABLED выключен, middleware не подключается вовсе
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self._counters = {}
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        label = self._view_label(request, view_func)
+        if not (self._is_requested(request) or self._is_sampled(label)):
+            return None
+
+        profiler = cProfile.Profile()
+        response = profiler.runcall(self._render_view, request, view_func, view_args, view_kwargs)
+        response['X-Profile-Id'] = self._dump(profiler, label)
+        return response
+
+    @staticmethod
+    def _render_view(request, view_func, view_args, view_kwargs):
+        response = view_func(request, *view_args, **view_kwargs)
+        # Рендеринг ответа DRF тоже попадает в профиль
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        return response
+
+    @staticmethod
+    def _view_label(request, view_func):
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None:
+            return view_func.__name__
+        actions = getattr(view_func, 'actions', None) or {}
+        return f'{view_class.__name__}.{actions.get(request.method.lower(), request.method.lower())}'
+
+    @staticmethod
+    def _is_requested(request):
+        token = settings.PROFILING_TOKEN
+        if token and any(hmac.compare_digest(candidate.encode(), token.encode())
+                         for candidate in (request.headers.get('X-Profile-Token'), request.GET.get('_profile'))
+                         if candidate is not None):
+            return True
+        if 'X-Profile' not in request.headers:
+            return False
+        user = ProfilingMiddleware._api_user(request)
+        return user is not None and user.is_staff
+
+    @staticmethod
+    def _api_user(request):
+        """
+        Пользователь API: middleware выполняется до DRF, поэтому токен проверяется теми же классами аутентификации.
+        Если ни один не подошёл - пользователь сессии (админка)
+        """
+        for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            try:
+                result = authentication_class().authenticate(request)
+            except APIException:
+                return None
+            if result is not None:
+                return result[0]
+        return getattr(request, 'user', None)
+
+    def _is_sampled(self, label):
+        rate = settings.PROFILING_SAMPLE_RATE
+        if not rate:
+            return False
+        counter = self._counters.setdefault(label, itertools.count(1))
+        return next(counter) % rate == 0
+
+    @staticmethod
+    def _dump(profiler, label):
+        profiles_dir = Path(settings.PROFILING_DIR)
+        profiles_dir.mkdir(parents=True, exist_ok=True)
+        file_name = f'{time.strftime("%Y%m%d-%H%M%S")}-{label}-{uuid.uuid4().hex[:8]}.prof'
+        profiler.dump_stats(profiles_dir / file_name)
+
+        # Храним только последние PROFILING_MAX_FILES профилей
+        profiles = sorted(profiles_dir.glob('*.prof'), key=lambda path: path.stat().st_mtime, reverse=True)
+        for old_profile in profiles[settings.PROFILING_MAX_FILES:]:
+            old_profile.unlink(missing_ok=True)
+        return file_name
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов по Accept-Encoding: br или zstd (если установлены пакеты brotli / zstandard) либо gzip.
+    Ответы меньше COMPRESSION_MIN_SIZE байт и потоковые ответы не сжимаются
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding') \
+                or len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+        compressed = ENCODERS[encoding](response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # Сжатое представление не совпадает побайтно с исходным, поэтому ETag становится слабым
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_order_status_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionPayload',
+            fields=[
+                ('collection', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='api.collection')),
+                ('data', models.JSONField()),
+            ],
+            options={
+                'db_table': 'api_collection_payload',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_collection_payload'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='productreview',
+            options={'ordering': ['-updated_at', '-id'], 'verbose_name': 'Отзыв', 'verbose_name_plural': 'Отзывы'},
+        ),
+        migrations.AlterField(
+            model_name='productreview',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='productreview',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='productreview',
+            index=models.Index(fields=['product', 'updated_at', 'id'], name='review_product_updated_idx'),
+        ),
+    ]
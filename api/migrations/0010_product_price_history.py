@@ -0,0 +1,63 @@
+# Generated by Django 3.2.3 on 2026-10-19 12:08
+
+import datetime
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+# Начальная запись истории для существующих товаров: текущая цена действует с даты создания товара
+def create_initial_prices(apps, schema_editor):
+    Product = apps.get_model('api', 'Product')
+    ProductPrice = apps.get_model('api', 'ProductPrice')
+    batch = []
+    for product_id, price, created_at in Product.objects.values_list('id', 'price', 'created_at').iterator():
+        valid_from = datetime.datetime.combine(created_at, datetime.time.min)
+        batch.append(ProductPrice(product_id=product_id, price=price,
+                                  valid_from=django.utils.timezone.make_aware(valid_from)))
+        if len(batch) >= 5000:
+            ProductPrice.objects.bulk_create(batch)
+            batch = []
+    ProductPrice.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_order_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='placed_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='placed_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ProductPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.FloatField(validators=[django.core.validators.MinValueValidator(0)])),
+                ('valid_from', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='api.product')),
+            ],
+            options={
+                'verbose_name': 'Цена товара',
+                'verbose_name_plural': 'История цен товаров',
+                'db_table': 'api_product_price',
+                'ordering': ['-valid_from'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='productprice',
+            index=models.Index(fields=['product', 'valid_from'], name='price_product_valid_from_idx'),
+        ),
+        migrations.RunPython(create_initial_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.3 on 2026-10-19 12:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_product_price_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='productreview',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
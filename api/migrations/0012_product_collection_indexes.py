@@ -0,0 +1,21 @@
+# Generated by Django 3.2.3 on 2026-10-19 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_order_review_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productcollection',
+            index=models.Index(fields=['collection', 'product'], name='collection_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcollection',
+            index=models.Index(fields=['product', 'collection'], name='product_collection_idx'),
+        ),
+    ]
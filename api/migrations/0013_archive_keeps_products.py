@@ -0,0 +1,24 @@
+# Generated by Django 3.2.3 on 2026-10-19 12:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_product_collection_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedproductorder',
+            name='product',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='archived_positions', to='api.product'),
+        ),
+        migrations.AlterField(
+            model_name='changelogentry',
+            name='action',
+            field=models.CharField(choices=[('CREATE', 'Создание'), ('UPDATE', 'Изменение'), ('DELETE', 'Удаление'), ('ARCHIVE', 'Перенос в архив')], max_length=10),
+        ),
+    ]
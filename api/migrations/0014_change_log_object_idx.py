@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_archive_keeps_products'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['model', 'object_id', 'seq'], name='change_log_object_idx'),
+        ),
+    ]
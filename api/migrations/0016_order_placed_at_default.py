@@ -0,0 +1,19 @@
+# Generated by Django 3.2.3 on 2026-10-19 13:03
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_archived_order_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='placed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, null=True),
+        ),
+    ]
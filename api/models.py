@@ -1,6 +1,8 @@
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.utils import timezone
 
 
 # Абстрактный базовый клас
@@ -25,6 +27,13 @@ class OrderStatusChoices(models.TextChoices):
     DONE = "DONE", "Завершен"
 
 
+# Допустимые переходы статуса заказа: целевой статус -> статус, из которого в него можно перейти
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatusChoices.IN_PROGRESS: OrderStatusChoices.NEW,
+    OrderStatusChoices.DONE: OrderStatusChoices.IN_PROGRESS,
+}
+
+
 # Товар
 class Product(CommonInfo):
     """
@@ -33,6 +42,13 @@ class Product(CommonInfo):
     def __str__(self):
         return f"id: {self.id}  name: {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Цена при загрузке: по ней сигнал решает, нужна ли новая запись в истории цен
+        instance._loaded_price = instance.__dict__.get('price')
+        return instance
+
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
@@ -43,6 +59,30 @@ class Product(CommonInfo):
     price = models.FloatField(validators=[MinValueValidator(0)])
 
 
+# История цен товара
+class ProductPrice(models.Model):
+    """
+    История цен товара, записи только добавляются: цена действует с valid_from до следующей записи (см. api.prices)
+    """
+
+    def __str__(self):
+        return f"product: {self.product_id} price: {self.price} from: {self.valid_from}"
+
+    class Meta:
+        verbose_name = 'Цена товара'
+        verbose_name_plural = 'История цен товаров'
+        db_table = 'api_product_price'
+        ordering = ['-valid_from']
+        indexes = [
+            # Цена на момент времени - один проход по индексу: product_id = X AND valid_from <= T, последняя запись
+            models.Index(fields=['product', 'valid_from'], name='price_product_valid_from_idx'),
+        ]
+
+    product = models.ForeignKey(Product, related_name='price_history', on_delete=models.CASCADE)
+    price = models.FloatField(validators=[MinValueValidator(0)])
+    valid_from = models.DateTimeField(default=timezone.now)
+
+
 # Отзыв к товару
 class ProductReview(CommonInfo):
     """
@@ -54,12 +94,22 @@ class ProductReview(CommonInfo):
     class Meta:
         verbose_name = "Отзыв"
         verbose_name_plural = "Отзывы"
-        ordering = ["-updated_at", "-created_at"]
-
+        # id - уникальный тайбрейкер для отзывов с одинаковым временем обновления
+        ordering = ["-updated_at", "-id"]
+        indexes = [
+            # Страница отзывов товара читается одним проходом по индексу
+            models.Index(fields=['product', 'updated_at', 'id'], name='review_product_updated_idx'),
+        ]
+
+    # Время вместо даты: по дате многие отзывы совпадают и порядок становится недетерминированным
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     text = models.TextField()
     rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
+    # Версия для оптимистичной блокировки (см. api.concurrency), отдаётся клиенту в ETag
+    version = models.PositiveIntegerField(default=1)
 
 
 # Заказы
@@ -69,7 +119,10 @@ class Order(CommonInfo):
     """
 
     def __str__(self):
-        return f"id: {self.id} user: {self.user} status: {self.status} positions: {len(self.positions.all())}"
+        # Количество позиций выводится, только если оно посчитано в запросе (annotate), без запроса на каждый заказ
+        positions_count = getattr(self, 'positions_count', None)
+        positions = f" positions: {positions_count}" if positions_count is not None else ""
+        return f"id: {self.id} user: {self.user_id} status: {self.status}{positions}"
 
     class Meta:
         verbose_name = 'Заказ'
@@ -80,6 +133,33 @@ class Order(CommonInfo):
     products = models.ManyToManyField(Product, through='ProductOrder')
     status = models.CharField(max_length=20, choices=OrderStatusChoices.choices, default=OrderStatusChoices.NEW)
     order_sum = models.FloatField(validators=[MinValueValidator(0)])
+    # Время оформления: по нему берутся цены позиций из истории цен. У старых заказов пусто, используется created_at.
+    # Не auto_now_add: сериализатор передаёт момент, на который посчитал сумму заказа
+    placed_at = models.DateTimeField(default=timezone.now, null=True)
+    # Версия для оптимистичной блокировки (см. api.concurrency), отдаётся клиенту в ETag
+    version = models.PositiveIntegerField(default=1)
+
+
+# История статусов заказа
+class OrderStatusHistory(models.Model):
+    """
+    Журнал смены статусов заказа, записи только добавляются
+    """
+
+    def __str__(self):
+        return f"order: {self.order_id} {self.from_status} -> {self.to_status}"
+
+    class Meta:
+        verbose_name = 'Смена статуса заказа'
+        verbose_name_plural = 'История статусов заказов'
+        db_table = 'api_order_status_history'
+        ordering = ['-changed_at']
+
+    order = models.ForeignKey(Order, related_name='status_history', on_delete=models.CASCADE)
+    from_status = models.CharField(max_length=20, choices=OrderStatusChoices.choices)
+    to_status = models.CharField(max_length=20, choices=OrderStatusChoices.choices)
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, on_delete=models.DO_NOTHING)
+    changed_at = models.DateTimeField(auto_now_add=True)
 
 
 # Подборки
@@ -101,6 +181,20 @@ class Collection(CommonInfo):
     products = models.ManyToManyField(Product, through='ProductCollection')
 
 
+# Готовое представление подборки
+class CollectionPayload(models.Model):
+    """
+    Сериализованная подборка вместе со списком товаров.
+    Пересобирается при изменении подборки или входящих в неё товаров (см. api.signals)
+    """
+
+    class Meta:
+        db_table = 'api_collection_payload'
+
+    collection = models.OneToOneField(Collection, primary_key=True, related_name='payload', on_delete=models.CASCADE)
+    data = models.JSONField()
+
+
 # Модели для создания связей многие-ко-многим
 class ProductOrder(models.Model):
     """
@@ -115,6 +209,52 @@ class ProductOrder(models.Model):
     amount = models.IntegerField(validators=[MinValueValidator(1)])
 
 
+# Архив заказов
+class ArchivedOrder(models.Model):
+    """
+    Завершённые заказы, перенесённые из api_order командой archive_orders (см. api.archive).
+    id и даты сохраняются от исходного заказа
+    """
+
+    def __str__(self):
+        return f"id: {self.id} user: {self.user_id} status: {self.status} (архив)"
+
+    class Meta:
+        verbose_name = 'Архивный заказ'
+        verbose_name_plural = 'Архив заказов'
+        db_table = 'api_order_archive'
+        ordering = ['-updated_at', '-created_at']
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='archived_orders', on_delete=models.DO_NOTHING)
+    status = models.CharField(max_length=20, choices=OrderStatusChoices.choices, default=OrderStatusChoices.DONE)
+    order_sum = models.FloatField(validators=[MinValueValidator(0)])
+    version = models.PositiveIntegerField(default=1)
+    # Без auto_now_add: даты переносятся из исходного заказа
+    created_at = models.DateField(db_index=True)
+    updated_at = models.DateField()
+    placed_at = models.DateTimeField(null=True)
+    # Смены статусов из api_order_status_history: [{"from_status", "to_status", "changed_by", "changed_at"}]
+    status_history = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class ArchivedProductOrder(models.Model):
+    """
+    Позиции архивных заказов
+    """
+
+    class Meta:
+        db_table = 'api_product_order_archive'
+
+    id = models.BigIntegerField(primary_key=True)
+    # Удаление товара не должно удалять финансовую историю: без внешнего ключа в базе, id товара сохраняется
+    product = models.ForeignKey(Product, related_name='archived_positions', on_delete=models.DO_NOTHING,
+                                db_constraint=False)
+    order = models.ForeignKey(ArchivedOrder, related_name='positions', on_delete=models.CASCADE)
+    amount = models.IntegerField(validators=[MinValueValidator(1)])
+
+
 class ProductCollection(models.Model):
     """
     Модель для связи многие-ко-многим Product и Collection
@@ -122,6 +262,12 @@ class ProductCollection(models.Model):
 
     class Meta:
         db_table = 'api_product_collections'
+        indexes = [
+            # Товары подборки (?collection= у товаров) и подборки товара (?product= у подборок):
+            # соединение и сортировка по id второй таблицы читаются из одного индекса
+            models.Index(fields=['collection', 'product'], name='collection_product_idx'),
+            models.Index(fields=['product', 'collection'], name='product_collection_idx'),
+        ]
 
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     collection = models.ForeignKey(Collection, related_name='products_list', on_delete=models.CASCADE)
@@ -131,3 +277,102 @@ class ProductCollection(models.Model):
 class Favorites(models.Model):
     product = models.ForeignKey(Product, related_name='product', on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+
+
+# Корзина
+class Cart(models.Model):
+    """
+    Копия корзины пользователя в базе на случай потери кеша (основное хранилище - кеш, см. api.carts)
+    """
+
+    class Meta:
+        verbose_name = 'Корзина'
+        verbose_name_plural = 'Корзины'
+        db_table = 'api_cart'
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, primary_key=True, related_name='cart',
+                                on_delete=models.CASCADE)
+    # {"<id товара>": {"name": ..., "price": ..., "amount": ...}}
+    items = models.JSONField(default=dict)
+    total = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+# Фоновые задачи
+class JobStatusChoices(models.TextChoices):
+    """
+    Модель для поля status в моделе Job
+    """
+    QUEUED = "QUEUED", "В очереди"
+    RUNNING = "RUNNING", "Выполняется"
+    DONE = "DONE", "Выполнена"
+    FAILED = "FAILED", "Ошибка"
+
+
+class Job(models.Model):
+    """
+    Модель для очереди фоновых задач (см. api.queue)
+    """
+
+    def __str__(self):
+        return f"id: {self.id} name: {self.name} status: {self.status}"
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=JobStatusChoices.choices, default=JobStatusChoices.QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    # Когда задачу можно выполнять (для повторов с задержкой)
+    run_at = models.DateTimeField(default=timezone.now)
+    # До какого момента задача закреплена за воркером, после - её может забрать другой воркер
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+# Журнал изменений
+class ChangeActionChoices(models.TextChoices):
+    """
+    Модель для поля action в моделе ChangeLogEntry
+    """
+    CREATE = "CREATE", "Создание"
+    UPDATE = "UPDATE", "Изменение"
+    DELETE = "DELETE", "Удаление"
+    # Заказ перенесён в архивные таблицы (api.archive): он не удалён, а доступен как архивный
+    ARCHIVE = "ARCHIVE", "Перенос в архив"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Модель для журнала изменений каталога и заказов (только добавление записей).
+    Записывается в той же транзакции, что и само изменение (см. api.changes)
+    """
+
+    def __str__(self):
+        return f"seq: {self.seq} {self.action} {self.model} {self.object_id}"
+
+    class Meta:
+        verbose_name = 'Запись журнала изменений'
+        verbose_name_plural = 'Журнал изменений'
+        db_table = 'api_change_log'
+        ordering = ['seq']
+        indexes = [
+            # Последняя запись объекта при сжатии журнала (api.changes.compact_changes)
+            models.Index(fields=['model', 'object_id', 'seq'], name='change_log_object_idx'),
+        ]
+
+    # Возрастающий номер записи, по нему потребители синхронизируются (?since=<seq>)
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ChangeActionChoices.choices)
+    # Состояние объекта после изменения (для удаления - перед удалением)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
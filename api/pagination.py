@@ -0,0 +1,57 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class ReviewCursorPagination(CursorPagination):
+    """
+    Постраничная выдача отзывов по ключу (updated_at, id) вместо смещения.
+    Включается параметром ?page_size=, без него список отдаётся целиком
+    """
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-updated_at', '-id')
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Постраничная выдача товаров и подборок по id, включается параметром ?page_size=.
+    С фильтром по подборке / товару порядок по id совпадает с порядком составного индекса api_product_collections
+    """
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = 'id'
+
+
+class OrderPagination(LimitOffsetPagination):
+    """
+    Постраничная выдача заказов по смещению, включается параметром ?page_size=.
+    Смещение, а не курсор: список может объединять основную таблицу с архивом (см. api.archive.MergedOrders)
+    """
+    default_limit = None
+    limit_query_param = 'page_size'
+    max_limit = 100
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц в админке: для списка без фильтров на Postgres
+    берёт оценку числа строк из статистики планировщика вместо COUNT(*)
+    """
+    # Ниже этого числа строк считаем точно
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > self.estimate_threshold:
+                return int(row[0])
+        return super().count
@@ -0,0 +1,54 @@
+from django.db import transaction
+
+from .models import Collection, CollectionPayload, ProductCollection
+from .serializers import CollectionSerializer
+
+
+def _build_payloads(collection_ids):
+    collections = Collection.objects.filter(id__in=collection_ids).prefetch_related('products_list__product')
+    return [CollectionPayload(collection=collection, data=CollectionSerializer(collection).data)
+            for collection in collections]
+
+
+def rebuild_collection_payloads(collection_ids):
+    """
+    Пересобирает готовые представления подборок с переданными id
+    """
+    collection_ids = set(collection_ids)
+    if not collection_ids:
+        return []
+    payloads = _build_payloads(collection_ids)
+    with transaction.atomic():
+        CollectionPayload.objects.filter(collection_id__in=collection_ids).delete()
+        # Строку могла успеть вставить параллельная сборка при чтении, она собрана по тем же данным
+        CollectionPayload.objects.bulk_create(payloads, ignore_conflicts=True)
+    return payloads
+
+
+def invalidate_collection_payloads(collection_ids):
+    """
+    Удаляет готовые представления подборок, они соберутся заново при следующем чтении
+    """
+    CollectionPayload.objects.filter(collection_id__in=collection_ids).delete()
+
+
+def rebuild_product_collections(product_id):
+    """
+    Пересобирает все подборки, в которые входит товар
+    """
+    collection_ids = ProductCollection.objects.filter(product_id=product_id).values_list('collection_id', flat=True)
+    return rebuild_collection_payloads(collection_ids)
+
+
+def get_collection_payloads(collections):
+    """
+    Возвращает готовые представления подборок, недостающие собираются и сохраняются
+    """
+    missing_ids = [collection.id for collection in collections if not hasattr(collection, 'payload')]
+    payloads = _build_payloads(missing_ids) if missing_ids else []
+    # Недостающие строки только вставляются: одновременные промахи по одной подборке не удаляют
+    # чужие строки и не падают на уникальности, лишняя вставка пропускается
+    CollectionPayload.objects.bulk_create(payloads, ignore_conflicts=True)
+    built = {payload.collection_id: payload.data for payload in payloads}
+    return [collection.payload.data if hasattr(collection, 'payload') else built[collection.id]
+            for collection in collections]
@@ -0,0 +1,143 @@
+from django.db import transaction
+from django.db.models import DateTimeField, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .changes import record_changes
+from .models import Product, ProductPrice, ProductOrder, Order, ProductCollection, ChangeActionChoices
+from .product_cache import invalidate_product
+from .summaries import invalidate_order_summary
+
+
+def record_price(product):
+    """
+    Добавляет в историю текущую цену товара, действующую с этого момента
+    """
+    return ProductPrice.objects.create(product=product, price=product.price)
+
+
+def price_at(product_id, moment):
+    """
+    Цена товара на момент времени: одна проба индекса (product_id, valid_from).
+    Из записей с одинаковым valid_from действует добавленная последней. Если истории на этот момент нет, возвращается None
+    """
+    return ProductPrice.objects.filter(product_id=product_id, valid_from__lte=moment) \
+        .order_by('-valid_from', '-id').values_list('price', flat=True).first()
+
+
+def annotate_position_prices(positions):
+    """
+    Добавляет к позициям заказов unit_price - цену товара на момент оформления заказа.
+    Для старых заказов без placed_at берётся начало дня created_at, без истории цен - текущая цена товара
+    """
+    placed_at = Coalesce(OuterRef('order__placed_at'), Cast(OuterRef('order__created_at'), DateTimeField()))
+    history_price = ProductPrice.objects.filter(product_id=OuterRef('product_id'), valid_from__lte=placed_at) \
+        .order_by('-valid_from', '-id').values('price')[:1]
+    # Текущая цена - подзапросом, а не JOIN: у архивной позиции товар может быть уже удалён
+    current_price = Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1]
+    return positions.annotate(unit_price=Coalesce(Subquery(history_price), Subquery(current_price),
+                                                  output_field=FloatField()))
+
+
+def order_sums(order_ids):
+    """
+    Суммы заказов по ценам на момент оформления: {id заказа: сумма}, один запрос
+    """
+    rows = annotate_position_prices(ProductOrder.objects.filter(order_id__in=order_ids)) \
+        .values('order_id').annotate(total=Sum(F('unit_price') * F('amount'), output_field=FloatField())) \
+        .order_by()
+    return {row['order_id']: round(row['total'], 2) for row in rows}
+
+
+def prices_at(product_ids, moment):
+    """
+    Цены товаров на момент времени: {id товара: цена}, один запрос.
+    Тот же источник, что у annotate_position_prices: история цен, без истории - текущая цена товара
+    """
+    return dict(Product.objects.filter(id__in=product_ids)
+                .annotate(unit_price=Coalesce(Subquery(_current_price(moment)), F('price'), output_field=FloatField()))
+                .values_list('id', 'unit_price'))
+
+
+def audit_order_sums(orders, batch_size=1000, fix=False):
+    """
+    Сверяет order_sum заказов с суммой по истории цен пачками по batch_size.
+    Возвращает список расхождений (id, сохранённая сумма, сумма по истории); с fix=True исправляет их
+    """
+    mismatches = []
+    order_ids = list(orders.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(order_ids), batch_size):
+        batch = Order.objects.filter(id__in=order_ids[start:start + batch_size]).only('id', 'user_id', 'order_sum')
+        expected = order_sums([order.id for order in batch])
+        wrong = [order for order in batch if round(order.order_sum, 2) != expected.get(order.id, 0)]
+        mismatches.extend((order.id, order.order_sum, expected.get(order.id, 0)) for order in wrong)
+        if fix and wrong:
+            for order in wrong:
+                order.order_sum = expected.get(order.id, 0)
+                # Исправление - тоже изменение заказа: клиент со старой версией получит 412
+                order.version = F('version') + 1
+            Order.objects.bulk_update(wrong, ['order_sum', 'version'])
+            # bulk_update не отправляет сигналы
+            invalidate_order_summary(*(order.user_id for order in wrong))
+            record_changes(Order.objects.filter(id__in=[order.id for order in wrong]), ChangeActionChoices.UPDATE)
+    return mismatches
+
+
+@transaction.atomic
+def import_prices(rows, batch_size=5000):
+    """
+    Пакетная загрузка цен (ночной прайс-лист): rows - (id товара, цена, начало действия).
+    История пополняется bulk_create, текущая цена товаров обновляется одним UPDATE
+    по последней уже действующей записи истории. Цены с будущей датой становятся текущими
+    при запуске promote_due_prices. Возвращает число загруженных записей
+    """
+    written = 0
+    product_ids = set()
+    batch = []
+    for product_id, price, valid_from in rows:
+        batch.append(ProductPrice(product_id=product_id, price=price, valid_from=valid_from))
+        product_ids.add(product_id)
+        if len(batch) >= batch_size:
+            written += len(ProductPrice.objects.bulk_create(batch))
+            batch = []
+    written += len(ProductPrice.objects.bulk_create(batch))
+    if product_ids:
+        _apply_current_prices(product_ids)
+    return written
+
+
+def _current_price(moment=None):
+    return ProductPrice.objects.filter(product_id=OuterRef('pk'), valid_from__lte=moment or timezone.now()) \
+        .order_by('-valid_from', '-id').values('price')[:1]
+
+
+def _apply_current_prices(product_ids):
+    """
+    Переносит в Product.price последнюю уже действующую цену из истории одним UPDATE
+    """
+    # api.payloads импортирует сериализаторы, а они - этот модуль
+    from .payloads import rebuild_collection_payloads
+
+    # UPDATE без сигналов: запись истории уже сделана, подборки и журнал изменений обновляются здесь
+    Product.objects.filter(id__in=product_ids).update(price=Coalesce(Subquery(_current_price()), F('price')))
+    rebuild_collection_payloads(
+        ProductCollection.objects.filter(product_id__in=product_ids).values_list('collection_id', flat=True)
+    )
+    record_changes(Product.objects.filter(id__in=product_ids), ChangeActionChoices.UPDATE)
+    invalidate_product(*product_ids)
+
+
+@transaction.atomic
+def promote_due_prices():
+    """
+    Переносит в текущую цену товаров наступившие цены из истории (загруженные import_prices с будущей датой).
+    Запускается по расписанию командой promote_prices; возвращает id товаров, у которых изменилась цена
+    """
+    product_ids = list(
+        Product.objects.annotate(due_price=Subquery(_current_price()))
+        .filter(due_price__isnull=False).exclude(price=F('due_price'))
+        .values_list('id', flat=True)
+    )
+    if product_ids:
+        _apply_current_prices(product_ids)
+    return product_ids
@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class LocalLRU:
+    """
+    Кеш в памяти процесса: не больше max_size записей, каждая живёт ttl секунд
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Объединение одновременных запросов: пока первый поток вычисляет значение по ключу,
+    остальные потоки с тем же ключом ждут и получают его результат (или его исключение)
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+
+local_cache = LocalLRU(settings.PRODUCT_CACHE_LOCAL_SIZE, settings.PRODUCT_CACHE_LOCAL_SECONDS)
+_single_flight = SingleFlight()
+
+
+def _version_key(product_id):
+    return f'product-version:{product_id}'
+
+
+def _get_version(product_id):
+    """
+    Версия товара в общем кеше. Версия - отметка времени, поэтому после вытеснения ключа
+    новая версия не совпадёт ни с одной из закешированных раньше
+    """
+    key = _version_key(product_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_product_data(product_id, loader):
+    """
+    Представление товара из двухуровневого кеша: LRU процесса, затем общий кеш, затем loader().
+    Запись LRU действительна, только пока совпадает версия товара в общем кеше. Версия сверяется
+    не чаще раза в PRODUCT_CACHE_VERSION_CHECK_SECONDS: между сверками попадание в LRU не обращается
+    к общему кешу, а изменение товара в другом процессе видно с задержкой не больше этого интервала
+    (в своём процессе - сразу, invalidate_product удаляет запись LRU).
+    При промахе loader вызывается один раз на процесс, даже если товар одновременно запрашивают многие потоки
+    """
+    entry = local_cache.get(product_id)
+    now = time.monotonic()
+    if entry is not None and now - entry[2] < settings.PRODUCT_CACHE_VERSION_CHECK_SECONDS:
+        return entry[1]
+
+    version = _get_version(product_id)
+    if entry is not None and entry[0] == version:
+        # Запись изменяется на месте: срок жизни в LRU отсчитывается от загрузки, а не от сверки
+        entry[2] = now
+        return entry[1]
+
+    def load():
+        shared_key = f'product:{product_id}:{version}'
+        data = cache.get(shared_key)
+        if data is None:
+            data = loader()
+            cache.set(shared_key, data, settings.PRODUCT_CACHE_SECONDS)
+        local_cache.set(product_id, [version, data, time.monotonic()])
+        return data
+
+    return _single_flight.do((product_id, version), load)
+
+
+def invalidate_product(*product_ids):
+    """
+    Меняет версию товаров сразу и ещё раз после коммита,
+    чтобы параллельный запрос не закешировал данные до коммита
+    """
+    def bump():
+        version = time.time_ns()
+        cache.set_many({_version_key(product_id): version for product_id in product_ids}, None)
+        for product_id in product_ids:
+            local_cache.delete(product_id)
+
+    bump()
+    transaction.on_commit(bump)
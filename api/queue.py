@@ -0,0 +1,132 @@
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job, JobStatusChoices
+
+logger = logging.getLogger(__name__)
+
+# Зарегистрированные функции фоновых задач по имени
+_registry = {}
+
+
+def task(func):
+    """
+    Регистрирует функцию как фоновую задачу. Аргументы задачи должны сериализоваться в JSON
+    """
+    _registry[func.__name__] = func
+    return func
+
+
+def enqueue(name, max_attempts=None, **payload):
+    """
+    Ставит задачу в очередь после коммита текущей транзакции:
+    если транзакция откатится, задача не появится, а запрос не ждёт её выполнения
+    """
+    if name not in _registry:
+        raise KeyError(f'Неизвестная задача: {name}')
+    transaction.on_commit(lambda: Job.objects.create(
+        name=name, payload=payload, max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    ))
+
+
+def retry_delay(attempts):
+    """
+    Экспоненциальная задержка перед повтором: JOB_RETRY_BACKOFF * 2^(попытка - 1), не больше JOB_RETRY_BACKOFF_MAX
+    """
+    return min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+
+
+class Worker:
+    """
+    Воркер очереди. Забирает пачку задач через SELECT ... FOR UPDATE SKIP LOCKED,
+    поэтому несколько воркеров (и процессов) не получают одну и ту же задачу.
+    Задача закрепляется за воркером на JOB_VISIBILITY_TIMEOUT: если воркер упал,
+    по истечении этого времени её заберёт другой воркер
+    """
+
+    def __init__(self, batch_size=10, sleep=1.0):
+        self.batch_size = batch_size
+        self.sleep = sleep
+
+    def claim(self):
+        now = timezone.now()
+        with transaction.atomic():
+            # Воркер упал на последней попытке задачи: повторять её больше нельзя
+            Job.objects.filter(status=JobStatusChoices.RUNNING, locked_until__lt=now,
+                               attempts__gte=F('max_attempts')).update(
+                status=JobStatusChoices.FAILED, locked_until=None,
+                last_error='Воркер не завершил последнюю попытку за JOB_VISIBILITY_TIMEOUT',
+            )
+            jobs = list(
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(Q(status=JobStatusChoices.QUEUED, run_at__lte=now)
+                        | Q(status=JobStatusChoices.RUNNING, locked_until__lt=now, attempts__lt=F('max_attempts')))
+                .order_by('run_at', 'id')[:self.batch_size]
+            )
+            Job.objects.filter(id__in=[job.id for job in jobs]).update(
+                status=JobStatusChoices.RUNNING,
+                locked_until=now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT),
+                attempts=F('attempts') + 1,
+            )
+        for job in jobs:
+            job.attempts += 1
+        return jobs
+
+    def execute(self, job):
+        try:
+            _registry[job.name](**job.payload)
+        except Exception:
+            error = traceback.format_exc()
+            logger.exception('Задача %s (id: %s) завершилась ошибкой', job.name, job.id)
+            if job.attempts < job.max_attempts:
+                Job.objects.filter(id=job.id).update(
+                    status=JobStatusChoices.QUEUED, locked_until=None, last_error=error,
+                    run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+                )
+            else:
+                Job.objects.filter(id=job.id).update(status=JobStatusChoices.FAILED, locked_until=None,
+                                                     last_error=error)
+            return False
+        Job.objects.filter(id=job.id).update(status=JobStatusChoices.DONE, locked_until=None)
+        return True
+
+    def run_once(self):
+        """
+        Выполняет доступные задачи, пока очередь не опустеет. Возвращает число обработанных задач
+        """
+        processed = 0
+        while True:
+            jobs = self.claim()
+            if not jobs:
+                return processed
+            for job in jobs:
+                self.execute(job)
+            processed += len(jobs)
+
+    def run_forever(self):
+        """
+        Обрабатывает очередь, пока процесс не остановят. Ошибка итерации (например, потеря соединения с базой)
+        не завершает воркер: она пишется в лог, следующая попытка - через растущую паузу
+        """
+        failures = 0
+        while True:
+            # Как в конце запроса: закрываются соединения, оборванные базой или старше CONN_MAX_AGE
+            close_old_connections()
+            try:
+                processed = self.run_once()
+            except Exception:
+                failures += 1
+                delay = min(self.sleep * 2 ** failures, settings.JOB_WORKER_BACKOFF_MAX)
+                logger.exception('Ошибка воркера очереди, повтор через %s с', delay)
+                time.sleep(delay)
+                continue
+            failures = 0
+            if not processed:
+                time.sleep(self.sleep)
@@ -0,0 +1,46 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def to_columns(data):
+    """
+    Список объектов -> {"columns": [...], "rows": [[...], ...]}: имена полей передаются один раз.
+    Для постраничного ответа преобразуется список results, остальные данные не меняются
+    """
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return {**data, 'results': to_columns(data['results'])}
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        return data
+    columns = list(dict.fromkeys(name for row in data for name in row))
+    return {'columns': columns, 'rows': [[row.get(name) for name in columns] for row in data]}
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    Колоночный JSON для списков: Accept: application/vnd.columnar+json или ?format=columns
+    """
+    media_type = 'application/vnd.columnar+json'
+    format = 'columns'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(to_columns(data), accepted_media_type, renderer_context)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack: Accept: application/msgpack или ?format=msgpack. Подключается, только если установлен msgpack
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=JSONEncoder().default, use_bin_type=True)
@@ -0,0 +1,94 @@
+import hashlib
+import math
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from .models import ProductReview
+
+RATINGS = [1, 2, 3, 4, 5]
+PERCENTILES = [25, 50, 75, 90]
+
+
+def _percentile(distribution, total, percent):
+    """
+    Перцентиль оценки по распределению (метод ближайшего ранга): оценки дискретны,
+    поэтому достаточно накопленных количеств, выборка отдельных оценок не нужна
+    """
+    rank = max(1, math.ceil(percent / 100 * total))
+    cumulative = 0
+    for rating in RATINGS:
+        cumulative += distribution[rating]
+        if cumulative >= rank:
+            return rating
+    return None
+
+
+def _prior_mean():
+    """
+    Средняя оценка по всем отзывам - априорное значение для байесовской средней
+    """
+    mean = cache.get('review-stats-prior')
+    if mean is None:
+        mean = ProductReview.objects.aggregate(mean=Avg('rating'))['mean'] or 0
+        cache.set('review-stats-prior', mean, settings.REVIEW_STATS_CACHE_SECONDS)
+    return mean
+
+
+def get_review_stats(reviews, query_params):
+    """
+    Статистика отфильтрованных отзывов: распределение оценок, средняя и байесовская средняя, перцентили,
+    скорость появления отзывов и динамика по неделям.
+    Распределение и скорость считаются одним запросом с условной агрегацией, недели - одним GROUP BY.
+    Результат кешируется по набору параметров фильтрации
+    """
+    signature = hashlib.md5(urlencode(sorted(query_params.lists()), doseq=True).encode()).hexdigest()
+    key = f'review-stats:{signature}'
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    now = timezone.now()
+    aggregates = reviews.aggregate(
+        total=Count('id'),
+        average=Avg('rating'),
+        first=Min('created_at'),
+        last=Max('created_at'),
+        last_7_days=Count('id', filter=Q(created_at__gte=now - timedelta(days=7))),
+        last_30_days=Count('id', filter=Q(created_at__gte=now - timedelta(days=30))),
+        **{f'rating_{rating}': Count('id', filter=Q(rating=rating)) for rating in RATINGS},
+    )
+    weeks = reviews.order_by().annotate(week=TruncWeek('created_at')).values('week').annotate(
+        count=Count('id'), average=Avg('rating')).order_by('week')
+
+    total = aggregates['total']
+    distribution = {rating: aggregates[f'rating_{rating}'] for rating in RATINGS}
+    # Байесовская средняя: к отзывам добавляется REVIEW_STATS_PRIOR_WEIGHT "виртуальных" отзывов со средней оценкой,
+    # поэтому товар с парой оценок 5 не обгоняет товар с сотней оценок 4.8
+    prior_weight = settings.REVIEW_STATS_PRIOR_WEIGHT
+    bayesian = (prior_weight * _prior_mean() + (aggregates['average'] or 0) * total) / (prior_weight + total) \
+        if prior_weight + total else None
+    span_weeks = max((aggregates['last'] - aggregates['first']).days / 7, 1) if total else None
+
+    stats = {
+        'count': total,
+        'distribution': [{'rating': rating, 'count': distribution[rating]} for rating in RATINGS],
+        'average': round(aggregates['average'], 2) if total else None,
+        'bayesian_average': round(bayesian, 2) if bayesian is not None else None,
+        'percentiles': {f'p{percent}': _percentile(distribution, total, percent) if total else None
+                        for percent in PERCENTILES},
+        'velocity': {
+            'last_7_days': aggregates['last_7_days'],
+            'last_30_days': aggregates['last_30_days'],
+            'per_week': round(total / span_weeks, 2) if total else 0,
+        },
+        'weekly': [{'week': row['week'].date().isoformat(), 'count': row['count'],
+                    'average': round(row['average'], 2)} for row in weeks],
+    }
+    cache.set(key, stats, settings.REVIEW_STATS_CACHE_SECONDS)
+    return stats
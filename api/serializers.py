@@ -1,13 +1,75 @@
 import re
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import transaction
+from django.db import transaction, connection
 from django.db.models import ObjectDoesNotExist
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
 
-from .models import Product, ProductReview, Order, Collection, ProductOrder, Favorites
+from .changes import record_changes
+from .concurrency import claim_version
+from .exports import WRITERS
+from .models import Product, ProductReview, Order, Collection, ProductOrder, Favorites, OrderStatusChoices, \
+    OrderStatusHistory, ORDER_STATUS_TRANSITIONS, ChangeLogEntry, ChangeActionChoices, ArchivedOrder
+from .prices import order_sums, prices_at
+from .queue import enqueue
+from .summaries import invalidate_order_summary
+
+
+def parse_fields_param(value):
+    """
+    Список имён из параметра вида 'id,name,price'
+    """
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+class SparseFieldsMixin:
+    """
+    Выборочные поля в ответе на безопасные запросы:
+    ?fields=id,name оставляет только перечисленные поля,
+    ?expand=product заменяет id связанного объекта его представлением (поля из Meta.expandable_fields),
+    раскрытые поля попадают в ответ всегда.
+    Применяется только к сериализатору, созданному во view (с request в контексте), вложенные не затрагиваются
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self._context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+
+        expandable_fields = getattr(self.Meta, 'expandable_fields', {})
+        expand = parse_fields_param(request.query_params.get('expand'))
+        unknown = set(expand) - set(expandable_fields)
+        if unknown:
+            raise ValidationError({'expand': f'Поля нельзя раскрыть: {", ".join(sorted(unknown))}'})
+        for name in expand:
+            self.fields[name] = expandable_fields[name](read_only=True)
+
+        fields = parse_fields_param(request.query_params.get('fields'))
+        if fields:
+            unknown = set(fields) - set(self.fields)
+            if unknown:
+                raise ValidationError({'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}'})
+            for name in set(self.fields) - set(fields) - set(expand):
+                self.fields.pop(name)
+
+    def get_deferred_fields(self):
+        """
+        Колонки модели, которые не нужны оставшимся полям. Первичный и внешние ключи не откладываются:
+        они дешёвые и нужны для проверки прав и раскрытия связей
+        """
+        sources = [field.source_attrs for field in self.fields.values()]
+        if not all(sources):
+            # Поле с source='*' использует весь объект
+            return []
+        used = {source[0] for source in sources}
+        return [field.name for field in self.Meta.model._meta.concrete_fields
+                if not field.primary_key and not field.is_relation and field.name not in used]
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -21,7 +83,7 @@ class UserSerializer(serializers.ModelSerializer):
                   'last_name',)
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для товаров
     """
@@ -50,15 +112,18 @@ class ProductCollectionSerializer(serializers.Serializer):
     price = serializers.CharField(source='product.price', read_only=True)
 
 
-class ProductReviewSerializer(serializers.ModelSerializer):
+class ProductReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для отзывов
     """
     user = serializers.IntegerField(read_only=True, source='user.id')
+    author = UserSerializer(read_only=True, source='user')
 
     class Meta:
         model = ProductReview
-        fields = ['id', 'user', 'product', 'text', 'rating', 'created_at', 'updated_at']
+        fields = ['id', 'user', 'author', 'product', 'text', 'rating', 'version', 'created_at', 'updated_at']
+        read_only_fields = ['version']
+        expandable_fields = {'product': ProductSerializer}
 
     def validate(self, attrs):
         if self.context['view'].action == 'create':
@@ -80,8 +145,13 @@ class ProductReviewSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         return super().create(validated_data)
 
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        claim_version(instance, self.context.get('expected_version'))
+        return super().update(instance, validated_data)
 
-class OrderSerializer(serializers.ModelSerializer):
+
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для заказов
     """
@@ -89,8 +159,9 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ('id', 'user', 'positions', 'status', 'order_sum', 'created_at', 'updated_at')
-        read_only_fields = ['user', 'order_sum']
+        fields = ('id', 'user', 'positions', 'status', 'order_sum', 'version', 'created_at', 'updated_at')
+        read_only_fields = ['user', 'order_sum', 'version']
+        expandable_fields = {'user': UserSerializer}
 
     def validate(self, attrs):
         user = self.context['request'].user
@@ -104,12 +175,16 @@ class OrderSerializer(serializers.ModelSerializer):
             if len(products_ids_set) != len(positions):
                 raise ValidationError({'positions': 'В заказе содержатся дубли'})
 
-            price = (position['product']['id'].price for position in positions)
-            amount = (position['amount'] for position in positions)
-            order_sum = round(sum(price * amount for price, amount in zip(price, amount)), 2)
+            # Сумма считается по истории цен на момент оформления, как и в order_sums:
+            # запланированная, но ещё не действующая цена не расходится с Product.price
+            placed_at = timezone.now()
+            prices = prices_at(products_ids_set, placed_at)
+            order_sum = round(sum(prices[position['product']['id'].id] * position['amount']
+                                  for position in positions), 2)
 
             attrs['user'] = user
             attrs['order_sum'] = order_sum
+            attrs['placed_at'] = placed_at
 
         elif self.context['view'].action in ['update', 'partial_update']:
             # Поля, которые пользователь может изменить через patch-запрос:
@@ -118,6 +193,10 @@ class OrderSerializer(serializers.ModelSerializer):
             allowed_fields.add('status') if user.is_staff else allowed_fields
             if attrs.keys() - allowed_fields:
                 raise ValidationError({'error': f'Допустимые поля для изменения: {", ".join(sorted(allowed_fields))}'})
+            # Проверка допустимости перехода статуса:
+            status = attrs.get('status')
+            if status and status != self.instance.status and ORDER_STATUS_TRANSITIONS.get(status) != self.instance.status:
+                raise ValidationError({'status': f'Недопустимый переход статуса: {self.instance.status} -> {status}'})
 
         return attrs
 
@@ -136,10 +215,16 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
 
         ProductOrder.objects.bulk_create(positions_objs)
+        # bulk_create не отправляет сигналы, поэтому позиции записываются в журнал изменений здесь
+        record_changes(ProductOrder.objects.filter(order=order), ChangeActionChoices.CREATE)
+        # Побочные действия выполняются воркером очереди после коммита
+        enqueue('notify_order_created', order_id=order.id)
         return order
 
     @transaction.atomic
     def update(self, instance, validated_data):
+        # Версия занимается первой: позиции и сумма пересчитываются под блокировкой строки заказа
+        claim_version(instance, self.context.get('expected_version'))
         positions = validated_data.get('positions')
         # Обработка вложенного поля 'positions':
         if positions:
@@ -154,17 +239,94 @@ class OrderSerializer(serializers.ModelSerializer):
                     ProductOrder.objects.create(product_id=product_id, amount=amount, order=instance)
             validated_data.pop('positions')
 
-        # После обновления списка позиций пересчитать сумму заказа:
-        order_sum = round(sum(position.product.price * position.amount for position in
-                              ProductOrder.objects.filter(order=instance)), 2)
-
-        validated_data['order_sum'] = order_sum
+        # После обновления списка позиций пересчитать сумму заказа по ценам на момент оформления:
+        validated_data['order_sum'] = order_sums([instance.id]).get(instance.id, 0)
+        from_status = instance.status
         instance = super().update(instance, validated_data)
+        if instance.status != from_status:
+            OrderStatusHistory.objects.create(order=instance, from_status=from_status, to_status=instance.status,
+                                              changed_by=self.context['request'].user)
 
         return instance
 
 
-class CollectionSerializer(serializers.ModelSerializer):
+# Сколько id заказов передаётся в одном UPDATE при массовой смене статуса не на Postgres (лимит параметров SQLite - 999)
+TRANSITION_BATCH_SIZE = 900
+
+
+class ArchivedOrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Сериализатор для архивных заказов в списке заказов: те же поля, что у OrderSerializer, только чтение
+    """
+    positions = ProductOrderSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ArchivedOrder
+        fields = OrderSerializer.Meta.fields
+        read_only_fields = fields
+        expandable_fields = OrderSerializer.Meta.expandable_fields
+
+
+class OrderTransitionSerializer(serializers.Serializer):
+    """
+    Сериализатор для массовой смены статуса заказов
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    status = serializers.ChoiceField(choices=OrderStatusChoices.choices)
+
+    def validate_status(self, value):
+        if value not in ORDER_STATUS_TRANSITIONS:
+            raise ValidationError(f'В статус {value} нельзя перевести заказ')
+        return value
+
+    @staticmethod
+    def _id_batches(ids):
+        """
+        Пачки id для UPDATE: на Postgres все id уходят одним параметром-массивом (id = ANY(%s)),
+        на остальных базах - пачками по TRANSITION_BATCH_SIZE из-за ограничения числа параметров запроса
+        """
+        if connection.vendor == 'postgresql':
+            return [ids]
+        return [ids[start:start + TRANSITION_BATCH_SIZE] for start in range(0, len(ids), TRANSITION_BATCH_SIZE)]
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """
+        Переводит заказы условным UPDATE (на Postgres - одним, иначе пачками в одной транзакции),
+        возвращает id изменённых заказов
+        """
+        ids = sorted(set(validated_data['ids']))
+        to_status = validated_data['status']
+        from_status = ORDER_STATUS_TRANSITIONS[to_status]
+        updated_at = connection.ops.adapt_datefield_value(timezone.localdate())
+        rows = []
+        with connection.cursor() as cursor:
+            for batch in self._id_batches(ids):
+                if connection.vendor == 'postgresql':
+                    condition, params = 'id = ANY(%s)', [batch]
+                else:
+                    condition, params = f'id IN ({", ".join(["%s"] * len(batch))})', batch
+                cursor.execute(
+                    f'UPDATE {Order._meta.db_table} SET status = %s, updated_at = %s, version = version + 1 '
+                    f'WHERE status = %s AND {condition} RETURNING id, user_id',
+                    [to_status, updated_at, from_status, *params]
+                )
+                rows.extend(cursor.fetchall())
+        updated_ids = sorted(order_id for order_id, _ in rows)
+        # UPDATE в обход save(), поэтому сводки пользователей и журнал изменений обновляются здесь
+        invalidate_order_summary(*(user_id for _, user_id in rows))
+        for batch in self._id_batches(updated_ids):
+            record_changes(Order.objects.filter(id__in=batch), ChangeActionChoices.UPDATE)
+
+        user = self.context['request'].user
+        OrderStatusHistory.objects.bulk_create(
+            OrderStatusHistory(order_id=order_id, from_status=from_status, to_status=to_status, changed_by=user)
+            for order_id in updated_ids
+        )
+        return updated_ids
+
+
+class CollectionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для подборок товаров
     """
@@ -216,7 +378,7 @@ class CollectionSerializer(serializers.ModelSerializer):
         return instance
 
 
-class FavoritesSerializer(serializers.ModelSerializer):
+class FavoritesSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для товаров в избранном
     """
@@ -224,6 +386,7 @@ class FavoritesSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favorites
         fields = ('id', 'product',)
+        expandable_fields = {'product': ProductSerializer}
 
     def validate(self, attrs):
         existing_fav = Favorites.objects.filter(
@@ -235,4 +398,45 @@ class FavoritesSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class ChangeLogEntrySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Сериализатор для записей журнала изменений
+    """
+
+    class Meta:
+        model = ChangeLogEntry
+        fields = ('seq', 'model', 'object_id', 'action', 'data', 'created_at')
+
+
+class ChangeFeedQuerySerializer(serializers.Serializer):
+    """
+    Сериализатор для параметров запроса журнала изменений
+    """
+    since = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=settings.CHANGE_FEED_MAX_LIMIT, default=100)
+
+
+class OrderExportQuerySerializer(serializers.Serializer):
+    """
+    Сериализатор для параметров выгрузки заказов
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    # Не format: этот параметр DRF использует для выбора рендерера
+    export_format = serializers.ChoiceField(choices=list(WRITERS), default=next(iter(WRITERS)))
+
+    def validate(self, attrs):
+        if attrs.get('start') and attrs.get('end') and attrs['start'] > attrs['end']:
+            raise ValidationError({'end': 'Конец диапазона раньше начала'})
+        return attrs
+
+
+class CartItemSerializer(serializers.Serializer):
+    """
+    Сериализатор для добавления товара в корзину и изменения количества
+    """
+    product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.only('id', 'name', 'price'))
+    amount = serializers.IntegerField(min_value=1)
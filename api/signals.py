@@ -0,0 +1,93 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .changes import record_change, record_changes
+from .models import Product, Collection, ProductCollection, Order, ProductOrder, ProductReview, ChangeActionChoices
+from .payloads import rebuild_collection_payloads, rebuild_product_collections, invalidate_collection_payloads
+from .prices import record_price
+from .product_cache import invalidate_product
+from .summaries import invalidate_order_summary
+
+
+# Пересборка готовых представлений подборок.
+# При удалении связей представление только сбрасывается: подборка может удаляться в той же транзакции
+@receiver(post_save, sender=Collection)
+def collection_saved(sender, instance, **kwargs):
+    rebuild_collection_payloads([instance.id])
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    # Новый товар ещё не входит ни в одну подборку
+    if not created:
+        rebuild_product_collections(instance.id)
+
+
+# Сброс кеша карточки товара во всех процессах
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    invalidate_product(instance.id)
+
+
+@receiver(post_save, sender=Product)
+def product_price_changed(sender, instance, created, raw=False, **kwargs):
+    # Запись в историю цен при создании товара и при изменении цены; loaddata историю не пишет
+    price = instance.__dict__.get('price')
+    if raw or price is None:
+        return
+    if created or price != getattr(instance, '_loaded_price', None):
+        record_price(instance)
+        instance._loaded_price = price
+
+
+@receiver(post_save, sender=ProductCollection)
+def product_collection_saved(sender, instance, **kwargs):
+    rebuild_collection_payloads([instance.collection_id])
+
+
+@receiver(post_delete, sender=ProductCollection)
+def product_collection_deleted(sender, instance, **kwargs):
+    invalidate_collection_payloads([instance.collection_id])
+
+
+@receiver(m2m_changed, sender=Collection.products.through)
+def collection_products_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # Изменились подборки товара: instance - товар, pk_set - id подборок
+        if action == 'pre_clear':
+            invalidate_collection_payloads(
+                ProductCollection.objects.filter(product_id=instance.id).values_list('collection_id', flat=True)
+            )
+        elif action in ('post_add', 'post_remove'):
+            rebuild_collection_payloads(pk_set)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        rebuild_collection_payloads([instance.id])
+
+    # Изменение состава подборки попадает в журнал как изменение подборки
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            record_change(instance, ChangeActionChoices.UPDATE)
+        elif pk_set:
+            record_changes(Collection.objects.filter(id__in=pk_set), ChangeActionChoices.UPDATE)
+
+
+# Сброс сводки по заказам пользователя
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def order_changed(sender, instance, **kwargs):
+    invalidate_order_summary(instance.user_id)
+
+
+# Журнал изменений: запись в той же транзакции, что и изменение объекта
+def log_saved(sender, instance, created, **kwargs):
+    record_change(instance, ChangeActionChoices.CREATE if created else ChangeActionChoices.UPDATE)
+
+
+def log_deleted(sender, instance, **kwargs):
+    record_change(instance, ChangeActionChoices.DELETE)
+
+
+for logged_model in (Product, Order, ProductOrder, ProductReview, Collection):
+    post_save.connect(log_saved, sender=logged_model, dispatch_uid=f'change_log_save_{logged_model.__name__}')
+    post_delete.connect(log_deleted, sender=logged_model, dispatch_uid=f'change_log_delete_{logged_model.__name__}')
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum, Q
+
+from .models import Order, OrderStatusChoices, ArchivedOrder
+
+
+def _summary_key(user_id):
+    return f'order-summary:{user_id}'
+
+
+def get_order_summary(user):
+    """
+    Сводка по заказам пользователя: количество по статусам, общая сумма и последний заказ.
+    Берётся из кеша, при промахе считается агрегатными запросами по заказам и архиву и запросом последнего заказа
+    """
+    key = _summary_key(user.id)
+    summary = cache.get(key)
+    if summary is not None:
+        return summary
+
+    orders = Order.objects.filter(user=user)
+    aggregates = orders.aggregate(
+        total=Count('id'),
+        order_sum=Sum('order_sum'),
+        **{status: Count('id', filter=Q(status=status)) for status in OrderStatusChoices.values}
+    )
+    # В архиве только завершённые заказы
+    archived = ArchivedOrder.objects.filter(user=user).aggregate(total=Count('id'), order_sum=Sum('order_sum'))
+    aggregates['total'] += archived['total']
+    aggregates[OrderStatusChoices.DONE] += archived['total']
+    aggregates['order_sum'] = (aggregates['order_sum'] or 0) + (archived['order_sum'] or 0)
+
+    latest_order = orders.order_by('-created_at', '-id').values('id', 'status', 'order_sum', 'created_at').first()
+    if latest_order is None and archived['total']:
+        latest_order = ArchivedOrder.objects.filter(user=user).order_by('-created_at', '-id') \
+            .values('id', 'status', 'order_sum', 'created_at').first()
+    if latest_order:
+        latest_order['created_at'] = latest_order['created_at'].isoformat()
+
+    summary = {
+        'counts': {status: aggregates[status] for status in OrderStatusChoices.values},
+        'total': aggregates['total'],
+        'order_sum': round(aggregates['order_sum'], 2),
+        'latest_order': latest_order,
+    }
+    cache.set(key, summary, settings.ORDER_SUMMARY_CACHE_SECONDS)
+    return summary
+
+
+def invalidate_order_summary(*user_ids):
+    """
+    Сбрасывает сводку сразу и ещё раз после коммита,
+    чтобы параллельный запрос не закешировал данные до коммита
+    """
+    keys = [_summary_key(user_id) for user_id in set(user_ids)]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,127 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Ограничение частоты запросов скользящим окном: не больше N запросов за период.
+    Состояние - атомарные счётчики в общем кеше (THROTTLE_CACHE) для текущего и предыдущего окна,
+    число запросов за последний период оценивается как текущий счётчик плюс доля предыдущего,
+    приходящаяся на скользящее окно. На запрос - одна операция add/incr и одно чтение,
+    поэтому ограничение общее для всех процессов
+    """
+    scope = None
+
+    def __init__(self):
+        self.cache = caches[settings.THROTTLE_CACHE]
+        self.wait_seconds = None
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_ident_key(self, request):
+        """
+        Идентификатор клиента или None, если ограничение к запросу не применяется
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def parse_rate(rate):
+        num, period = rate.split('/')
+        return int(num), {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}[period[0]]
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        ident = self.get_ident_key(request) if rate else None
+        if ident is None:
+            return True
+
+        num_requests, period = self.parse_rate(rate)
+        now = time.time()
+        window = int(now // period)
+        key = f'throttle:{scope}:{ident}'
+        current_key = f'{key}:{window}'
+
+        self.cache.add(current_key, 0, timeout=period * 2)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # Ключ вытеснен из кеша между add и incr
+            self.cache.set(current_key, 1, timeout=period * 2)
+            current = 1
+        previous = self.cache.get(f'{key}:{window - 1}', 0)
+        elapsed = (now % period) / period
+        if previous * (1 - elapsed) + current <= num_requests:
+            return True
+
+        # Отклонённый запрос не учитывается в счётчике
+        self.cache.decr(current_key)
+        self.wait_seconds = self.retry_after(num_requests, period, previous, current - 1, elapsed)
+        return False
+
+    @staticmethod
+    def retry_after(num_requests, period, previous, current, elapsed):
+        """
+        Через сколько секунд оценка previous * (1 - elapsed) + current + 1 опустится до num_requests:
+        в текущем окне убывает только доля предыдущего, в следующем текущий счётчик становится предыдущим
+        """
+        free = num_requests - 1 - current
+        if free >= 0 and previous:
+            return max(1 - free / previous - elapsed, 0) * period
+        # В текущем окне места не будет: ждём следующее, где current займёт место previous
+        wait = (1 - elapsed) * period
+        if current:
+            wait += max(1 - (num_requests - 1) / current, 0) * period
+        return wait
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class AnonSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Ограничение для анонимных пользователей по IP
+    """
+    scope = 'anon'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f'ip:{self.get_ident(request)}'
+
+
+class UserSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Ограничение для авторизованных пользователей по id
+    """
+    scope = 'user'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return None
+
+
+class ScopedSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Ограничение по throttle_scope viewset'а; для записи используется отдельная норма '<scope>_write',
+    если она задана. Клиент определяется по пользователю, для анонимных - по IP
+    """
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope and request.method not in SAFE_METHODS \
+                and f'{scope}_write' in api_settings.DEFAULT_THROTTLE_RATES:
+            return f'{scope}_write'
+        return scope
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import ProductViewSet, ProductReviewViewSet, OrderViewSet, CollectionViewSet, FavoritesViewSet
+from .views import ProductViewSet, ProductReviewViewSet, OrderViewSet, CollectionViewSet, FavoritesViewSet, \
+    ChangeLogViewSet, CartViewSet
 
 router = DefaultRouter()
 router.register('products', ProductViewSet, 'products')
@@ -9,6 +10,8 @@ router.register('product-reviews', ProductReviewViewSet, 'product-reviews')
 router.register('orders', OrderViewSet, 'orders')
 router.register('collections', CollectionViewSet, 'product-collections')
 router.register('favorites', FavoritesViewSet, 'favorites')
+router.register('changes', ChangeLogViewSet, 'changes')
+router.register('cart', CartViewSet, 'cart')
 
 urlpatterns = [
     path('', include(router.urls)),
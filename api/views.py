@@ -1,36 +1,182 @@
+from django.conf import settings
 from django.db import transaction
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .filters import ProductFilter, ProductReviewFilter, OrderFilter, CollectionFilter
-from .models import Product, ProductReview, Order, Collection, Favorites
+from .archive import reaches_archive, MergedOrders
+from .carts import get_cart, add_item, set_item, remove_item, clear_cart, checkout_cart
+from .changes import get_changes
+from .concurrency import parse_if_match, make_etag
+from .db_routers import enable_replica_reads, reset_replica_reads, pin_to_primary, is_pinned_to_primary
+from .exports import WRITERS, iter_export
+from .facets import get_product_facets
+from .filters import ProductFilter, ProductReviewFilter, OrderFilter, ArchivedOrderFilter, CollectionFilter
+from .models import Product, ProductReview, Order, Collection, Favorites, ArchivedOrder
+from .pagination import ReviewCursorPagination, IdCursorPagination, OrderPagination
+from .payloads import get_collection_payloads
 from .permissions import IsOwnerOrAdmin
+from .product_cache import get_product_data
+from .review_stats import get_review_stats
 from .serializers import ProductSerializer, ProductReviewSerializer, OrderSerializer, CollectionSerializer, \
-    FavoritesSerializer
+    FavoritesSerializer, OrderTransitionSerializer, ChangeLogEntrySerializer, ChangeFeedQuerySerializer, \
+    CartItemSerializer, OrderExportQuerySerializer, ArchivedOrderSerializer, parse_fields_param
+from .summaries import get_order_summary
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ReplicaRoutingMixin:
+    """
+    Миксин для чтения безопасных запросов с реплики.
+    После успешной записи пользователь закрепляется за основной базой (см. api.db_routers)
+    """
+    read_from_replica = True
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.read_from_replica and request.method in SAFE_METHODS and not is_pinned_to_primary(request.user):
+            self._replica_reads_token = enable_replica_reads()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_reads_token', None)
+        if token is not None:
+            reset_replica_reads(token)
+            self._replica_reads_token = None
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class SparseFieldsViewMixin:
+    """
+    Миксин для ?fields= и ?expand= (см. SparseFieldsMixin в api.serializers):
+    колонки, не нужные выбранным полям, не читаются из базы, раскрытые связи загружаются одним запросом
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        serializer = self.get_serializer()
+        deferred = set(serializer.get_deferred_fields())
+        # Колонки сортировки нужны пагинации для построения курсора
+        ordering = getattr(self.paginator, 'ordering', None) or queryset.query.order_by or queryset.model._meta.ordering
+        deferred -= {name.lstrip('-') for name in ([ordering] if isinstance(ordering, str) else ordering)}
+        # Колонки, которые нужны самому viewset'у
+        deferred -= set(getattr(self, 'required_fields', ()))
+        if deferred:
+            queryset = queryset.defer(*deferred)
+        expand = [name for name in parse_fields_param(self.request.query_params.get('expand'))
+                  if name in serializer.fields]
+        if expand:
+            queryset = queryset.prefetch_related(*expand)
+        return queryset
+
+    def select_fields(self, rows):
+        """
+        Оставляет в готовых представлениях только выбранные поля
+        """
+        names = set(self.get_serializer().fields)
+        return [{name: value for name, value in row.items() if name in names} for row in rows]
+
+
+class VersionedViewMixin:
+    """
+    Миксин для оптимистичной блокировки: версия объекта отдаётся в ETag,
+    изменение с If-Match выполняется, только если версия не изменилась (иначе 412, см. api.concurrency)
+    """
+
+    # Версия нужна для ETag, даже если её нет среди полей ?fields= (см. SparseFieldsViewMixin)
+    required_fields = ('version',)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expected_version'] = parse_if_match(self.request)
+        return context
+
+    def get_object(self):
+        self.versioned_instance = super().get_object()
+        return self.versioned_instance
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # Версия берётся из объекта: после изменения claim_version уже записал в него новую
+        instance = getattr(self, 'versioned_instance', None)
+        if self.action in ('retrieve', 'update', 'partial_update') and instance is not None \
+                and response.status_code < 400:
+            response['ETag'] = make_etag(instance.version)
+        return response
+
+
+class AtomicWriteViewMixin:
+    """
+    Миксин для моделей с журналом изменений: сохранение объекта и всё, что пишут его сигналы
+    (запись журнала, история цен, готовые представления подборок), фиксируются одной транзакцией
+    """
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+
+
+class ProductViewSet(AtomicWriteViewMixin, SparseFieldsViewMixin, ReplicaRoutingMixin, viewsets.ModelViewSet):
+    throttle_scope = 'products'
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = ProductFilter
+    pagination_class = IdCursorPagination
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsAuthenticated(), IsAdminUser()]
         return []
 
+    def retrieve(self, request, *args, **kwargs):
+        # Карточка товара без выборочных полей берётся из двухуровневого кеша (см. api.product_cache)
+        pk = str(kwargs['pk'])
+        if not pk.isdigit() or 'fields' in request.query_params or 'expand' in request.query_params:
+            return super().retrieve(request, *args, **kwargs)
+        return Response(get_product_data(int(pk), lambda: self._load_product(pk)))
 
-class ProductReviewViewSet(viewsets.ModelViewSet):
-    queryset = ProductReview.objects.all()
+    def _load_product(self, pk):
+        # Кеш заполняется с основной базы: данные с отстающей реплики легли бы в кеш под новой версией товара
+        instance = get_object_or_404(self.get_queryset().using('default'), pk=pk)
+        self.check_object_permissions(self.request, instance)
+        return dict(self.get_serializer(instance).data)
+
+    # Фасеты для отфильтрованного списка товаров: GET /products/facets/?name=...&price_min=...
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        products = self.filter_queryset(self.get_queryset())
+        return Response(get_product_facets(products, request.query_params))
+
+
+class ProductReviewViewSet(AtomicWriteViewMixin, VersionedViewMixin, SparseFieldsViewMixin, ReplicaRoutingMixin,
+                           viewsets.ModelViewSet):
+    throttle_scope = 'reviews'
+    # Данные автора читаются тем же запросом, только нужные для UserSerializer колонки
+    queryset = ProductReview.objects.select_related('user').only(
+        'id', 'product_id', 'text', 'rating', 'version', 'created_at', 'updated_at',
+        'user__id', 'user__username', 'user__first_name', 'user__last_name',
+    )
     serializer_class = ProductReviewSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = ProductReviewFilter
+    pagination_class = ReviewCursorPagination
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -40,40 +186,125 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    # Статистика отзывов: GET /product-reviews/stats/?product=...&created_at_after=...&created_at_before=...
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        reviews = self.filter_queryset(self.get_queryset())
+        return Response(get_review_stats(reviews, request.query_params))
 
-class OrderViewSet(viewsets.ModelViewSet):
+
+class OrderViewSet(AtomicWriteViewMixin, VersionedViewMixin, SparseFieldsViewMixin, ReplicaRoutingMixin,
+                   viewsets.ModelViewSet):
+    throttle_scope = 'orders'
+    # Заказы всегда читаются с основной базы, миксин только закрепляет пользователя после записи
+    read_from_replica = False
     serializer_class = OrderSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = OrderFilter
+    pagination_class = OrderPagination
 
     def get_permissions(self):
+        if self.action in ['transition', 'export']:
+            return [IsAuthenticated(), IsAdminUser()]
+        if self.action == 'summary':
+            return [IsAuthenticated()]
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsAuthenticated(), IsOwnerOrAdmin()]
         return []
 
     def get_queryset(self):
+        # Товары позиций нужны ProductOrderSerializer (название), загружаются одним запросом на список
+        queryset = Order.objects.prefetch_related('positions__product')
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(user=self.request.user)
+
+    def get_archived_queryset(self):
+        queryset = ArchivedOrder.objects.prefetch_related('positions__product')
         if self.request.user.is_staff:
-            return Order.objects.prefetch_related('positions').all()
-        return Order.objects.prefetch_related('positions').filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        # Диапазон дат создания, захватывающий архив, дополняется архивными заказами (см. api.archive)
+        archived = ArchivedOrderFilter(request.query_params, queryset=self.get_archived_queryset(), request=request)
+        created_at = archived.form.cleaned_data.get('created_at') if archived.is_valid() else None
+        if not created_at or not reaches_archive(created_at.start and created_at.start.date(),
+                                                 created_at.stop and created_at.stop.date()):
+            return super().list(request, *args, **kwargs)
+
+        orders = MergedOrders(self.filter_queryset(self.get_queryset()), archived.qs)
+        page = self.paginate_queryset(orders)
+        context = self.get_serializer_context()
+        data = [(ArchivedOrderSerializer if isinstance(order, ArchivedOrder) else OrderSerializer)(
+            order, context=context).data for order in (orders if page is None else page)]
+        return Response(data) if page is None else self.get_paginated_response(data)
 
     @transaction.atomic
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    # Массовая смена статуса заказов админом: POST /orders/transition/
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        serializer = OrderTransitionSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        updated_ids = serializer.save()
+        skipped_ids = sorted(set(serializer.validated_data['ids']) - set(updated_ids))
+        return Response({'status': serializer.validated_data['status'], 'updated': updated_ids,
+                         'skipped': skipped_ids})
+
+    # Выгрузка позиций заказов для аналитики: GET /orders/export/?start=...&end=...&export_format=parquet
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        serializer = OrderExportQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        start, end, export_format = (serializer.validated_data.get(name) for name in ('start', 'end', 'export_format'))
+        writer = WRITERS[export_format]
+        # Файл пишется и отдаётся по мере чтения пачек, целиком в памяти не держится
+        response = StreamingHttpResponse(iter_export(start, end, export_format, settings.ORDER_EXPORT_CHUNK_SIZE),
+                                         content_type=writer.media_type)
+        filename = f'orders-{start or "all"}-{end or "all"}.{writer.extension}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
-class CollectionViewSet(viewsets.ModelViewSet):
+    # Сводка по заказам текущего пользователя: GET /orders/summary/
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        return Response(get_order_summary(request.user))
+
+
+class CollectionViewSet(AtomicWriteViewMixin, SparseFieldsViewMixin, ReplicaRoutingMixin, viewsets.ModelViewSet):
     queryset = Collection.objects.all()
     serializer_class = CollectionSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = CollectionFilter
+    pagination_class = IdCursorPagination
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsAuthenticated(), IsAdminUser()]
         return []
 
+    def get_queryset(self):
+        if self.action in ['list', 'retrieve']:
+            # Готовое представление подборки читается тем же запросом (см. api.payloads)
+            return Collection.objects.select_related('payload')
+        return super().get_queryset()
 
-class FavoritesViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        collections = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(collections)
+        if page is not None:
+            return self.get_paginated_response(self.select_fields(get_collection_payloads(page)))
+        return Response(self.select_fields(get_collection_payloads(list(collections))))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.select_fields(get_collection_payloads([self.get_object()]))[0])
+
+
+class FavoritesViewSet(SparseFieldsViewMixin, ReplicaRoutingMixin, viewsets.ModelViewSet):
+    read_from_replica = False
     serializer_class = FavoritesSerializer
     filter_backends = [DjangoFilterBackend]
 
@@ -86,3 +317,73 @@ class FavoritesViewSet(viewsets.ModelViewSet):
         instance = get_object_or_404(Favorites, user=request.user, id=kwargs['pk'])
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CartViewSet(viewsets.ViewSet):
+    """
+    Корзина текущего пользователя. Хранится в кеше с копией в базе (см. api.carts),
+    оформляется в заказ теми же проверками, что и POST /orders/
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def list(self, request):
+        return Response(get_cart(request.user.id))
+
+    # Добавление товара: POST /cart/ {"product_id": 1, "amount": 2}
+    def create(self, request):
+        serializer = CartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cart = add_item(request.user.id, serializer.validated_data['product_id'], serializer.validated_data['amount'])
+        return Response(cart, status=status.HTTP_201_CREATED)
+
+    # Изменение количества: PATCH /cart/<id товара>/ {"amount": 3}
+    def partial_update(self, request, pk=None):
+        serializer = CartItemSerializer(data={'product_id': pk, 'amount': request.data.get('amount')})
+        serializer.is_valid(raise_exception=True)
+        return Response(set_item(request.user.id, serializer.validated_data['product_id'],
+                                 serializer.validated_data['amount']))
+
+    def destroy(self, request, pk=None):
+        if not remove_item(request.user.id, pk):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    # Очистка корзины: POST /cart/clear/
+    @action(detail=False, methods=['post'])
+    def clear(self, request):
+        clear_cart(request.user.id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    # Оформление заказа: POST /cart/checkout/
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        # Заказ создаётся через OrderViewSet: те же проверки, сериализатор и побочные действия
+        order_view = OrderViewSet(request=request, action='create', format_kwarg=self.format_kwarg)
+        with checkout_cart(request.user.id) as items:
+            positions = [{'product_id': item['product_id'], 'amount': item['amount']} for item in items]
+            serializer = order_view.get_serializer(data={'positions': positions})
+            serializer.is_valid(raise_exception=True)
+            order_view.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ChangeLogViewSet(viewsets.GenericViewSet):
+    """
+    Журнал изменений для инкрементальной синхронизации: GET /changes/?since=<seq>&limit=<n>
+    """
+    permission_classes = (IsAuthenticated, IsAdminUser)
+    serializer_class = ChangeLogEntrySerializer
+
+    def list(self, request):
+        query = ChangeFeedQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        since, limit = query.validated_data['since'], query.validated_data['limit']
+
+        entries = get_changes(since, limit + 1)
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        return Response({
+            'results': self.get_serializer(entries, many=True).data,
+            'next_since': entries[-1].seq if entries else since,
+            'has_more': has_more,
+        })
@@ -0,0 +1,59 @@
+import logging
+import time
+
+from django.db import connections, DatabaseError
+from django.urls import get_resolver, reverse
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _timed(timings, name, func):
+    started = time.perf_counter()
+    func()
+    timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def _build_urls():
+    # Заполняет кеши резолвера для reverse() и resolve()
+    resolver = get_resolver()
+    resolver.resolve(reverse('products-list'))
+
+
+def _build_viewsets():
+    from .urls import router
+
+    for _, viewset, _ in router.registry:
+        serializer_class = getattr(viewset, 'serializer_class', None)
+        if serializer_class is not None:
+            # Поля ModelSerializer строятся по _meta модели, кеши _meta заполняются при первом обращении
+            serializer_class().fields
+        filterset_class = getattr(viewset, 'filterset_class', None)
+        if filterset_class is not None:
+            filterset_class(data={}, queryset=filterset_class._meta.model.objects.none()).form
+        for setting in ('DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_AUTHENTICATION_CLASSES',
+                        'DEFAULT_THROTTLE_CLASSES'):
+            # Классы из настроек DRF импортируются при первом обращении
+            getattr(api_settings, setting)
+
+
+def _connect():
+    for alias in connections:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            logger.warning('Прогрев: не удалось подключиться к базе %s', alias, exc_info=True)
+
+
+def warm_up(connect=True):
+    """
+    Прогрев воркера до приёма запросов: маршруты, поля сериализаторов и фильтры viewset'ов, соединения с базами.
+    Соединения сохраняются до первого запроса, только если у базы задан CONN_MAX_AGE.
+    Возвращает время каждого шага, мс
+    """
+    timings = {}
+    _timed(timings, 'urls', _build_urls)
+    _timed(timings, 'viewsets', _build_viewsets)
+    if connect:
+        _timed(timings, 'databases', _connect)
+    return timings
@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import importlib.util
 import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -27,7 +29,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv("SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv("DEBUG", "1") == "1"
 
 ALLOWED_HOSTS = []
 
@@ -50,12 +52,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'diplom_online_store.urls'
@@ -77,9 +81,110 @@ TEMPLATES = [
 ]
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.ColumnarJSONRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend', ],
     'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.TokenAuthentication',],
+    # THROTTLING=0 отключает ограничения частоты (например, для нагрузочного теста load_orders)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.AnonSlidingWindowThrottle',
+        'api.throttling.UserSlidingWindowThrottle',
+        'api.throttling.ScopedSlidingWindowThrottle',
+    ] if os.getenv("THROTTLING", "1") == "1" else [],
+    # Нормы для throttle_scope viewset'ов; '<scope>_write' - норма для записи
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '120/min',
+        'user': '600/min',
+        'products': '300/min',
+        'orders_write': '60/min',
+        'reviews_write': '10/min',
+    },
+}
+# MessagePack отдаётся, только если установлен пакет msgpack
+if importlib.util.find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('api.renderers.MessagePackRenderer')
+
+# Кеш должен быть общим для всех процессов (например, memcached): в нём хранятся счётчики
+# ограничения частоты запросов, закрепление за основной базой, корзины, сводки и фасеты.
+# Кеш в памяти процесса допустим только при разработке (DEBUG)
+LOCMEM_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            "CACHE_BACKEND",
+            LOCMEM_CACHE_BACKEND if DEBUG else 'django.core.cache.backends.memcached.PyMemcacheCache',
+        ),
+        'LOCATION': os.getenv("CACHE_LOCATION", '' if DEBUG else '127.0.0.1:11211'),
+    }
 }
+if not DEBUG and CACHES['default']['BACKEND'] == LOCMEM_CACHE_BACKEND:
+    raise ImproperlyConfigured('CACHE_BACKEND: кеш в памяти процесса нельзя использовать без DEBUG, '
+                               'ограничения частоты и закрепление за основной базой работали бы в каждом процессе отдельно')
+
+# Кеш для счётчиков api.throttling, backend должен поддерживать атомарный incr
+THROTTLE_CACHE = 'default'
+
+# Время жизни кешированной сводки по заказам пользователя (сбрасывается при изменении заказов)
+ORDER_SUMMARY_CACHE_SECONDS = 60 * 60
+
+# Границы диапазонов цен для фасетов /products/facets/ и время кеширования фасетов
+PRODUCT_PRICE_FACETS = [0, 500, 1000, 2000, 5000]
+PRODUCT_FACETS_CACHE_SECONDS = 60
+
+# Очередь фоновых задач (api.queue): число попыток, задержка повтора и время закрепления задачи за воркером, с
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 10
+JOB_RETRY_BACKOFF_MAX = 60 * 60
+JOB_VISIBILITY_TIMEOUT = 5 * 60
+# Наибольшая пауза воркера после ошибки итерации (например, недоступна база), с
+JOB_WORKER_BACKOFF_MAX = 60
+
+# Журнал изменений (/api/v1/changes/): максимальный размер страницы, задержка выдачи свежих записей, с,
+# и сколько дней хранить все записи до сжатия командой compact_changes
+CHANGE_FEED_MAX_LIMIT = 1000
+CHANGE_FEED_SAFETY_LAG = 5
+CHANGE_FEED_RETENTION_DAYS = 30
+
+# Размер пачки строк при выгрузке заказов (api.exports): столько строк читается и записывается за раз
+ORDER_EXPORT_CHUNK_SIZE = 10000
+
+# Кеш карточки товара (api.product_cache): время жизни в общем кеше, с,
+# размер и время жизни кеша в памяти процесса, с,
+# как часто запись в памяти процесса сверяется с версией товара в общем кеше, с
+PRODUCT_CACHE_SECONDS = 300
+PRODUCT_CACHE_LOCAL_SIZE = 1000
+PRODUCT_CACHE_LOCAL_SECONDS = 10
+PRODUCT_CACHE_VERSION_CHECK_SECONDS = 1
+
+# Статистика отзывов (api.review_stats): время кеширования, с,
+# и вес априорной средней оценки в байесовской средней (число "виртуальных" отзывов)
+REVIEW_STATS_CACHE_SECONDS = 300
+REVIEW_STATS_PRIOR_WEIGHT = 10
+
+# Завершённые заказы старше стольких дней переносятся в архив командой archive_orders
+ORDER_ARCHIVE_DAYS = 365
+
+# Корзина (api.carts): сколько хранить в кеше, с, и как часто сохранять копию в базу, с
+CART_CACHE_SECONDS = 7 * 24 * 60 * 60
+CART_PERSIST_SECONDS = 60
+# Блокировка корзины на время изменения: время жизни ключа и сколько ждать чужую блокировку, с
+CART_LOCK_SECONDS = 5
+CART_LOCK_WAIT_SECONDS = 2
+
+# Ответы меньше этого размера, байт, не сжимаются (api.middleware.CompressionMiddleware)
+COMPRESSION_MIN_SIZE = 1024
+
+# Профилирование запросов (api.middleware.ProfilingMiddleware).
+# Когда PROFILING_ENABLED выключен, middleware не подключается и не добавляет накладных расходов
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED") == "1"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_FILES = 50
+# Профилировать каждый N-й запрос к действию viewset'а, 0 - не профилировать
+PROFILING_SAMPLE_RATE = int(os.getenv("PROFILING_SAMPLE_RATE", 0))
 
 WSGI_APPLICATION = 'diplom_online_store.wsgi.application'
 
@@ -95,9 +200,32 @@ DATABASES = {
         'PASSWORD': os.getenv("BD_PASS"),
         'HOST': '127.0.0.1',
         'PORT': '5432',
-    }
+        # Время жизни соединения, с: 0 - новое соединение на каждый запрос
+        'CONN_MAX_AGE': int(os.getenv("BD_CONN_MAX_AGE", 0)),
+    },
+    # Реплика только для чтения, запросы на неё направляет api.db_routers.PrimaryReplicaRouter
+    'replica': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': 'diplom_online_store',
+        'USER': os.getenv("BD_REPLICA_USER", os.getenv("BD_USER")),
+        'PASSWORD': os.getenv("BD_REPLICA_PASS", os.getenv("BD_PASS")),
+        'HOST': os.getenv("BD_REPLICA_HOST", '127.0.0.1'),
+        'PORT': os.getenv("BD_REPLICA_PORT", '5432'),
+        'CONN_MAX_AGE': int(os.getenv("BD_CONN_MAX_AGE", 0)),
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['api.db_routers.PrimaryReplicaRouter']
+
+# Алиасы баз, с которых можно читать безопасные запросы
+REPLICA_DATABASES = ['replica']
+
+# Сколько секунд после записи пользователь читает только с основной базы
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -0,0 +1,33 @@
+"""
+Настройки для запуска тестов: вместо Postgres и его реплики используются два файла SQLite
+"""
+from .settings import *  # noqa: F401,F403
+
+SECRET_KEY = SECRET_KEY or 'test-secret-key'  # noqa: F405
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',  # noqa: F405
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',  # noqa: F405
+        },
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',  # noqa: F405
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db_replica.sqlite3',  # noqa: F405
+        },
+    },
+}
+
+# По умолчанию тесты читают с 'default', роутинг на реплику включают только тесты роутера
+REPLICA_DATABASES = []
+
+# Кеш в памяти процесса вместо общего кеша
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
@@ -0,0 +1,9 @@
+# Настройки gunicorn: gunicorn diplom_online_store.wsgi -c gunicorn.conf.py
+workers = 4
+
+
+def post_worker_init(worker):
+    # Воркер начинает принимать запросы только после прогрева (см. api.warmup)
+    from api.warmup import warm_up
+
+    worker.log.info('Прогрев воркера: %s', warm_up())
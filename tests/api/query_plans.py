@@ -0,0 +1,130 @@
+"""
+Снимки SQL и планов запросов для проверки регрессий (см. test_query_plans.py).
+Снимок хранит для каждого сценария нормализованный SQL запросов и их EXPLAIN, отдельно для каждой СУБД
+"""
+import difflib
+import json
+import re
+from pathlib import Path
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+SNAPSHOT_DIR = Path(__file__).parent / 'query_plans'
+
+# Таблицы, которые в рабочей базе большие: полный просмотр такой таблицы, которого не было в снимке, - регрессия
+LARGE_TABLES = {
+    'api_product', 'api_product_price', 'api_productreview', 'api_order', 'api_product_order',
+    'api_order_status_history', 'api_product_collections', 'api_favorites', 'api_change_log',
+    'api_order_archive', 'api_product_order_archive', 'authtoken_token', 'auth_user',
+}
+
+# Перед этими словами SQL в снимке переносится на новую строку, чтобы разница читалась по частям запроса
+SQL_CLAUSES = r'FROM|(?:INNER |LEFT OUTER )?JOIN|WHERE|GROUP BY|HAVING|ORDER BY|LIMIT'
+
+
+def normalize_sql(sql):
+    """
+    SQL без значений параметров: id и даты в снимке не зависят от данных, списки IN сворачиваются
+    """
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    # Имена точек сохранения содержат id потока
+    sql = re.sub(r'SAVEPOINT "s\d+_x\d+"', 'SAVEPOINT "..."', sql)
+    sql = re.sub(r'(?<![\w"])-?\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'IN \(\?(?:, \?)*\)', 'IN (...)', sql)
+    return re.sub(rf'\s+({SQL_CLAUSES})\b', r'\n  \1', sql)
+
+
+def explain(sql):
+    """
+    План запроса строками: EXPLAIN QUERY PLAN на SQLite, EXPLAIN на Postgres
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[3] for row in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN {sql}')
+        # Оценки стоимости и числа строк меняются вместе с данными, в снимке остаются только узлы плана
+        return [re.sub(r'\s+\(cost=.*?\)', '', row[0]) for row in cursor.fetchall()]
+
+
+def seq_scans(sql, plan):
+    """
+    Таблицы, которые план читает полным просмотром. Псевдонимы (U0, T3) заменяются на имена таблиц из SQL
+    """
+    aliases = dict((alias, table) for table, alias in re.findall(r'"(\w+)" ([A-Z]\d+)\b', sql))
+    tables = set()
+    for line in plan:
+        match = re.search(r'Seq Scan on (\w+)', line) or re.match(r'\s*SCAN (?:TABLE )?(\w+)(?!.*USING)', line)
+        if match:
+            tables.add(aliases.get(match.group(1), match.group(1)))
+    return tables
+
+
+def capture(request):
+    """
+    Выполняет request() и возвращает его запросы: нормализованный SQL, план и таблицы с полным просмотром
+    """
+    with CaptureQueriesContext(connection) as queries:
+        response = request()
+    captured = []
+    for query in queries.captured_queries:
+        sql = query['sql']
+        plan = explain(sql) if sql.lstrip().upper().startswith('SELECT') else []
+        captured.append({'sql': normalize_sql(sql), 'plan': plan, 'seq_scans': sorted(seq_scans(sql, plan))})
+    return response, captured
+
+
+def render(queries):
+    """
+    Сценарий в виде текста для построчной разницы
+    """
+    lines = []
+    for number, query in enumerate(queries, 1):
+        lines.append(f'-- запрос {number}')
+        lines.extend(query['sql'].splitlines())
+        lines.extend(f'   | {line}' for line in query['plan'])
+    return lines
+
+
+def compare(name, expected, actual):
+    """
+    Сравнивает запросы сценария со снимком. Возвращает (список регрессий, разница в unified diff)
+    """
+    regressions = []
+    if len(actual) > len(expected):
+        regressions.append(f'{name}: запросов стало {len(actual)}, было {len(expected)}')
+    # Каждый запрос сверяется со своим запросом из снимка: с тем же SQL, а если SQL изменился - с запросом
+    # под тем же номером. Полный просмотр таблицы в одном запросе не оправдывает такой же просмотр в другом
+    by_sql = {}
+    for query in expected:
+        by_sql.setdefault(query['sql'], []).append(query)
+    for number, query in enumerate(actual, 1):
+        same_sql = by_sql.get(query['sql'])
+        if same_sql:
+            baseline = same_sql.pop(0)
+        else:
+            baseline = expected[number - 1] if number <= len(expected) else {'seq_scans': []}
+        new_scans = set(query['seq_scans']) - set(baseline['seq_scans'])
+        for table in sorted(new_scans & LARGE_TABLES):
+            regressions.append(f'{name}: запрос {number} полностью просматривает таблицу {table}')
+    diff = '\n'.join(difflib.unified_diff(render(expected), render(actual), f'{name} (снимок)', f'{name} (сейчас)',
+                                          lineterm=''))
+    return regressions, diff
+
+
+def snapshot_path():
+    return SNAPSHOT_DIR / f'{connection.vendor}.json'
+
+
+def load_snapshot():
+    path = snapshot_path()
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def save_snapshot(snapshot):
+    SNAPSHOT_DIR.mkdir(exist_ok=True)
+    snapshot_path().write_text(json.dumps(snapshot, ensure_ascii=False, indent=2, sort_keys=True) + '\n',
+                               encoding='utf-8')
@@ -0,0 +1,49 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from model_bakery import baker
+
+
+# проверка, что число запросов в списке заказов админки не зависит от числа заказов
+@pytest.mark.django_db
+def test_admin_order_changelist_queries(admin_client, order_factory):
+    url = reverse("admin:api_order_changelist")
+    order_factory()
+    with CaptureQueriesContext(connection) as few_orders:
+        resp = admin_client.get(url)
+    assert resp.status_code == 200
+
+    order_factory()
+    order_factory()
+    with CaptureQueriesContext(connection) as many_orders:
+        resp = admin_client.get(url)
+    assert resp.status_code == 200
+
+    assert len(many_orders) == len(few_orders)
+
+
+# на странице подборки товары выбираются автодополнением, а не списком всех товаров
+@pytest.mark.django_db
+def test_admin_collection_change_uses_autocomplete(admin_client, collection_factory, product_factory):
+    collection = collection_factory()[0]
+    other_product = product_factory(name="not_in_collection")[0]
+
+    resp = admin_client.get(reverse("admin:api_collection_change", args=[collection.id]))
+
+    assert resp.status_code == 200
+    assert "admin-autocomplete" in resp.content.decode()
+    assert other_product.name not in resp.content.decode()
+
+
+# поиск товаров для автодополнения
+@pytest.mark.django_db
+def test_admin_product_search(admin_client):
+    baker.make("Product", name="Python для начинающих")
+    baker.make("Product", name="SQL")
+
+    resp = admin_client.get(reverse("admin:api_product_changelist"), {"q": "python"})
+
+    assert resp.status_code == 200
+    assert "Python для начинающих" in resp.content.decode()
+    assert "SQL" not in resp.content.decode()
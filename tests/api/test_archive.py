@@ -0,0 +1,158 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK
+
+from api.models import Order, OrderStatusChoices, OrderStatusHistory, ArchivedOrder, ArchivedProductOrder, \
+    ChangeLogEntry, ChangeActionChoices, Product
+
+
+@pytest.fixture
+def old_orders(order_factory):
+    """
+    10 старых завершённых заказов с историей статусов, 10 старых новых и 10 свежих завершённых
+    """
+    old_date = timezone.localdate() - timedelta(days=400)
+    old_done = order_factory(status=OrderStatusChoices.DONE)
+    old_new = order_factory(status=OrderStatusChoices.NEW)
+    recent_done = order_factory(status=OrderStatusChoices.DONE)
+    Order.objects.filter(id__in=[order.id for order in old_done + old_new]).update(created_at=old_date,
+                                                                                  updated_at=old_date)
+    baker.make("OrderStatusHistory", order=old_done[0], from_status=OrderStatusChoices.IN_PROGRESS,
+               to_status=OrderStatusChoices.DONE)
+    return old_done, old_new, recent_done
+
+
+# проверка переноса старых завершённых заказов в архив пачками
+@pytest.mark.django_db
+def test_archive_orders(old_orders):
+    old_done, old_new, recent_done = old_orders
+    positions = {(position.id, position.order_id, position.product_id, position.amount)
+                 for order in old_done for position in order.positions.all()}
+
+    call_command("archive_orders", days=365, batch_size=3)
+
+    assert set(ArchivedOrder.objects.values_list("id", flat=True)) == {order.id for order in old_done}
+    assert set(ArchivedProductOrder.objects.values_list("id", "order_id", "product_id", "amount")) == positions
+    assert set(Order.objects.values_list("id", flat=True)) == {order.id for order in old_new + recent_done}
+    assert not OrderStatusHistory.objects.exists()
+    history = ArchivedOrder.objects.get(id=old_done[0].id).status_history
+    assert [(record["from_status"], record["to_status"]) for record in history] == [
+        (OrderStatusChoices.IN_PROGRESS, OrderStatusChoices.DONE)]
+
+
+# проверка, что список заказов без диапазона дат и по свежим датам не включает архив
+@pytest.mark.django_db
+def test_order_list_without_archive(old_orders, user_api_client):
+    call_command("archive_orders", days=365)
+    url = reverse("orders-list")
+
+    assert len(user_api_client.get(url).json()) == 20
+    resp = user_api_client.get(url, {"created_at_after": timezone.localdate() - timedelta(days=30)})
+    assert len(resp.json()) == 10
+
+
+# проверка, что диапазон дат, захватывающий архив, включает архивные заказы
+@pytest.mark.django_db
+def test_order_list_created_at_includes_archive(old_orders, user_api_client, another_user):
+    old_done, old_new, recent_done = old_orders
+    positions_count = old_done[0].positions.count()
+    call_command("archive_orders", days=365)
+    # архивный заказ другого пользователя не должен попасть в выдачу
+    baker.make("ArchivedOrder", user=another_user, created_at=timezone.localdate() - timedelta(days=400),
+               updated_at=timezone.localdate() - timedelta(days=400), order_sum=1)
+    url = reverse("orders-list")
+
+    resp = user_api_client.get(url, {"created_at_before": timezone.localdate() - timedelta(days=300)})
+    resp_json = resp.json()
+
+    assert resp.status_code == HTTP_200_OK
+    assert {order["id"] for order in resp_json} == {order.id for order in old_done + old_new}
+    archived = next(order for order in resp_json if order["id"] == old_done[0].id)
+    assert archived["status"] == OrderStatusChoices.DONE
+    assert len(archived["positions"]) == positions_count
+
+    resp = user_api_client.get(url, {"created_at_before": timezone.localdate() - timedelta(days=300),
+                                     "status": OrderStatusChoices.NEW})
+    assert {order["id"] for order in resp.json()} == {order.id for order in old_new}
+
+
+# проверка, что сводка по заказам учитывает архив
+@pytest.mark.django_db
+def test_order_summary_includes_archive(old_orders, user_api_client):
+    call_command("archive_orders", days=365)
+
+    summary = user_api_client.get(reverse("orders-summary")).json()
+
+    assert summary["total"] == 30
+    assert summary["counts"][OrderStatusChoices.DONE] == 20
+
+
+# перенос в архив пишет в журнал ARCHIVE по заказу, а не DELETE по заказам и позициям
+@pytest.mark.django_db
+def test_archive_orders_change_log(old_orders):
+    old_done, _, _ = old_orders
+    ChangeLogEntry.objects.all().delete()
+
+    call_command("archive_orders", days=365)
+
+    assert set(ChangeLogEntry.objects.values_list("model", "object_id", "action")) == {
+        ("api.order", order.id, ChangeActionChoices.ARCHIVE) for order in old_done}
+
+
+# удаление товара не удаляет архивные позиции
+@pytest.mark.django_db
+def test_archived_positions_kept_on_product_delete(old_orders, user_api_client):
+    old_done, _, _ = old_orders
+    call_command("archive_orders", days=365)
+    position = ArchivedProductOrder.objects.order_by("id").first()
+
+    Product.objects.filter(id=position.product_id).delete()
+
+    assert ArchivedProductOrder.objects.filter(id=position.id).exists()
+    resp = user_api_client.get(reverse("orders-list"),
+                               {"created_at_before": timezone.localdate() - timedelta(days=300)})
+    assert resp.status_code == HTTP_200_OK
+
+
+# архивные заказы в списке отдаются с теми же полями, что и заказы основной таблицы, включая версию
+@pytest.mark.django_db
+def test_order_list_archived_shape(old_orders, user_api_client):
+    old_done, old_new, _ = old_orders
+    Order.objects.filter(id=old_done[0].id).update(version=3)
+    call_command("archive_orders", days=365)
+
+    resp = user_api_client.get(reverse("orders-list"),
+                               {"created_at_before": timezone.localdate() - timedelta(days=300)})
+    orders = {order["id"]: order for order in resp.json()}
+
+    assert set(orders[old_done[0].id]) == set(orders[old_new[0].id])
+    assert orders[old_done[0].id]["version"] == 3
+    assert orders[old_new[0].id]["version"] == 1
+
+
+# список с архивом постранично: страницы идут в порядке полного списка, без пропусков и повторов
+@pytest.mark.django_db
+def test_order_list_with_archive_paginated(old_orders, user_api_client):
+    old_done, old_new, _ = old_orders
+    call_command("archive_orders", days=365)
+    url = reverse("orders-list")
+    params = {"created_at_before": timezone.localdate() - timedelta(days=300)}
+    expected = [order["id"] for order in user_api_client.get(url, params).json()]
+
+    ids = []
+    resp_json = user_api_client.get(url, {**params, "page_size": 7}).json()
+    while True:
+        assert resp_json["count"] == 20
+        assert len(resp_json["results"]) <= 7
+        ids += [order["id"] for order in resp_json["results"]]
+        if not resp_json["next"]:
+            break
+        resp_json = user_api_client.get(resp_json["next"]).json()
+
+    assert ids == expected
+    assert set(ids) == {order.id for order in old_done + old_new}
@@ -0,0 +1,180 @@
+import threading
+
+import pytest
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST, \
+    HTTP_401_UNAUTHORIZED, HTTP_404_NOT_FOUND
+
+from api.carts import add_item, get_cart
+from api.models import Cart, Order, ProductOrder
+from api.views import OrderViewSet
+
+
+# проверка добавления товаров в корзину и пересчёта суммы
+@pytest.mark.django_db
+def test_cart_add_items(user_api_client, product_factory):
+    first, second = product_factory()[:2]
+    url = reverse("cart-list")
+
+    resp = user_api_client.post(url, data={"product_id": first.id, "amount": 2}, format="json")
+    assert resp.status_code == HTTP_201_CREATED
+    user_api_client.post(url, data={"product_id": second.id, "amount": 1}, format="json")
+    resp = user_api_client.post(url, data={"product_id": first.id, "amount": 1}, format="json")
+    resp_json = resp.json()
+
+    assert {item["product_id"]: item["amount"] for item in resp_json["items"]} == {first.id: 3, second.id: 1}
+    assert resp_json["total"] == round(first.price * 3 + second.price, 2)
+    assert user_api_client.get(url).json() == resp_json
+
+
+# проверка изменения количества и удаления позиции
+@pytest.mark.django_db
+def test_cart_update_and_remove(user_api_client, product_factory):
+    first, second = product_factory()[:2]
+    url = reverse("cart-list")
+    user_api_client.post(url, data={"product_id": first.id, "amount": 2}, format="json")
+    user_api_client.post(url, data={"product_id": second.id, "amount": 2}, format="json")
+
+    resp = user_api_client.patch(reverse("cart-detail", args=[first.id]), data={"amount": 5}, format="json")
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()["total"] == round(first.price * 5 + second.price * 2, 2)
+
+    resp = user_api_client.delete(reverse("cart-detail", args=[second.id]))
+    assert resp.status_code == HTTP_204_NO_CONTENT
+    assert user_api_client.get(url).json()["total"] == round(first.price * 5, 2)
+
+    resp = user_api_client.delete(reverse("cart-detail", args=[second.id]))
+    assert resp.status_code == HTTP_404_NOT_FOUND
+
+
+# проверка добавления несуществующего товара (должен вызывать ошибку)
+@pytest.mark.django_db
+def test_cart_add_unknown_product(user_api_client):
+    resp = user_api_client.post(reverse("cart-list"), data={"product_id": 100500, "amount": 1}, format="json")
+
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+
+
+# проверка восстановления корзины из базы после потери кеша
+@pytest.mark.django_db
+def test_cart_restored_from_db(user_api_client, product_factory, settings):
+    settings.CART_PERSIST_SECONDS = 0
+    product = product_factory()[0]
+    url = reverse("cart-list")
+    user_api_client.post(url, data={"product_id": product.id, "amount": 4}, format="json")
+
+    cache.clear()
+    resp_json = user_api_client.get(url).json()
+
+    assert resp_json["items"][0]["amount"] == 4
+    assert resp_json["total"] == round(product.price * 4, 2)
+
+
+# проверка оформления заказа из корзины
+@pytest.mark.django_db
+def test_cart_checkout(user, user_api_client, product_factory):
+    first, second = product_factory()[:2]
+    url = reverse("cart-list")
+    user_api_client.post(url, data={"product_id": first.id, "amount": 2}, format="json")
+    user_api_client.post(url, data={"product_id": second.id, "amount": 3}, format="json")
+
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        resp = user_api_client.post(reverse("cart-checkout"))
+    resp_json = resp.json()
+
+    assert resp.status_code == HTTP_201_CREATED
+    order = Order.objects.get(id=resp_json["id"])
+    assert order.user == user
+    assert order.order_sum == round(first.price * 2 + second.price * 3, 2)
+    assert set(ProductOrder.objects.filter(order=order).values_list("product_id", "amount")) == \
+           {(first.id, 2), (second.id, 3)}
+    assert user_api_client.get(url).json() == {"items": [], "total": 0}
+    assert not Cart.objects.filter(user=user).exists()
+
+
+# корзина очищается только после коммита: при откате заказа позиции остаются
+@pytest.mark.django_db
+def test_cart_checkout_rollback_keeps_cart(user, user_api_client, product_factory, monkeypatch):
+    product = product_factory()[0]
+    url = reverse("cart-list")
+    user_api_client.post(url, data={"product_id": product.id, "amount": 2}, format="json")
+    perform_create = OrderViewSet.perform_create
+
+    def failing_perform_create(self, serializer):
+        perform_create(self, serializer)
+        raise RuntimeError("сбой после создания заказа")
+
+    monkeypatch.setattr(OrderViewSet, "perform_create", failing_perform_create)
+
+    with TestCase.captureOnCommitCallbacks(execute=True), pytest.raises(RuntimeError):
+        user_api_client.post(reverse("cart-checkout"))
+
+    assert not Order.objects.exists()
+    assert [(item["product_id"], item["amount"]) for item in user_api_client.get(url).json()["items"]] == \
+           [(product.id, 2)]
+
+
+# из корзины удаляются только оформленные позиции: добавленное во время оформления остаётся
+@pytest.mark.django_db
+def test_cart_checkout_keeps_items_added_meanwhile(user, user_api_client, product_factory, monkeypatch):
+    first, second = product_factory()[:2]
+    url = reverse("cart-list")
+    user_api_client.post(url, data={"product_id": first.id, "amount": 2}, format="json")
+    perform_create = OrderViewSet.perform_create
+
+    def perform_create_with_add(self, serializer):
+        perform_create(self, serializer)
+        add_item(user.id, first, 1)
+        add_item(user.id, second, 3)
+
+    monkeypatch.setattr(OrderViewSet, "perform_create", perform_create_with_add)
+
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        resp = user_api_client.post(reverse("cart-checkout"))
+
+    assert resp.status_code == HTTP_201_CREATED
+    assert ProductOrder.objects.get(order_id=resp.json()["id"]).amount == 2
+    assert {(item["product_id"], item["amount"]) for item in get_cart(user.id)["items"]} == \
+           {(first.id, 1), (second.id, 3)}
+    assert Cart.objects.get(user=user).items[str(second.id)]["amount"] == 3
+
+
+# проверка оформления пустой корзины (должен вызывать ошибку)
+@pytest.mark.django_db
+def test_cart_checkout_empty(user_api_client):
+    resp = user_api_client.post(reverse("cart-checkout"))
+
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert not Order.objects.exists()
+
+
+# проверка доступа к корзине без авторизации (должен вызывать ошибку)
+@pytest.mark.django_db
+def test_cart_unauthorized(client):
+    resp = client.get(reverse("cart-list"))
+
+    assert resp.status_code == HTTP_401_UNAUTHORIZED
+
+
+# проверка одновременного добавления товаров в корзину (ни одно добавление не должно потеряться)
+@pytest.mark.django_db(transaction=True)
+def test_cart_concurrent_add(user):
+    products = baker.make("Product", price=0.1, _quantity=4)
+    threads_count = 8
+
+    def add():
+        for product in products:
+            add_item(user.id, product, 1)
+
+    threads = [threading.Thread(target=add) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    cart = get_cart(user.id)
+    assert {item["amount"] for item in cart["items"]} == {threads_count}
+    assert cart["total"] == 3.2
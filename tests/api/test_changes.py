@@ -0,0 +1,133 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db.models.signals import post_save
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST, \
+    HTTP_403_FORBIDDEN
+
+from api.changes import compact_changes
+from api.models import ChangeLogEntry, ChangeActionChoices, Product, OrderStatusChoices
+
+
+# проверка записи создания, изменения и удаления товара в журнал
+@pytest.mark.django_db
+def test_product_changes_recorded(admin_api_client, product_create_payload):
+    resp = admin_api_client.post(reverse("products-list"), data=product_create_payload)
+    assert resp.status_code == HTTP_201_CREATED
+    product_id = resp.json()["id"]
+    url = reverse("products-detail", args=[product_id])
+    assert admin_api_client.patch(url, data={"name": "Новое название"}).status_code == HTTP_200_OK
+    assert admin_api_client.delete(url).status_code == HTTP_204_NO_CONTENT
+
+    entries = ChangeLogEntry.objects.filter(model="api.product", object_id=product_id)
+    assert [entry.action for entry in entries] == [ChangeActionChoices.CREATE, ChangeActionChoices.UPDATE,
+                                                   ChangeActionChoices.DELETE]
+    assert entries[1].data["name"] == "Новое название"
+
+
+# проверка записи позиций заказа, созданных пакетной вставкой, и массовой смены статуса
+@pytest.mark.django_db
+def test_order_bulk_changes_recorded(user_api_client, admin_api_client, order_create_payload):
+    resp = user_api_client.post(reverse("orders-list"), data=order_create_payload, format="json")
+    assert resp.status_code == HTTP_201_CREATED
+    order_id = resp.json()["id"]
+    assert ChangeLogEntry.objects.filter(model="api.productorder", action=ChangeActionChoices.CREATE).count() \
+           == len(order_create_payload["positions"])
+
+    resp = admin_api_client.post(reverse("orders-transition"),
+                                 data={"ids": [order_id], "status": OrderStatusChoices.IN_PROGRESS}, format="json")
+    assert resp.status_code == HTTP_200_OK
+    entry = ChangeLogEntry.objects.filter(model="api.order", object_id=order_id).last()
+    assert entry.action == ChangeActionChoices.UPDATE
+    assert entry.data["status"] == OrderStatusChoices.IN_PROGRESS
+
+
+# проверка постраничного чтения журнала по номеру последней полученной записи
+@pytest.mark.django_db
+def test_change_feed_paging(product_factory, admin_api_client):
+    products = product_factory()
+    url = reverse("changes-list")
+
+    resp = admin_api_client.get(url, {"since": 0, "limit": 6})
+    resp_json = resp.json()
+    assert resp.status_code == HTTP_200_OK
+    assert [entry["object_id"] for entry in resp_json["results"]] == [product.id for product in products[:6]]
+    assert resp_json["has_more"]
+
+    resp_json = admin_api_client.get(url, {"since": resp_json["next_since"], "limit": 6}).json()
+    assert [entry["object_id"] for entry in resp_json["results"]] == [product.id for product in products[6:]]
+    assert not resp_json["has_more"]
+
+    resp_json = admin_api_client.get(url, {"since": resp_json["next_since"]}).json()
+    assert resp_json["results"] == []
+
+
+# проверка некорректного номера записи
+@pytest.mark.django_db
+def test_change_feed_invalid_since(admin_api_client):
+    resp = admin_api_client.get(reverse("changes-list"), {"since": -1})
+
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+
+
+# проверка доступа к журналу пользователем (должен вызывать ошибку)
+@pytest.mark.django_db
+def test_change_feed_by_user(user_api_client):
+    resp = user_api_client.get(reverse("changes-list"))
+
+    assert resp.status_code == HTTP_403_FORBIDDEN
+
+
+# проверка сжатия журнала: из старых записей остаётся только последняя по каждому объекту
+@pytest.mark.django_db
+def test_compact_changes(product_factory):
+    kept, deleted = product_factory()[:2]
+    kept.name = "Изменён"
+    kept.save()
+    deleted_id = deleted.id
+    deleted.delete()
+    ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(days=40))
+    Product.objects.get(id=kept.id).save()
+
+    call_command("compact_changes", days=30)
+
+    assert list(ChangeLogEntry.objects.filter(object_id__in=[kept.id, deleted_id])
+                .values_list("object_id", "action")) == [
+        (deleted_id, ChangeActionChoices.DELETE),
+        (kept.id, ChangeActionChoices.UPDATE),
+    ]
+
+
+# проверка сжатия журнала маленькими пачками: записи объекта из разных пачек сжимаются так же
+@pytest.mark.django_db
+def test_compact_changes_small_batches(product_factory):
+    products = product_factory()[:3]
+    for product in products:
+        product.save()
+        product.save()
+    ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(days=40))
+
+    assert compact_changes(timezone.now() - timedelta(days=30), batch_size=2) == 6
+    assert sorted(ChangeLogEntry.objects.filter(object_id__in=[product.id for product in products])
+                  .values_list("object_id", "action")) == sorted((product.id, ChangeActionChoices.UPDATE)
+                                                                 for product in products)
+
+
+# запись журнала фиксируется вместе с изменением: ошибка после сохранения товара откатывает и то и другое
+@pytest.mark.django_db
+def test_product_change_rolled_back_with_log(admin_api_client, product_create_payload):
+    def fail(sender, instance, **kwargs):
+        raise RuntimeError("после сохранения")
+
+    post_save.connect(fail, sender=Product, dispatch_uid="test_fail_after_save")
+    try:
+        with pytest.raises(RuntimeError):
+            admin_api_client.post(reverse("products-list"), data=product_create_payload)
+    finally:
+        post_save.disconnect(sender=Product, dispatch_uid="test_fail_after_save")
+
+    assert not Product.objects.filter(name=product_create_payload["name"]).exists()
+    assert not ChangeLogEntry.objects.filter(model="api.product").exists()
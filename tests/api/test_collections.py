@@ -1,9 +1,14 @@
 import random
+import threading
 
 import pytest
 from django.urls import reverse
+from model_bakery import baker
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN, HTTP_204_NO_CONTENT
 
+from api import payloads
+from api.models import Collection, CollectionPayload
+
 
 # проверка получения 1го подборки
 @pytest.mark.django_db
@@ -108,3 +113,95 @@ def test_collections_delete_by_user(collection_factory, user_api_client):
     resp = user_api_client.delete(url)
 
     assert resp.status_code == HTTP_403_FORBIDDEN
+
+
+# проверка, что список подборок читается одним запросом из готовых представлений (плюс запрос токена)
+@pytest.mark.django_db
+def test_collections_list_from_payloads(collection_factory, user_api_client, django_assert_num_queries):
+    collection_factory()
+    url = reverse("product-collections-list")
+
+    with django_assert_num_queries(2):
+        resp = user_api_client.get(url)
+
+    assert resp.status_code == HTTP_200_OK
+    assert len(resp.json()) == 10
+
+
+# проверка пересборки представления подборки при изменении товара
+@pytest.mark.django_db
+def test_collection_payload_rebuilt_on_product_update(admin_api_client, collection_create_payload):
+    resp = admin_api_client.post(reverse("product-collections-list"), data=collection_create_payload, format="json")
+    collection_id = resp.json()["id"]
+    product_id = collection_create_payload["products_list"][0]["product_id"]
+
+    admin_api_client.patch(reverse("products-detail", args=[product_id]), data={"name": "renamed"})
+    payload = CollectionPayload.objects.get(collection_id=collection_id).data
+
+    assert payload["products_list"][0]["name"] == "renamed"
+
+
+# проверка выборочных полей в списке подборок
+@pytest.mark.django_db
+def test_collections_sparse_fields(collection_factory, user_api_client):
+    collection_factory()
+    url = reverse("product-collections-list")
+
+    resp = user_api_client.get(url, {"fields": "id,title"})
+
+    assert resp.status_code == HTTP_200_OK
+    assert all(set(collection) == {"id", "title"} for collection in resp.json())
+
+
+# проверка фильтра подборок по товару с постраничной выдачей
+@pytest.mark.django_db
+def test_collections_filter_by_product(user_api_client, product_factory):
+    product, other = product_factory()[:2]
+    collections = [baker.make("Collection") for _ in range(3)]
+    for collection in collections:
+        collection.products.add(product)
+    baker.make("Collection").products.add(other)
+    url = reverse("product-collections-list")
+
+    resp = user_api_client.get(url, {"product": product.id, "page_size": 2})
+    resp_json = resp.json()
+
+    assert resp.status_code == HTTP_200_OK
+    assert [collection["id"] for collection in resp_json["results"]] == [collections[0].id, collections[1].id]
+    resp = user_api_client.get(resp_json["next"])
+    assert [collection["id"] for collection in resp.json()["results"]] == [collections[2].id]
+
+
+# проверка одновременной сборки отсутствующих представлений (оба запроса получают данные, строка одна)
+@pytest.mark.django_db(transaction=True)
+def test_collection_payloads_concurrent_miss(collection_factory, monkeypatch):
+    collection_ids = [collection.id for collection in collection_factory()[:3]]
+    CollectionPayload.objects.all().delete()
+    barrier = threading.Barrier(2, timeout=10)
+    build_payloads = payloads._build_payloads
+
+    # Оба потока собирают представления до того, как любой из них начнёт их сохранять
+    def build_together(ids):
+        built = build_payloads(ids)
+        barrier.wait()
+        return built
+
+    monkeypatch.setattr(payloads, "_build_payloads", build_together)
+    results = []
+    errors = []
+
+    def read():
+        try:
+            results.append(payloads.get_collection_payloads(list(Collection.objects.filter(id__in=collection_ids))))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert [[payload["id"] for payload in result] for result in results] == [collection_ids, collection_ids]
+    assert sorted(CollectionPayload.objects.values_list("collection_id", flat=True)) == sorted(collection_ids)
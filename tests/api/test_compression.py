@@ -0,0 +1,102 @@
+import gzip
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK
+
+from api.compression import choose_encoding
+
+
+# проверка сжатия большого списка товаров gzip
+@pytest.mark.django_db
+def test_products_list_gzip(user_api_client, product_factory, settings):
+    settings.COMPRESSION_MIN_SIZE = 100
+    product_factory()
+    url = reverse("products-list")
+
+    resp = user_api_client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+
+    assert resp.status_code == HTTP_200_OK
+    assert resp["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in resp["Vary"]
+    assert len(json.loads(gzip.decompress(resp.content))) == 10
+
+
+# проверка, что ответы меньше порога и без Accept-Encoding не сжимаются
+@pytest.mark.django_db
+def test_small_response_not_compressed(user_api_client, product_factory, settings):
+    settings.COMPRESSION_MIN_SIZE = 100
+    product = product_factory()[0]
+
+    resp = user_api_client.get(reverse("products-detail", args=[product.id]), {"fields": "id"},
+                               HTTP_ACCEPT_ENCODING="gzip")
+    assert not resp.has_header("Content-Encoding")
+
+    resp = user_api_client.get(reverse("products-list"))
+    assert not resp.has_header("Content-Encoding")
+
+
+# проверка выбора кодировки по весам клиента
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("*") is not None
+    assert choose_encoding("") is None
+
+
+# проверка колоночного JSON для списка товаров
+@pytest.mark.django_db
+def test_products_list_columnar(user_api_client, product_factory):
+    products = product_factory()
+    url = reverse("products-list")
+
+    resp = user_api_client.get(url, {"fields": "id,name", "format": "columns"})
+    resp_json = resp.json()
+
+    assert resp.status_code == HTTP_200_OK
+    assert resp["Content-Type"].startswith("application/vnd.columnar+json")
+    assert resp_json["columns"] == ["id", "name"]
+    assert resp_json["rows"] == [[product.id, product.name] for product in products]
+
+
+# проверка колоночного JSON для постраничного списка отзывов
+@pytest.mark.django_db
+def test_reviews_page_columnar(user_api_client, review_factory):
+    review_factory()
+    url = reverse("product-reviews-list")
+
+    resp = user_api_client.get(url, {"page_size": 3, "fields": "id,rating"},
+                               HTTP_ACCEPT="application/vnd.columnar+json")
+    resp_json = resp.json()
+
+    assert resp.status_code == HTTP_200_OK
+    assert resp_json["next"]
+    assert resp_json["results"]["columns"] == ["id", "rating"]
+    assert len(resp_json["results"]["rows"]) == 3
+
+
+# проверка MessagePack, если установлен msgpack
+@pytest.mark.django_db
+def test_products_list_msgpack(user_api_client, product_factory):
+    msgpack = pytest.importorskip("msgpack")
+    product_factory()
+
+    resp = user_api_client.get(reverse("products-list"), HTTP_ACCEPT="application/msgpack")
+
+    assert resp.status_code == HTTP_200_OK
+    assert len(msgpack.unpackb(resp.content)) == 10
+
+
+# проверка бенчмарка форматов
+def test_bench_renderers():
+    out = StringIO()
+    call_command("bench_renderers", rows=50, repeat=1, stdout=out)
+    report = json.loads(out.getvalue())
+
+    assert report["rows"] == 50
+    assert {"json", "columns"} <= set(report["formats"])
+    assert report["formats"]["columns"]["bytes"] < report["formats"]["json"]["bytes"]
+    assert "gzip" in report["formats"]["json"]["compressed"]
@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+from django.db import connection
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_412_PRECONDITION_FAILED
+from rest_framework.test import APIClient
+
+from api.models import Order
+
+
+# версия заказа отдаётся в ETag и увеличивается при изменении
+@pytest.mark.django_db
+def test_order_etag(user_api_client, order_update_payload):
+    url, payload = order_update_payload
+
+    resp = user_api_client.get(url)
+    assert resp["ETag"] == '"1"'
+
+    resp = user_api_client.patch(url, data=payload, format="json", HTTP_IF_MATCH='"1"')
+    assert resp.status_code == HTTP_200_OK
+    assert resp["ETag"] == '"2"'
+    assert resp.json()["version"] == 2
+
+
+# ETag отдаётся и при выборочных полях без version, If-Match принимает список версий
+@pytest.mark.django_db
+def test_order_etag_sparse_fields_and_list(user_api_client, order_update_payload):
+    url, payload = order_update_payload
+
+    resp = user_api_client.get(url, {"fields": "id,status"})
+    assert set(resp.json()) == {"id", "status"}
+    assert resp["ETag"] == '"1"'
+
+    resp = user_api_client.patch(f"{url}?fields=id", data=payload, format="json", HTTP_IF_MATCH='"5", W/"1"')
+    assert resp.status_code == HTTP_200_OK
+    assert resp["ETag"] == '"2"'
+
+
+# изменение заказа по устаревшей версии отклоняется с 412
+@pytest.mark.django_db
+def test_order_update_stale_version(user_api_client, order_update_payload):
+    url, payload = order_update_payload
+    user_api_client.patch(url, data=payload, format="json", HTTP_IF_MATCH='"1"')
+    order = Order.objects.get(id=url.rstrip("/").split("/")[-1])
+    position = order.positions.get(product_id=payload["positions"][0]["product_id"])
+
+    payload["positions"][0]["amount"] = 7
+    resp = user_api_client.patch(url, data=payload, format="json", HTTP_IF_MATCH='"1"')
+
+    assert resp.status_code == HTTP_412_PRECONDITION_FAILED
+    position.refresh_from_db()
+    assert position.amount == 5
+    assert Order.objects.get(id=order.id).version == 2
+
+
+# изменение отзыва по устаревшей версии отклоняется с 412
+@pytest.mark.django_db
+def test_review_update_stale_version(user_api_client, review_factory):
+    review = review_factory()[0]
+    url = reverse("product-reviews-detail", args=[review.id])
+
+    resp = user_api_client.patch(url, data={"text": "first"}, format="json", HTTP_IF_MATCH='"1"')
+    assert resp.status_code == HTTP_200_OK
+    resp = user_api_client.patch(url, data={"text": "second"}, format="json", HTTP_IF_MATCH='W/"1"')
+
+    assert resp.status_code == HTTP_412_PRECONDITION_FAILED
+    review.refresh_from_db()
+    assert review.text == "first"
+    assert review.version == 2
+
+
+# параллельные увеличения количества в позиции заказа не теряются: каждое либо применяется, либо получает 412
+@pytest.mark.django_db(transaction=True)
+def test_order_concurrent_updates_not_lost(settings, user_token, order_update_payload):
+    settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}}
+    url, payload = order_update_payload
+    product_id = payload["positions"][0]["product_id"]
+    threads_count, increments = 4, 5
+    errors = []
+
+    def increment():
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {user_token}")
+        try:
+            done = 0
+            while done < increments:
+                resp = client.get(url)
+                amount = next(position["amount"] for position in resp.json()["positions"]
+                              if position["product_id"] == product_id)
+                resp = client.patch(url, format="json", HTTP_IF_MATCH=resp["ETag"],
+                                    data={"positions": [{"product_id": product_id, "amount": amount + 1}]})
+                if resp.status_code == HTTP_412_PRECONDITION_FAILED:
+                    continue
+                assert resp.status_code == HTTP_200_OK
+                done += 1
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    order = Order.objects.get(id=url.rstrip("/").split("/")[-1])
+    order.positions.filter(product_id=product_id).update(amount=1)
+    threads = [threading.Thread(target=increment) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+
+    assert not errors
+    order.refresh_from_db()
+    assert order.positions.get(product_id=product_id).amount == 1 + threads_count * increments
+    assert order.version == 1 + threads_count * increments
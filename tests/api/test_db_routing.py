@@ -0,0 +1,61 @@
+import pytest
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
+
+from api.models import Product
+
+
+@pytest.fixture
+def replica_routing(settings):
+    settings.REPLICA_DATABASES = ['replica']
+    # В основной базе и в реплике разные данные, чтобы было видно, откуда пришёл ответ
+    primary_product = baker.make("Product", name="primary")
+    baker.make("Product", name="replica", _using="replica")
+    return primary_product
+
+
+# проверка чтения списка товаров с реплики
+@pytest.mark.django_db(databases=['default', 'replica'])
+def test_products_list_from_replica(replica_routing, user_api_client):
+    resp = user_api_client.get(reverse("products-list"))
+
+    assert resp.status_code == HTTP_200_OK
+    assert [product["name"] for product in resp.json()] == ["replica"]
+
+
+# проверка записи в основную базу
+@pytest.mark.django_db(databases=['default', 'replica'])
+def test_product_create_to_primary(replica_routing, admin_api_client, product_create_payload):
+    resp = admin_api_client.post(reverse("products-list"), data=product_create_payload)
+
+    assert resp.status_code == HTTP_201_CREATED
+    assert Product.objects.using("default").filter(id=resp.json()["id"]).exists()
+    assert not Product.objects.using("replica").filter(name=product_create_payload["name"]).exists()
+
+
+# проверка чтения с основной базы после записи пользователя (read-your-writes)
+@pytest.mark.django_db(databases=['default', 'replica'])
+def test_reads_pinned_to_primary_after_write(replica_routing, user_api_client, another_user_api_client):
+    payload = {"positions": [{"product_id": replica_routing.id, "amount": 1}]}
+    resp = user_api_client.post(reverse("orders-list"), data=payload, format="json")
+    assert resp.status_code == HTTP_201_CREATED
+
+    resp = user_api_client.get(reverse("products-list"))
+    assert [product["name"] for product in resp.json()] == ["primary"]
+
+    # Другой пользователь по-прежнему читает с реплики
+    resp = another_user_api_client.get(reverse("products-list"))
+    assert [product["name"] for product in resp.json()] == ["replica"]
+
+
+# проверка заполнения кеша карточки товара с основной базы, даже когда запрос читает с реплики
+@pytest.mark.django_db(databases=['default', 'replica'])
+def test_product_cache_filled_from_primary(replica_routing, user_api_client):
+    # Отстающая реплика: у того же товара старое название
+    Product.objects.using("replica").filter(name="replica").update(id=replica_routing.id, name="stale")
+
+    resp = user_api_client.get(reverse("products-detail", args=[replica_routing.id]))
+
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()["name"] == "primary"
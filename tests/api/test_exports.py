@@ -0,0 +1,109 @@
+import csv
+import importlib.util
+import io
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_403_FORBIDDEN
+
+from api.models import Order, OrderStatusChoices, ProductOrder, ArchivedProductOrder
+
+
+@pytest.fixture
+def export_orders(order_factory):
+    """
+    10 заказов за сегодня и 10 завершённых заказов двухлетней давности, перенесённых в архив
+    """
+    old_date = timezone.localdate() - timedelta(days=800)
+    old_orders = order_factory(status=OrderStatusChoices.DONE)
+    Order.objects.filter(id__in=[order.id for order in old_orders]).update(created_at=old_date)
+    call_command("archive_orders", days=365)
+    return order_factory(), old_date
+
+
+# проверка выгрузки в CSV за диапазон дат
+@pytest.mark.django_db
+def test_orders_export_csv(admin_api_client, export_orders):
+    orders, _ = export_orders
+    today = timezone.localdate().isoformat()
+
+    resp = admin_api_client.get(reverse("orders-export"), {"start": today, "end": today, "export_format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(b"".join(resp.streaming_content).decode())))
+
+    assert resp.status_code == HTTP_200_OK
+    assert resp["Content-Type"] == "text/csv"
+    assert len(rows) == ProductOrder.objects.count()
+    assert {int(row["order_id"]) for row in rows} == {order.id for order in orders}
+    assert {row["created_at"] for row in rows} == {today}
+
+
+# выгрузка без диапазона захватывает архив
+@pytest.mark.django_db
+def test_orders_export_includes_archive(admin_api_client, export_orders):
+    _, old_date = export_orders
+
+    resp = admin_api_client.get(reverse("orders-export"), {"export_format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(b"".join(resp.streaming_content).decode())))
+
+    assert {row["created_at"] for row in rows} == {timezone.localdate().isoformat(), old_date.isoformat()}
+
+
+# без export_format выгрузка в Parquet, если установлен pyarrow, иначе в CSV
+@pytest.mark.django_db
+def test_orders_export_default_format(admin_api_client, export_orders):
+    resp = admin_api_client.get(reverse("orders-export"))
+    content = b"".join(resp.streaming_content)
+    positions = ProductOrder.objects.count() + ArchivedProductOrder.objects.count()
+
+    assert resp.status_code == HTTP_200_OK
+    if importlib.util.find_spec("pyarrow"):
+        import pyarrow.parquet
+
+        assert resp["Content-Type"] == "application/vnd.apache.parquet"
+        assert pyarrow.parquet.read_table(io.BytesIO(content)).num_rows == positions
+    else:
+        assert resp["Content-Type"] == "text/csv"
+        assert len(list(csv.DictReader(io.StringIO(content.decode())))) == positions
+
+
+# выгрузка доступна только админам
+@pytest.mark.django_db
+def test_orders_export_forbidden(user_api_client):
+    resp = user_api_client.get(reverse("orders-export"))
+
+    assert resp.status_code == HTTP_403_FORBIDDEN
+
+
+# проверка выгрузки в Parquet командой: каждая пачка - отдельная группа строк
+@pytest.mark.django_db
+def test_export_orders_command_parquet(export_orders, tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    output = tmp_path / "orders.parquet"
+    call_command("export_orders", str(output), format="parquet", chunk_size=7,
+                 start=timezone.localdate(), stdout=io.StringIO())
+    parquet_file = pyarrow.parquet.ParquetFile(output)
+    positions = ProductOrder.objects.count()
+
+    assert parquet_file.metadata.num_rows == positions
+    assert parquet_file.metadata.num_row_groups == -(-positions // 7)
+
+
+# проверка выгрузки в Arrow IPC: файл читается через memory map
+@pytest.mark.django_db
+def test_orders_export_arrow(admin_api_client, export_orders, tmp_path):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+
+    resp = admin_api_client.get(reverse("orders-export"), {"export_format": "arrow"})
+    output = tmp_path / "orders.arrow"
+    output.write_bytes(b"".join(resp.streaming_content))
+
+    with pyarrow.memory_map(str(output)) as source:
+        table = pyarrow.ipc.open_file(source).read_all()
+    assert table.column_names[:3] == ["order_id", "user_id", "status"]
+    assert table.num_rows == ProductOrder.objects.count() + ArchivedProductOrder.objects.count()
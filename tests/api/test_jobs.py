@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+import pytest
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_201_CREATED
+
+from api.models import Job, JobStatusChoices
+from api.queue import task, enqueue, Worker
+
+calls = []
+
+
+@task
+def record_call(value):
+    calls.append(value)
+
+
+@task
+def always_fail():
+    raise RuntimeError("boom")
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+# задача ставится в очередь только после коммита и выполняется воркером
+@pytest.mark.django_db
+def test_job_enqueued_on_commit_and_executed():
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        enqueue("record_call", value=1)
+        assert not Job.objects.exists()
+
+    assert Worker().run_once() == 1
+    assert calls == [1]
+    assert Job.objects.get().status == JobStatusChoices.DONE
+
+
+# упавшая задача повторяется с задержкой, после исчерпания попыток помечается ошибкой
+@pytest.mark.django_db
+def test_job_retry_with_backoff(settings):
+    settings.JOB_RETRY_BACKOFF = 10
+    job = Job.objects.create(name="always_fail", max_attempts=2)
+
+    Worker().run_once()
+    job.refresh_from_db()
+    assert job.status == JobStatusChoices.QUEUED
+    assert job.attempts == 1
+    assert job.run_at > timezone.now() + timedelta(seconds=5)
+    assert "boom" in job.last_error
+
+    Job.objects.filter(id=job.id).update(run_at=timezone.now())
+    Worker().run_once()
+    job.refresh_from_db()
+    assert job.status == JobStatusChoices.FAILED
+    assert job.attempts == 2
+
+
+# задачу упавшего воркера забирает другой воркер после истечения времени закрепления
+@pytest.mark.django_db
+def test_job_reclaimed_after_visibility_timeout():
+    Job.objects.create(name="record_call", payload={"value": 2}, status=JobStatusChoices.RUNNING, attempts=1,
+                       locked_until=timezone.now() + timedelta(minutes=1))
+    assert Worker().run_once() == 0
+
+    Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+    assert Worker().run_once() == 1
+    assert calls == [2]
+
+
+# задача упавшего воркера на последней попытке помечается ошибкой, а не выполняется ещё раз
+@pytest.mark.django_db
+def test_job_reclaim_respects_max_attempts():
+    job = Job.objects.create(name="record_call", payload={"value": 3}, status=JobStatusChoices.RUNNING, attempts=2,
+                             max_attempts=2, locked_until=timezone.now() - timedelta(seconds=1))
+
+    assert Worker().run_once() == 0
+    job.refresh_from_db()
+    assert job.status == JobStatusChoices.FAILED
+    assert job.attempts == 2
+    assert calls == []
+
+
+class StopWorker(Exception):
+    pass
+
+
+# ошибка итерации не останавливает воркер: пауза растёт, после успешной итерации сбрасывается
+def test_worker_survives_iteration_errors(monkeypatch, settings):
+    settings.JOB_WORKER_BACKOFF_MAX = 3
+    results = [RuntimeError("db down"), RuntimeError("db down"), RuntimeError("db down"), 1, 0]
+    sleeps = []
+
+    def run_once():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if not results:
+            raise StopWorker()
+
+    worker = Worker(sleep=1)
+    monkeypatch.setattr(worker, "run_once", run_once)
+    monkeypatch.setattr("api.queue.time.sleep", sleep)
+    monkeypatch.setattr("api.queue.close_old_connections", lambda: None)
+
+    with pytest.raises(StopWorker):
+        worker.run_forever()
+    assert sleeps == [2, 3, 3, 1]
+
+
+# создание заказа ставит в очередь уведомление
+@pytest.mark.django_db
+def test_order_create_enqueues_notification(user_api_client, order_create_payload):
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        resp = user_api_client.post(reverse("orders-list"), data=order_create_payload, format="json")
+
+    assert resp.status_code == HTTP_201_CREATED
+    job = Job.objects.get(name="notify_order_created")
+    assert job.payload == {"order_id": resp.json()["id"]}
+    assert Worker().run_once() == 1
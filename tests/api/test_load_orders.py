@@ -0,0 +1,38 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from api.models import Order
+
+
+# проверка нагрузочного теста заказов в процессе
+@pytest.mark.django_db(transaction=True)
+def test_load_orders_in_process(product_factory, tmp_path):
+    product_factory()
+    output = tmp_path / "report.json"
+
+    call_command("load_orders", users=3, concurrency=2, requests=30, seed=1, output=str(output))
+    report = json.loads(output.read_text(encoding="utf-8"))
+
+    assert report["requests"] == 30
+    assert sum(operation["count"] for operation in report["operations"].values()) == 30
+    # SQLite допускает только одну пишущую транзакцию, такие ошибки учитываются как блокировки
+    assert report["errors"]["status_5xx"] == report["errors"]["lock_errors"] + report["errors"]["deadlocks"]
+    assert Order.objects.count() == report["operations"]["create"]["count"] - report["operations"]["create"]["errors"]
+    assert set(report["operations"]["create"]) >= {"p50_ms", "p90_ms", "p99_ms"}
+
+
+# проверка учёта запросов к недоступному серверу как неудачных
+@pytest.mark.django_db(transaction=True)
+def test_load_orders_unreachable_server(product_factory, tmp_path):
+    product_factory()
+    output = tmp_path / "report.json"
+
+    call_command("load_orders", url="http://127.0.0.1:1", users=2, concurrency=2, requests=10, seed=1,
+                 output=str(output), stdout=StringIO())
+    report = json.loads(output.read_text(encoding="utf-8"))
+
+    assert report["errors"]["connection_errors"] == 10
+    assert sum(operation["errors"] for operation in report["operations"].values()) == 10
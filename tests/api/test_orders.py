@@ -2,8 +2,10 @@ import random
 
 import pytest
 from django.urls import reverse
-from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_404_NOT_FOUND, HTTP_204_NO_CONTENT
-from api.models import OrderStatusChoices
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_404_NOT_FOUND, HTTP_204_NO_CONTENT, \
+    HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN
+from api.models import Order, OrderStatusChoices, OrderStatusHistory
 
 
 # проверка получения 1го заказ
@@ -191,3 +193,94 @@ def test_order_delete_by_another_user(another_user_api_client, order_factory):
 
     assert resp.status_code == HTTP_404_NOT_FOUND
 
+
+# тест на массовую смену статуса заказов
+# администратором
+@pytest.mark.django_db
+def test_order_transition_by_admin(order_factory, admin_api_client, admin):
+    new_orders = order_factory(status=OrderStatusChoices.NEW)
+    done_order = order_factory(status=OrderStatusChoices.DONE)[0]
+    ids = [order.id for order in new_orders] + [done_order.id]
+    url = reverse("orders-transition")
+
+    resp = admin_api_client.post(url, data={"ids": ids, "status": OrderStatusChoices.IN_PROGRESS}, format="json")
+    resp_json = resp.json()
+
+    assert resp.status_code == HTTP_200_OK
+    assert resp_json["updated"] == sorted(order.id for order in new_orders)
+    assert resp_json["skipped"] == [done_order.id]
+    assert Order.objects.filter(status=OrderStatusChoices.IN_PROGRESS).count() == len(new_orders)
+    assert OrderStatusHistory.objects.filter(changed_by=admin, to_status=OrderStatusChoices.IN_PROGRESS).count() \
+           == len(new_orders)
+
+
+# в недопустимый статус (должен вызывать ошибку)
+@pytest.mark.django_db
+def test_order_transition_to_invalid_status(order_factory, admin_api_client):
+    ids = [order.id for order in order_factory(status=OrderStatusChoices.IN_PROGRESS)]
+    url = reverse("orders-transition")
+
+    resp = admin_api_client.post(url, data={"ids": ids, "status": OrderStatusChoices.NEW}, format="json")
+
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert not Order.objects.filter(status=OrderStatusChoices.NEW).exists()
+
+
+# больше заказов, чем помещается параметров в один запрос SQLite
+@pytest.mark.django_db
+def test_order_transition_many_ids(admin_api_client, user):
+    baker.make("Order", user=user, status=OrderStatusChoices.NEW, order_sum=0, _quantity=1500, _bulk_create=True)
+    ids = list(Order.objects.values_list("id", flat=True))
+    url = reverse("orders-transition")
+
+    resp = admin_api_client.post(url, data={"ids": ids, "status": OrderStatusChoices.IN_PROGRESS}, format="json")
+
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()["updated"] == sorted(ids)
+    assert Order.objects.filter(status=OrderStatusChoices.IN_PROGRESS).count() == 1500
+    assert OrderStatusHistory.objects.filter(to_status=OrderStatusChoices.IN_PROGRESS).count() == 1500
+
+
+# пользователем (должен вызывать ошибку)
+@pytest.mark.django_db
+def test_order_transition_by_user(order_factory, user_api_client):
+    ids = [order.id for order in order_factory(status=OrderStatusChoices.NEW)]
+    url = reverse("orders-transition")
+
+    resp = user_api_client.post(url, data={"ids": ids, "status": OrderStatusChoices.IN_PROGRESS}, format="json")
+
+    assert resp.status_code == HTTP_403_FORBIDDEN
+
+
+# проверка сводки по заказам пользователя
+@pytest.mark.django_db
+def test_order_summary(order_factory, user_api_client, django_assert_num_queries):
+    orders = order_factory(status=OrderStatusChoices.NEW) + order_factory(status=OrderStatusChoices.DONE)
+    url = reverse("orders-summary")
+
+    resp = user_api_client.get(url)
+    resp_json = resp.json()
+
+    assert resp.status_code == HTTP_200_OK
+    assert resp_json["counts"] == {"NEW": 10, "IN_PROGRESS": 0, "DONE": 10}
+    assert resp_json["total"] == 20
+    assert resp_json["order_sum"] == round(sum(order.order_sum for order in orders), 2)
+    assert resp_json["latest_order"]["id"] == max(order.id for order in orders)
+
+    # повторный запрос берётся из кеша: только запрос токена
+    with django_assert_num_queries(1):
+        assert user_api_client.get(url).json() == resp_json
+
+
+# сводка сбрасывается при создании заказа
+@pytest.mark.django_db
+def test_order_summary_invalidated_on_create(user_api_client, order_create_payload):
+    url = reverse("orders-summary")
+    assert user_api_client.get(url).json()["total"] == 0
+
+    resp = user_api_client.post(reverse("orders-list"), data=order_create_payload, format="json")
+    summary = user_api_client.get(url).json()
+
+    assert summary["total"] == 1
+    assert summary["counts"]["NEW"] == 1
+    assert summary["latest_order"]["id"] == resp.json()["id"]
@@ -0,0 +1,127 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
+
+from api.models import Product, ProductPrice, Order
+from api.prices import price_at, order_sums
+
+
+# проверка записи истории цен при создании товара и изменении цены
+@pytest.mark.django_db
+def test_price_history_on_update(admin_api_client, product_create_payload):
+    resp = admin_api_client.post(reverse("products-list"), data=product_create_payload)
+    assert resp.status_code == HTTP_201_CREATED
+    url = reverse("products-detail", args=[resp.json()["id"]])
+
+    admin_api_client.patch(url, data={"name": "Новое название"})
+    admin_api_client.patch(url, data={"price": 999})
+
+    history = ProductPrice.objects.filter(product_id=resp.json()["id"]).order_by("valid_from")
+    assert [price.price for price in history] == [float(product_create_payload["price"]), 999]
+
+
+# проверка цены товара на момент времени
+@pytest.mark.django_db
+def test_price_at():
+    product = baker.make("Product", price=100)
+    moment = timezone.now()
+    ProductPrice.objects.create(product=product, price=150, valid_from=moment + timedelta(days=1))
+
+    assert price_at(product.id, moment) == 100
+    assert price_at(product.id, moment + timedelta(days=2)) == 150
+    assert price_at(product.id, moment - timedelta(days=1)) is None
+
+
+# проверка, что изменение заказа пересчитывает сумму по ценам на момент оформления
+@pytest.mark.django_db
+def test_order_update_uses_price_at_order_time(user_api_client, admin_api_client):
+    product = baker.make("Product", price=100)
+    resp = user_api_client.post(reverse("orders-list"), data={"positions": [{"product_id": product.id, "amount": 1}]},
+                                format="json")
+    order_url = reverse("orders-detail", args=[resp.json()["id"]])
+
+    admin_api_client.patch(reverse("products-detail", args=[product.id]), data={"price": 500})
+    resp = user_api_client.patch(order_url, data={"positions": [{"product_id": product.id, "amount": 3}]},
+                                 format="json")
+
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()["order_sum"] == 300
+
+
+# сумма нового заказа считается по истории цен, как и order_sums: наступившая, но ещё не перенесённая
+# в товар цена уже действует, запланированная на будущее - ещё нет
+@pytest.mark.django_db
+def test_order_create_uses_price_history(user_api_client):
+    product, other = baker.make("Product", price=100, _quantity=2)
+    due = ProductPrice.objects.create(product=product, price=70, valid_from=timezone.now() + timedelta(days=1))
+    ProductPrice.objects.create(product=other, price=50, valid_from=timezone.now() + timedelta(days=1))
+    # наступил день начала действия цены, promote_prices ещё не запускался
+    ProductPrice.objects.filter(id=due.id).update(valid_from=timezone.now())
+
+    resp = user_api_client.post(reverse("orders-list"), format="json", data={
+        "positions": [{"product_id": product.id, "amount": 2}, {"product_id": other.id, "amount": 1}]})
+
+    assert resp.status_code == HTTP_201_CREATED
+    order = Order.objects.get(id=resp.json()["id"])
+    assert Product.objects.get(id=product.id).price == 100
+    assert order.order_sum == 240
+    assert order_sums([order.id]) == {order.id: order.order_sum}
+
+
+# проверка сверки сумм заказов с историей цен и исправления расхождений
+@pytest.mark.django_db
+def test_audit_order_sums(user_api_client):
+    product = baker.make("Product", price=100)
+    resp = user_api_client.post(reverse("orders-list"), data={"positions": [{"product_id": product.id, "amount": 2}]},
+                                format="json")
+    order_id = resp.json()["id"]
+    Order.objects.filter(id=order_id).update(order_sum=1)
+
+    out = StringIO()
+    call_command("audit_order_sums", stdout=out)
+    assert f"Заказ {order_id}: 1.0 -> 200.0" in out.getvalue()
+    assert Order.objects.get(id=order_id).order_sum == 1
+
+    call_command("audit_order_sums", fix=True, stdout=StringIO())
+    assert Order.objects.get(id=order_id).order_sum == 200
+
+
+# проверка пакетной загрузки прайс-листа
+@pytest.mark.django_db
+def test_import_prices(tmp_path):
+    first, second = baker.make("Product", price=100, _quantity=2)
+    tomorrow = (timezone.now() + timedelta(days=1)).isoformat()
+    path = tmp_path / "prices.csv"
+    path.write_text(f"product_id,price,valid_from\n{first.id},120\n{second.id},80\n{second.id},70,{tomorrow}\n")
+
+    call_command("import_prices", str(path), batch_size=2, stdout=StringIO())
+
+    assert ProductPrice.objects.filter(product__in=[first, second]).count() == 5
+    assert Product.objects.get(id=first.id).price == 120
+    # цена с будущей датой попадает в историю, но ещё не действует
+    assert Product.objects.get(id=second.id).price == 80
+
+
+# проверка переноса наступивших цен из истории в текущую цену товара
+@pytest.mark.django_db
+def test_promote_prices():
+    product, other = baker.make("Product", price=100, _quantity=2)
+    due = ProductPrice.objects.create(product=product, price=70, valid_from=timezone.now() + timedelta(days=1))
+    ProductPrice.objects.create(product=other, price=50, valid_from=timezone.now() + timedelta(days=1))
+
+    call_command("promote_prices", stdout=StringIO())
+    assert Product.objects.get(id=product.id).price == 100
+
+    # наступил день начала действия одной из цен
+    ProductPrice.objects.filter(id=due.id).update(valid_from=timezone.now())
+    call_command("promote_prices", stdout=StringIO())
+
+    assert Product.objects.get(id=product.id).price == 70
+    assert Product.objects.get(id=other.id).price == 100
+    assert price_at(product.id, timezone.now()) == 70
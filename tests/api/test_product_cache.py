@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_404_NOT_FOUND
+
+from api.product_cache import SingleFlight, local_cache
+
+
+# повторное получение товара не обращается к базе
+@pytest.mark.django_db
+def test_product_retrieve_cached(client, product_factory):
+    product = product_factory()[0]
+    url = reverse("products-detail", args=[product.id])
+
+    first = client.get(url)
+    with CaptureQueriesContext(connection) as queries:
+        second = client.get(url)
+
+    assert second.status_code == HTTP_200_OK
+    assert second.json() == first.json()
+    assert len(queries) == 0
+
+
+# изменение товара сбрасывает оба уровня кеша
+@pytest.mark.django_db
+def test_product_cache_invalidated_on_update(client, admin_api_client, product_factory):
+    product = product_factory()[0]
+    url = reverse("products-detail", args=[product.id])
+    client.get(url)
+
+    resp = admin_api_client.patch(url, {"price": 777.5})
+    assert resp.status_code == HTTP_200_OK
+
+    assert client.get(url).json()["price"] == 777.5
+
+
+# смена версии в общем кеше (изменение товара в другом процессе) сбрасывает кеш процесса
+@pytest.mark.django_db
+def test_product_cache_version_stamp(client, product_factory, settings):
+    settings.PRODUCT_CACHE_VERSION_CHECK_SECONDS = 0
+    product = product_factory()[0]
+    url = reverse("products-detail", args=[product.id])
+    client.get(url)
+    assert local_cache.get(product.id) is not None
+
+    cache.set(f"product-version:{product.id}", time.time_ns(), None)
+    with CaptureQueriesContext(connection) as queries:
+        resp = client.get(url)
+
+    assert resp.status_code == HTTP_200_OK
+    assert len(queries) == 1
+
+
+# между сверками версии кеш процесса не обращается к общему кешу, после интервала - замечает новую версию
+@pytest.mark.django_db
+def test_product_cache_version_check_interval(client, product_factory, settings):
+    settings.PRODUCT_CACHE_VERSION_CHECK_SECONDS = 0.2
+    product = product_factory()[0]
+    url = reverse("products-detail", args=[product.id])
+    client.get(url)
+
+    cache.set(f"product-version:{product.id}", time.time_ns(), None)
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    assert len(queries) == 0
+
+    time.sleep(0.3)
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    assert len(queries) == 1
+
+
+# отсутствующий товар не кешируется
+@pytest.mark.django_db
+def test_product_cache_not_found(client, product_factory):
+    product = product_factory()[0]
+    url = reverse("products-detail", args=[product.id])
+    product.delete()
+
+    assert client.get(url).status_code == HTTP_404_NOT_FOUND
+    assert local_cache.get(product.id) is None
+
+
+# одновременные запросы по одному ключу вычисляются один раз
+def test_single_flight_coalesces_calls():
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "data"
+
+    def worker():
+        results.append(single_flight.do("key", load))
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == ["data"] * 6
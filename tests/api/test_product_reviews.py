@@ -1,9 +1,15 @@
 import random
+from datetime import timedelta
 
 import pytest
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from model_bakery import baker
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN, HTTP_204_NO_CONTENT
 
+from api.models import ProductReview
+
 
 # проверка получения 1го отзыва
 @pytest.mark.django_db
@@ -50,11 +56,12 @@ def test_reviews_filter_by_creation_date(user_api_client, review_factory):
     random_review_creation_date = random.choice(review_factory()).created_at
     url = reverse("product-reviews-list")
 
-    resp = user_api_client.get(url, {"created_at": random_review_creation_date})
+    resp = user_api_client.get(url, {"created_at_after": random_review_creation_date.date(),
+                                     "created_at_before": random_review_creation_date.date()})
     resp_json = resp.json()[0]
 
     assert resp.status_code == HTTP_200_OK
-    assert resp_json["created_at"] == str(random_review_creation_date)
+    assert parse_datetime(resp_json["created_at"]).date() == random_review_creation_date.date()
 
 
 # проверка фильтрации списка отзывов по продукту
@@ -171,3 +178,88 @@ def test_review_delete_by_another_user(review_factory, another_user_api_client,
     resp = another_user_api_client.delete(url)
 
     assert resp.status_code == HTTP_403_FORBIDDEN
+
+
+# проверка данных автора в отзыве и детерминированного порядка при одинаковом времени обновления
+@pytest.mark.django_db
+def test_reviews_list_with_author_and_tiebreaker(user_api_client, user, review_factory, django_assert_num_queries):
+    reviews = review_factory()
+    ProductReview.objects.update(updated_at=reviews[0].updated_at)
+    url = reverse("product-reviews-list")
+
+    # запрос токена и один запрос отзывов вместе с авторами
+    with django_assert_num_queries(2):
+        resp = user_api_client.get(url)
+    resp_json = resp.json()
+
+    assert resp.status_code == HTTP_200_OK
+    assert [review["id"] for review in resp_json] == sorted((review.id for review in reviews), reverse=True)
+    assert resp_json[0]["author"] == {"id": user.id, "username": user.username,
+                                      "first_name": user.first_name, "last_name": user.last_name}
+
+
+# проверка постраничной выдачи отзывов товара по ключу
+@pytest.mark.django_db
+def test_reviews_cursor_pagination(user_api_client, user):
+    product = baker.make("Product")
+    reviews = baker.make("ProductReview", user=user, product=product, _quantity=5)
+    url = reverse("product-reviews-list")
+
+    first_page = user_api_client.get(url, {"product": product.id, "page_size": 3}).json()
+    second_page = user_api_client.get(first_page["next"]).json()
+    ids = [review["id"] for review in first_page["results"] + second_page["results"]]
+
+    assert ids == sorted((review.id for review in reviews), reverse=True)
+    assert second_page["next"] is None
+
+
+# проверка раскрытия товара в отзывах одним дополнительным запросом
+@pytest.mark.django_db
+def test_review_expand_product(review_factory, user_api_client, django_assert_num_queries):
+    reviews = review_factory()
+    url = reverse("product-reviews-list")
+
+    # запрос токена, запрос отзывов и запрос товаров
+    with django_assert_num_queries(3):
+        resp = user_api_client.get(url, {"fields": "id,rating", "expand": "product"})
+    resp_json = resp.json()
+
+    assert resp.status_code == HTTP_200_OK
+    assert set(resp_json[0]) == {"id", "rating", "product"}
+    products = {review.id: review.product for review in reviews}
+    assert all(review["product"]["name"] == products[review["id"]].name for review in resp_json)
+
+
+# проверка статистики отзывов товара
+@pytest.mark.django_db
+def test_review_stats(user, user_api_client, django_assert_num_queries):
+    now = timezone.now()
+    product, other_product = baker.make("Product", _quantity=2)
+    for rating, days in [(5, 0), (5, 0), (4, 8), (3, 40), (1, 40)]:
+        review = baker.make("ProductReview", user=user, product=product, rating=rating)
+        ProductReview.objects.filter(id=review.id).update(created_at=now - timedelta(days=days))
+    baker.make("ProductReview", user=user, product=other_product, rating=2, _quantity=2)
+    url = reverse("product-reviews-stats")
+
+    # запрос токена, проверка товара фильтром, запрос распределения, запрос по неделям и средней по всем отзывам
+    with django_assert_num_queries(5):
+        resp = user_api_client.get(url, {"product": product.id})
+    resp_json = resp.json()
+
+    assert resp.status_code == HTTP_200_OK
+    assert resp_json["count"] == 5
+    assert [row["count"] for row in resp_json["distribution"]] == [1, 0, 1, 1, 2]
+    assert resp_json["average"] == 3.6
+    assert resp_json["bayesian_average"] == round((10 * 22 / 7 + 18) / 15, 2)
+    assert resp_json["percentiles"] == {"p25": 3, "p50": 4, "p75": 5, "p90": 5}
+    assert resp_json["velocity"]["last_7_days"] == 2
+    assert resp_json["velocity"]["last_30_days"] == 3
+    assert sum(week["count"] for week in resp_json["weekly"]) == 5
+    assert [week["week"] for week in resp_json["weekly"]] == sorted(week["week"] for week in resp_json["weekly"])
+
+    # повторный запрос с теми же фильтрами берётся из кеша: только запрос токена и проверка товара
+    with django_assert_num_queries(2):
+        assert user_api_client.get(url, {"product": product.id}).json() == resp_json
+
+    resp = user_api_client.get(url, {"product": product.id, "created_at_after": (now - timedelta(days=10)).date()})
+    assert resp.json()["count"] == 3
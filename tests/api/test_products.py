@@ -1,8 +1,12 @@
 import random
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN, HTTP_204_NO_CONTENT
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN, HTTP_204_NO_CONTENT, \
+    HTTP_400_BAD_REQUEST
 
 
 # проверка получения 1го продукта (retrieve-логика)
@@ -145,3 +149,91 @@ def test_products_delete_by_user(product_factory, user_api_client):
     resp = user_api_client.delete(url)
 
     assert resp.status_code == HTTP_403_FORBIDDEN
+
+
+# проверка фасетов для отфильтрованного списка товаров
+@pytest.mark.django_db
+def test_products_facets(user_api_client, user, django_assert_num_queries):
+    cheap = baker.make("Product", name="book cheap", price=100)
+    expensive = baker.make("Product", name="book expensive", price=3000)
+    baker.make("Product", name="pen", price=50)
+    baker.make("ProductReview", product=cheap, user=user, rating=5)
+    collection = baker.make("Collection", title="books")
+    collection.products.add(cheap, expensive)
+    url = reverse("products-facets")
+
+    # запрос токена, запрос диапазонов и запрос подборок
+    with django_assert_num_queries(3):
+        resp = user_api_client.get(url, {"name": "book"})
+    resp_json = resp.json()
+
+    assert resp.status_code == HTTP_200_OK
+    assert resp_json["count"] == 2
+    assert [band["count"] for band in resp_json["price"]] == [1, 0, 0, 1, 0]
+    assert resp_json["price"][-1] == {"min": 5000, "max": None, "count": 0}
+    assert [band["count"] for band in resp_json["rating"]] == [0, 0, 0, 1, 1]
+    assert resp_json["collections"] == [{"id": collection.id, "title": "books", "count": 2}]
+
+    # повторный запрос с теми же фильтрами берётся из кеша
+    with django_assert_num_queries(1):
+        assert user_api_client.get(url, {"name": "book"}).json() == resp_json
+
+
+# фасеты кешируются по набору фильтров независимо от порядка параметров в запросе
+@pytest.mark.django_db
+def test_products_facets_cache_key_order(user_api_client, django_assert_num_queries):
+    baker.make("Product", name="book", price=100)
+    url = reverse("products-facets")
+    resp_json = user_api_client.get(f"{url}?name=book&price_min=10").json()
+
+    # только запрос токена
+    with django_assert_num_queries(1):
+        assert user_api_client.get(f"{url}?price_min=10&name=book").json() == resp_json
+
+
+# проверка выборочных полей: описание не попадает ни в ответ, ни в SQL-запрос
+@pytest.mark.django_db
+def test_products_sparse_fields(user_api_client, product_factory):
+    product_factory()
+    url = reverse("products-list")
+
+    with CaptureQueriesContext(connection) as queries:
+        resp = user_api_client.get(url, {"fields": "id,name,price"})
+
+    assert resp.status_code == HTTP_200_OK
+    assert all(set(product) == {"id", "name", "price"} for product in resp.json())
+    assert not any("description" in query["sql"] for query in queries.captured_queries)
+
+
+# проверка выборочных полей с неизвестным полем (должен вызывать ошибку)
+@pytest.mark.django_db
+def test_products_sparse_fields_unknown(user_api_client, product_factory):
+    product_factory()
+    url = reverse("products-list")
+
+    resp = user_api_client.get(url, {"fields": "id,secret"})
+
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+
+
+# проверка фильтра по подборке: товары подборки с фильтром по цене и постраничной выдачей одним запросом с одним JOIN
+@pytest.mark.django_db
+def test_products_filter_by_collection(user_api_client):
+    products = [baker.make("Product", price=price) for price in (100, 200, 300, 400)]
+    baker.make("Product", price=250)
+    collection = baker.make("Collection")
+    collection.products.add(*products)
+    url = reverse("products-list")
+
+    with CaptureQueriesContext(connection) as queries:
+        resp = user_api_client.get(url, {"collection": collection.id, "price_min": 150, "page_size": 2})
+    resp_json = resp.json()
+
+    assert resp.status_code == HTTP_200_OK
+    assert [product["id"] for product in resp_json["results"]] == [products[1].id, products[2].id]
+    # запрос токена и запрос страницы
+    assert len(queries) == 2
+    assert queries[1]["sql"].count("JOIN") == 1
+
+    resp = user_api_client.get(resp_json["next"])
+    assert [product["id"] for product in resp.json()["results"]] == [products[3].id]
@@ -0,0 +1,56 @@
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK
+
+
+@pytest.fixture
+def profiling_settings(settings, tmp_path):
+    settings.PROFILING_ENABLED = True
+    settings.PROFILING_TOKEN = "secret"
+    settings.PROFILING_DIR = tmp_path
+    return settings
+
+
+# проверка профилирования запроса по токену
+@pytest.mark.django_db
+def test_profile_by_token(profiling_settings, product_factory, user_api_client):
+    product_factory()
+
+    resp = user_api_client.get(reverse("products-list"), HTTP_X_PROFILE_TOKEN="secret")
+
+    assert resp.status_code == HTTP_200_OK
+    assert len(resp.json()) == 10
+    assert (profiling_settings.PROFILING_DIR / resp["X-Profile-Id"]).exists()
+    assert "ProductViewSet.list" in resp["X-Profile-Id"]
+
+
+# без токена или с неверным токеном запрос не профилируется
+@pytest.mark.django_db
+def test_no_profile_without_token(profiling_settings, user_api_client):
+    resp = user_api_client.get(reverse("products-list"), HTTP_X_PROFILE_TOKEN="wrong")
+
+    assert resp.status_code == HTTP_200_OK
+    assert "X-Profile-Id" not in resp
+    assert not list(profiling_settings.PROFILING_DIR.iterdir())
+
+
+# проверка профилирования каждого N-го запроса и ограничения числа файлов
+@pytest.mark.django_db
+def test_profile_sampling_with_retention(profiling_settings, user_api_client):
+    profiling_settings.PROFILING_SAMPLE_RATE = 2
+    profiling_settings.PROFILING_MAX_FILES = 1
+    url = reverse("products-list")
+
+    profiled = [user_api_client.get(url).has_header("X-Profile-Id") for _ in range(4)]
+
+    assert profiled == [False, True, False, True]
+    assert len(list(profiling_settings.PROFILING_DIR.glob("*.prof"))) == 1
+
+
+# запрос админа с заголовком X-Profile профилируется, запрос обычного пользователя - нет
+@pytest.mark.django_db
+def test_profile_staff_header(profiling_settings, admin_api_client, user_api_client):
+    url = reverse("products-list")
+
+    assert admin_api_client.get(url, HTTP_X_PROFILE="1").has_header("X-Profile-Id")
+    assert not user_api_client.get(url, HTTP_X_PROFILE="1").has_header("X-Profile-Id")
@@ -0,0 +1,110 @@
+import os
+import warnings
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK
+from rest_framework.test import APIClient
+
+from api.models import ProductReview, Order, Collection
+from api.product_cache import local_cache
+from .query_plans import capture, compare, load_snapshot, save_snapshot, snapshot_path
+
+
+def scenarios(product, collection, order):
+    """
+    Сценарии: (название, клиент, имя маршрута, аргументы маршрута, параметры запроса).
+    Клиент - anon, user или admin
+    """
+    return [
+        ('products-list', 'anon', 'products-list', [], {}),
+        ('products-list-price', 'anon', 'products-list', [], {'price_min': 500, 'price_max': 5000}),
+        ('products-list-name', 'anon', 'products-list', [], {'name': 'Python'}),
+        ('products-list-collection-price', 'anon', 'products-list', [],
+         {'collection': collection.id, 'price_min': 500, 'page_size': 20}),
+        ('products-list-page', 'anon', 'products-list', [], {'page_size': 20}),
+        ('products-list-fields', 'anon', 'products-list', [], {'fields': 'id,name,price'}),
+        ('products-detail', 'anon', 'products-detail', [product.id], {}),
+        ('products-facets', 'anon', 'products-facets', [], {'name': 'Python'}),
+        ('reviews-list-product', 'anon', 'product-reviews-list', [], {'product': product.id}),
+        ('reviews-list-page', 'anon', 'product-reviews-list', [], {'page_size': 20}),
+        ('reviews-stats-product', 'anon', 'product-reviews-stats', [], {'product': product.id}),
+        ('orders-list', 'admin', 'orders-list', [], {}),
+        ('orders-list-status', 'admin', 'orders-list', [], {'status': 'NEW'}),
+        ('orders-list-product', 'admin', 'orders-list', [], {'product_id': product.id}),
+        ('orders-list-user', 'user', 'orders-list', [], {}),
+        ('orders-detail', 'admin', 'orders-detail', [order.id], {}),
+        ('orders-summary', 'user', 'orders-summary', [], {}),
+        ('collections-list', 'anon', 'product-collections-list', [], {}),
+        ('collections-list-product', 'anon', 'product-collections-list', [], {'product': product.id}),
+        ('collections-detail', 'anon', 'product-collections-detail', [collection.id], {}),
+        ('favorites-list', 'user', 'favorites-list', [], {}),
+        ('changes-list', 'admin', 'changes-list', [], {'limit': 100}),
+        ('cart-list', 'user', 'cart-list', [], {}),
+    ]
+
+
+# SQL и планы запросов каждого сценария сверяются со снимком tests/api/query_plans/<СУБД>.json:
+# больше запросов или новый полный просмотр большой таблицы - ошибка, прочие изменения - предупреждение с разницей.
+# Обновить снимок: UPDATE_QUERY_PLANS=1 pytest tests/api/test_query_plans.py
+@pytest.mark.django_db
+def test_query_plans(admin_api_client):
+    call_command("seed_data", users=20, products=300, orders=300, reviews=300, collections=5, favorites=50,
+                 seed=0, stdout=StringIO())
+    order = Order.objects.order_by("id").first()
+    # Сценарии пользователя - от владельца первого заказа, у него есть заказы в сгенерированных данных
+    user_client = APIClient()
+    user_client.force_authenticate(user=order.user)
+    clients = {"anon": APIClient(), "user": user_client, "admin": admin_api_client}
+    product = ProductReview.objects.order_by("id").first().product
+    collection = Collection.objects.order_by("id").first()
+
+    update = os.environ.get("UPDATE_QUERY_PLANS") == "1"
+    snapshot = load_snapshot()
+    if snapshot is None and not update:
+        pytest.skip(f"Нет снимка {snapshot_path()}, создайте его с UPDATE_QUERY_PLANS=1")
+
+    actual = {}
+    regressions = []
+    diffs = []
+    for name, client, url_name, args, params in scenarios(product, collection, order):
+        # Каждый сценарий - с пустым кешем, иначе часть запросов не выполнится
+        cache.clear()
+        local_cache.clear()
+        response, queries = capture(lambda: clients[client].get(reverse(url_name, args=args), params))
+        assert response.status_code == HTTP_200_OK, name
+        actual[name] = queries
+        if not update:
+            case_regressions, diff = compare(name, snapshot.get(name, []), queries)
+            regressions.extend(case_regressions)
+            if diff:
+                diffs.append(diff)
+
+    if update:
+        save_snapshot(actual)
+        return
+    message = "\n\n".join(diffs)
+    assert not regressions, "\n".join(regressions) + "\n\n" + message
+    if diffs:
+        warnings.warn(f"Запросы изменились, обновите снимок (UPDATE_QUERY_PLANS=1):\n{message}")
+
+
+# полный просмотр сверяется по запросам: такой же просмотр в другом запросе снимка не в счёт
+def test_compare_seq_scans_per_query():
+    expected = [
+        {"sql": "SELECT a FROM api_order", "plan": [], "seq_scans": ["api_order"]},
+        {"sql": "SELECT b FROM api_product WHERE id = ?", "plan": [], "seq_scans": []},
+    ]
+    actual = [
+        {"sql": "SELECT a FROM api_order", "plan": [], "seq_scans": ["api_order"]},
+        {"sql": "SELECT b FROM api_product WHERE id = ?", "plan": [], "seq_scans": ["api_order"]},
+    ]
+
+    regressions, diff = compare("case", expected, actual)
+
+    assert regressions == ["case: запрос 2 полностью просматривает таблицу api_order"]
+    # запросы в другом порядке сравниваются по SQL
+    assert compare("case", expected, expected[::-1])[0] == []
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+
+from api.models import Product, ProductReview, Order, ProductOrder, Collection, Favorites, ProductPrice
+
+
+# проверка генерации синтетических данных
+@pytest.mark.django_db
+def test_seed_data_generate():
+    call_command("seed_data", users=5, products=20, orders=10, reviews=15, collections=2, favorites=8, batch_size=7)
+
+    assert Product.objects.count() == 20
+    assert Order.objects.count() == 10
+    assert ProductReview.objects.count() == 15
+    assert Collection.objects.count() == 2
+    assert Favorites.objects.count() == 8
+    for order in Order.objects.prefetch_related("positions__product"):
+        expected_sum = round(sum(p.product.price * p.amount for p in order.positions.all()), 2)
+        assert order.order_sum == expected_sum
+
+    # после пакетной вставки с явными id новые записи создаются обычным образом
+    assert Product.objects.create(name="new", description="new", price=1).id == 21
+
+
+# одно и то же зерно даёт одинаковые данные
+@pytest.mark.django_db
+def test_seed_data_is_reproducible(user):
+    call_command("seed_data", users=0, products=10, orders=5, reviews=0, collections=0, favorites=0, seed=42)
+    first_run = list(Product.objects.values_list("name", "price"))
+    positions = list(ProductOrder.objects.values_list("product_id", "amount"))
+    ProductOrder.objects.all().delete()
+    Order.objects.all().delete()
+    Product.objects.all().delete()
+
+    call_command("seed_data", users=0, products=10, orders=5, reviews=0, collections=0, favorites=0, seed=42)
+
+    assert list(Product.objects.values_list("name", "price")) == first_run
+    assert len(ProductOrder.objects.all()) == len(positions)
+    assert list(ProductOrder.objects.values_list("amount", flat=True)) == [amount for _, amount in positions]
+
+
+# проверка загрузки fixtures.json пакетной вставкой
+@pytest.mark.django_db
+def test_seed_data_from_fixture():
+    call_command("seed_data", fixture=settings.BASE_DIR / "fixtures.json")
+
+    assert Product.objects.count() == 7
+    assert Order.objects.count() == 3
+    assert ProductOrder.objects.count() == 4
+    assert Collection.objects.get(id=1).products.count() > 0
+    assert Token.objects.filter(key="6293e66efb4f2009d0afdebf3294ca809f664d23", user__username="admin").exists()
+    # записи без сигналов получают историю цен отдельным шагом
+    assert ProductPrice.objects.count() == 7
+
+
+# проверка загрузки связей многие-ко-многим из фикстуры
+@pytest.mark.django_db
+def test_seed_data_fixture_m2m(tmp_path):
+    fixture = tmp_path / "fixture.json"
+    fixture.write_text(json.dumps([
+        {"model": "auth.group", "pk": 1, "fields": {"name": "managers", "permissions": []}},
+        {"model": "auth.user", "pk": 10, "fields": {"username": "manager", "password": "", "groups": [1],
+                                                    "user_permissions": [1]}},
+    ]), encoding="utf-8")
+
+    call_command("seed_data", fixture=fixture)
+
+    user = User.objects.get(id=10)
+    assert list(user.groups.values_list("name", flat=True)) == ["managers"]
+    # права создаются migrate со своими id, связи с ними из фикстуры пропускаются
+    assert not user.user_permissions.exists()
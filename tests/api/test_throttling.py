@@ -0,0 +1,63 @@
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_429_TOO_MANY_REQUESTS
+from rest_framework.test import APIClient
+
+from api.throttling import SlidingWindowThrottle
+
+
+@pytest.fixture
+def throttle_rates(settings):
+    def set_rates(**rates):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}
+
+    return set_rates
+
+
+# ограничение для анонимных пользователей считается отдельно для каждого IP
+@pytest.mark.django_db
+def test_anon_throttle_per_ip(throttle_rates):
+    throttle_rates(anon="3/min")
+    client = APIClient()
+    url = reverse("products-list")
+
+    statuses = [client.get(url, REMOTE_ADDR="10.0.0.1").status_code for _ in range(4)]
+
+    assert statuses == [HTTP_200_OK] * 3 + [HTTP_429_TOO_MANY_REQUESTS]
+    assert client.get(url, REMOTE_ADDR="10.0.0.2").status_code == HTTP_200_OK
+
+
+# для записи отзывов действует отдельная, более строгая норма
+@pytest.mark.django_db
+def test_reviews_write_throttle(throttle_rates, user_api_client, review_create_payload):
+    throttle_rates(user="100/min", reviews="100/min", reviews_write="1/min")
+    url = reverse("product-reviews-list")
+
+    assert user_api_client.post(url, data=review_create_payload, format="json").status_code != \
+        HTTP_429_TOO_MANY_REQUESTS
+    resp = user_api_client.post(url, data=review_create_payload, format="json")
+
+    assert resp.status_code == HTTP_429_TOO_MANY_REQUESTS
+    assert "Retry-After" in resp
+    # чтение при этом не ограничено нормой для записи
+    assert user_api_client.get(url).status_code == HTTP_200_OK
+
+
+# норма авторизованных пользователей считается отдельно для каждого пользователя
+@pytest.mark.django_db
+def test_user_throttle_per_user(throttle_rates, user_api_client, another_user_api_client):
+    throttle_rates(user="2/min")
+    url = reverse("orders-list")
+
+    statuses = [user_api_client.get(url).status_code for _ in range(3)]
+
+    assert statuses == [HTTP_200_OK, HTTP_200_OK, HTTP_429_TOO_MANY_REQUESTS]
+    assert another_user_api_client.get(url).status_code == HTTP_200_OK
+
+
+# время ожидания считается по тому, когда скользящее окно освободит место для запроса
+def test_sliding_window_retry_after():
+    # предыдущее окно заполнено: место появится, когда его доля в скользящем окне станет меньше 1 запроса
+    assert SlidingWindowThrottle.retry_after(3, 60, previous=4, current=1, elapsed=0.25) == pytest.approx(30)
+    # текущее окно заполнено: ждём следующее и треть его, пока доля текущего не опустится до 2 запросов
+    assert SlidingWindowThrottle.retry_after(3, 60, previous=0, current=3, elapsed=0.5) == pytest.approx(50)
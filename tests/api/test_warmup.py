@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from django.db import connections
+
+from api.warmup import warm_up
+
+# Бюджет времени импорта Django, DRF и приложения при старте воркера, мс
+IMPORT_TIME_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", 3000))
+
+
+def import_times(code):
+    """
+    Время импорта модулей верхнего уровня (python -X importtime), мкс, по убыванию
+    """
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": "diplom_online_store.settings_test"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env, capture_output=True,
+                            text=True, cwd=Path(__file__).resolve().parents[2], check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        _, cumulative, package = line[len("import time:"):].split("|")
+        # Вложенные импорты отмечены отступом и уже учтены в cumulative модуля верхнего уровня
+        if not package.startswith("  "):
+            times.append((int(cumulative), package.strip()))
+    return sorted(times, reverse=True)
+
+
+# проверка прогрева: маршруты, сериализаторы, фильтры и соединения с базами
+@pytest.mark.django_db(databases=['default', 'replica'])
+def test_warm_up():
+    timings = warm_up()
+
+    assert set(timings) == {"urls", "viewsets", "databases"}
+    assert all(connections[alias].connection is not None for alias in connections)
+
+
+# проверка, что импорт приложения при старте укладывается в бюджет
+def test_import_time_budget():
+    times = import_times("import django; django.setup(); import api.urls, api.views, api.warmup")
+    total_ms = sum(cumulative for cumulative, _ in times) / 1000
+    summary = "\n".join(f"{cumulative / 1000:8.1f} ms  {package}" for cumulative, package in times[:10])
+
+    assert total_ms <= IMPORT_TIME_BUDGET_MS, f"Импорт занял {total_ms:.0f} мс:\n{summary}"
@@ -1,7 +1,20 @@
 import pytest
+from django.core.cache import cache
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
+from api.product_cache import local_cache
+
+
+# Кеш общий для всех тестов процесса, а id в тестовой базе повторяются между тестами
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    local_cache.clear()
+    yield
+    cache.clear()
+    local_cache.clear()
+
 
 # Общие фикстуры для api:
 @pytest.fixture